@@ -1,12 +1,137 @@
+import hashlib
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+import signal
+import threading
+import uuid
+import zlib
+import datetime
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, stream_template, send_file, g, has_request_context
 from data.frameworks import get_all_frameworks
-from data.controls import get_all_controls, get_control_frameworks_mapping
+from data.controls import get_all_controls
+from data.catalog import CatalogError, check_strings, get_catalog, on_catalog_change, maybe_reload_catalog, request_catalog_reload, set_catalog_resolver
+from cache import LRUCache, selection_key
+from classification import get_classification_index
+from scoring import AssessmentState, get_engine
+from scoring_model import ScoringModelError, model_names as scoring_model_names
+from search import get_search_index
+from sessions import create_session_interface
+from report_jobs import ReportJobManager
+from exports import FORMATS as EXPORT_FORMATS, ExportQueue, available_formats
+from tenants import TenantCatalogs, load_overlays, parse_tenant_keys, tenant_of_key
+import assets
+import fragments
+import images
+import metrics
+from models import db, Assessment, assessment_row, bulk_insert_assessments, assessment_history, assessment_trend
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+app.session_interface = create_session_interface(app, os.environ.get("SESSION_BACKEND", "sqlite"))
+# Hashed, pre-compressed static files when built with `python assets.py`
+asset_manifest = assets.init_app(app)
+images.init_app(app)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///assessments.db")
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_pre_ping": True}
+db.init_app(app)
+with app.app_context():
+    db.create_all()
+
+# Business-unit catalogs layered on the base one (data/tenants.json), chosen by the requesting tenant
+tenant_catalogs = TenantCatalogs(load_overlays(), maxsize=int(os.environ.get("TENANT_CATALOG_CACHE_SIZE", 64)))
+on_catalog_change(lambda catalog: tenant_catalogs.clear())
+
+# Tenant API keys as "tenant:key,tenant:key"; a request sending "Authorization: Bearer <key>" acts for
+# that key's tenant, and one without a key for 'default'
+tenant_keys = parse_tenant_keys(os.environ.get("TENANT_API_KEYS", ""))
+
+@set_catalog_resolver
+def request_catalog():
+    """Catalog of the requesting tenant, resolved once per request (before the session is loaded)."""
+    if not has_request_context():
+        return None
+    catalog = g.get('catalog')
+    if catalog is None:
+        catalog = g.catalog = tenant_catalogs.get(current_tenant())
+    return catalog
+
+# Computed analytics per (catalog version, selection); shared by /dashboard and /download_report
+analytics_cache = LRUCache(
+    maxsize=int(os.environ.get("ANALYTICS_CACHE_SIZE", 256)),
+    ttl=float(os.environ.get("ANALYTICS_CACHE_TTL", 300))
+)
+on_catalog_change(lambda catalog: analytics_cache.clear())
+
+# Request metrics, shared between workers through per-process files (an empty METRICS_DIR keeps them in process)
+metrics.configure(os.environ.get("METRICS_DIR", os.path.join(app.instance_path, 'metrics')) or None,
+                  flush_interval=float(os.environ.get("METRICS_FLUSH_INTERVAL", 1)))
+metrics.init_app(app)
+metrics.register_collector(metrics.cache_collector('analytics', analytics_cache))
+metrics.register_collector(metrics.cache_collector('tenant_catalogs', tenant_catalogs))
+
+# Rendered template fragments per catalog version and asset build; FRAGMENT_CACHE_DIR shares them
+# between workers and outlives deploys, so fragments of earlier builds and of catalog versions no longer
+# in service (base or tenant) are dropped at startup and on reload
+fragment_cache = fragments.init_app(app, fragments.FragmentCache(
+    maxsize=int(os.environ.get("FRAGMENT_CACHE_SIZE", 512)),
+    directory=os.environ.get("FRAGMENT_CACHE_DIR") or None,
+    asset_version=assets.manifest_version(asset_manifest)
+))
+fragment_cache.invalidate(get_catalog().version, *tenant_catalogs.versions(get_catalog()))
+on_catalog_change(lambda catalog: fragment_cache.invalidate(catalog.version, *tenant_catalogs.versions(catalog)))
+metrics.register_collector(metrics.cache_collector('fragments', fragment_cache))
+
+# Seconds between checks of the catalog data file for changes (0 checks on every request)
+CATALOG_RELOAD_INTERVAL = float(os.environ.get("CATALOG_RELOAD_INTERVAL", 2))
+
+# SIGHUP forces a catalog reload on the next request
+if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGHUP, lambda signum, frame: request_catalog_reload())
+
+@app.before_request
+def reload_catalog_if_changed():
+    """Swap in the catalog from disk if its data file changed."""
+    maybe_reload_catalog(CATALOG_RELOAD_INTERVAL)
+
+@app.before_request
+def check_tenant():
+    """Refuse requests with an unknown tenant API key or an X-Tenant-ID header naming another tenant."""
+    current_tenant()
+    if g.tenant is None:
+        return jsonify({"status": "error", "error": "Tenant credentials refused"}), 403
+
+# Incremental scoring states behind the live score on the controls page, keyed by an opaque token
+scoring_states = LRUCache(maxsize=int(os.environ.get("SCORING_STATE_CACHE_SIZE", 1024)), ttl=1800)
+on_catalog_change(lambda catalog: scoring_states.clear())
+metrics.register_collector(metrics.cache_collector('scoring_states', scoring_states))
+
+# Controls page pagination
+CONTROLS_PAGE_SIZE = int(os.environ.get("CONTROLS_PAGE_SIZE", 50))
+CONTROLS_MAX_PAGE_SIZE = 200
+
+# Upper bound on assessments scored or stored by one batch API call
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 1000))
+
+# Longest window of /api/assessments/trend, in days
+TREND_MAX_DAYS = 3650
+
+# Bulk report rendering runs on a process pool so it doesn't block request workers
+report_jobs = ReportJobManager(
+    os.environ.get("REPORT_JOBS_DIR", os.path.join(app.instance_path, 'report_jobs')),
+    max_workers=int(os.environ.get("REPORT_WORKERS", 0)) or None
+)
+
+# CSV/XLSX/PDF exports are queued in SQLite and run by EXPORT_WORKERS worker processes per web process,
+# off the request workers (EXPORT_WORKERS=0 leaves them to a separate `python exports.py` worker, and
+# EXPORT_THREADS=1 runs them on threads of the web process instead, e.g. in development)
+export_queue = ExportQueue(
+    os.environ.get("EXPORT_JOBS_DIR", os.path.join(app.instance_path, 'exports')),
+    workers=int(os.environ.get("EXPORT_WORKERS", 1)),
+    threads=os.environ.get("EXPORT_THREADS") == "1",
+    catalog_for=tenant_catalogs.get
+)
 
 @app.route('/')
+@fragment_cache.page('index')
 def index():
     """Landing page with assessment overview."""
     frameworks = get_all_frameworks()
@@ -28,48 +153,69 @@ def select_frameworks():
 
 @app.route('/controls')
 def controls():
-    """Page 2: Controls selection with checkboxes."""
+    """Page 2: Controls selection with checkboxes.
+
+    Only the first page of matching controls is rendered; further pages and
+    searches are fetched from /api/controls.
+    """
     if 'selected_frameworks' not in session or not session['selected_frameworks']:
         return redirect(url_for('frameworks'))
 
     frameworks_data = get_all_frameworks()
     selected_frameworks = session['selected_frameworks']
     selected_controls = session.get('selected_controls', [])
-    control_frameworks = get_control_frameworks_mapping()
-
-    # Get controls only for selected frameworks
-    from data.controls import get_controls_by_framework
-    controls_by_framework = get_controls_by_framework()
+    # One checkbox per equivalence group, under the canonical control's name
+    canonical = get_catalog().canonical
+    if not canonical.keys().isdisjoint(selected_controls):
+        selected_controls = list(dict.fromkeys(canonical.get(c, c) for c in selected_controls))
 
-    # Filter controls based on selected frameworks
-    filtered_controls = set()
-    for framework_id in selected_frameworks:
-        # Map framework IDs to framework names
-        framework_name_mapping = {
-            'nist_csf': 'NIST CSF',
-            'iso_27001': 'ISO/IEC 27001/27005',
-            'cobit_2019': 'COBIT 2019',
-            'rbi_cybersecurity': 'RBI Cybersecurity',
-            'pci_dss': 'PCI-DSS v4.0',
-            'hipaa': 'HIPAA',
-            'iso_27001_enterprise': 'ISO 27001 (Enterprise/SaaS)',
-            'cert_in': 'CERT-IN',
-            'soc2': 'SOC 2 Type 2'
-        }
-
-        framework_name = framework_name_mapping.get(framework_id)
-        if framework_name and framework_name in controls_by_framework:
-            filtered_controls.update(controls_by_framework[framework_name])
-
-    # Convert to list and sort
-    filtered_controls = sorted(list(filtered_controls))
+    controls_page = query_controls(selected_frameworks, selected_controls,
+                                   query=request.args.get('q', ''),
+                                   page=request.args.get('page', 1, type=int),
+                                   page_size=request.args.get('page_size', CONTROLS_PAGE_SIZE, type=int))
 
     return render_template('controls.html',
                          frameworks_data=frameworks_data,
                          selected_frameworks=selected_frameworks,
-                         all_controls=filtered_controls,
-                         selected_controls=selected_controls,
-                         control_frameworks=control_frameworks)
+                         controls_page=controls_page,
+                         selected_controls=selected_controls)
+
+@app.route('/api/controls')
+def api_controls():
+    """Search and page through the controls of the selected frameworks.
+
+    Query parameters: ``q`` (search text), ``mode`` (``substring`` or
+    ``prefix``), ``framework`` (repeatable framework ID filter, limited to the
+    selected frameworks), ``page`` and ``page_size``. With ``names_only=1``
+    every matching control name is returned without pagination.
+    """
+    selected_frameworks = session.get('selected_frameworks', [])
+    if not selected_frameworks:
+        return jsonify({"status": "error", "error": "No frameworks selected"}), 400
+
+    framework_filter = [f for f in request.args.getlist('framework') if f in selected_frameworks]
+    result = query_controls(selected_frameworks, session.get('selected_controls', []),
+                            query=request.args.get('q', ''),
+                            framework_filter=framework_filter or None,
+                            page=request.args.get('page', 1, type=int),
+                            page_size=request.args.get('page_size', CONTROLS_PAGE_SIZE, type=int),
+                            prefix=request.args.get('mode') == 'prefix',
+                            names_only=request.args.get('names_only') == '1')
+    return jsonify({"status": "success", **result})
+
+@app.route('/api/search')
+def api_search():
+    """Ranked fuzzy search over all controls and frameworks in the catalog.
+
+    Query parameters: ``q`` (search text), ``type`` (``control`` or
+    ``framework`` to restrict results) and ``limit`` (at most 100).
+    """
+    doc_type = request.args.get('type')
+    if doc_type not in (None, 'control', 'framework'):
+        return jsonify({"status": "error", "error": f"Unknown type: {doc_type}"}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    results = get_search_index().search(request.args.get('q', ''), limit=limit, doc_type=doc_type)
+    return jsonify({"status": "success", "results": results})
 
 @app.route('/select_controls', methods=['POST'])
 def select_controls():
@@ -91,30 +237,487 @@ def dashboard():
     frameworks_data = get_all_frameworks()
     all_controls = get_all_controls()
 
-    analytics = calculate_analytics(selected_frameworks, selected_controls, frameworks_data, all_controls)
+    # The selection hash keys both the analytics and the rendered dashboard fragment
+    assessment_key = selection_key(selected_frameworks, selected_controls, get_catalog().version)
+    analytics = calculate_analytics(selected_frameworks, selected_controls, frameworks_data, all_controls,
+                                    key=assessment_key)
 
     return render_template('dashboard.html', 
                          analytics=analytics,
+                         assessment_key=assessment_key,
+                         export_formats=available_formats(),
                          selected_frameworks=selected_frameworks,
                          selected_controls=selected_controls,
                          frameworks_data=frameworks_data)
 
+@app.route('/api/analytics')
+def api_analytics():
+    """Analytics for the current selection as JSON, with conditional GET support.
+
+    ``fields`` (comma-separated) limits the response to the named keys and
+    ``exclude`` drops keys, e.g. ``exclude=missing_controls,implemented_controls``
+    to skip the long control lists. The ETag is derived from the selection
+    hash, so an unchanged assessment is answered with 304.
+    """
+    selected_frameworks = session.get('selected_frameworks', [])
+    selected_controls = session.get('selected_controls', [])
+
+    if not selected_frameworks or not selected_controls:
+        return jsonify({"status": "error", "error": "No assessment data available"}), 400
+
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    exclude = set(f for f in request.args.get('exclude', '').split(',') if f)
+    key = selection_key(selected_frameworks, selected_controls, get_catalog().version)
+    etag = hashlib.sha256(f"{key}|{','.join(fields)}|{','.join(sorted(exclude))}".encode('utf-8')).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        analytics = calculate_analytics(selected_frameworks, selected_controls, get_all_frameworks(), get_all_controls(),
+                                        key=key)
+        if fields:
+            analytics = {k: analytics[k] for k in fields if k in analytics}
+        if exclude:
+            analytics = {k: v for k, v in analytics.items() if k not in exclude}
+        response = jsonify({"status": "success", "analytics": analytics})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+@app.route('/api/analytics/delta', methods=['POST'])
+def api_analytics_delta():
+    """Re-score an assessment from a selection delta without recomputing everything.
+
+    The JSON body may carry ``add_controls``, ``remove_controls``,
+    ``add_frameworks`` and ``remove_frameworks``. Without a ``state`` token a
+    new state is seeded from ``frameworks``/``controls`` (defaulting to the
+    session selection); the response returns a token to send with later
+    deltas. An unknown or expired token is answered with 409 so the client
+    can seed again. Only the headline figures and recommendations are
+    returned, not the control name lists.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "error": "Expected a JSON object"}), 400
+    keys = ('frameworks', 'controls', 'add_controls', 'remove_controls', 'add_frameworks', 'remove_frameworks')
+    try:
+        for key in keys:
+            check_strings(data.get(key, []), f"'{key}'")
+    except CatalogError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+
+    token = data.get('state')
+    if token:
+        state = scoring_states.get(token)
+        if state is None or state.engine is not get_engine():
+            return jsonify({"status": "error", "error": "Unknown or expired scoring state"}), 409
+    else:
+        token = uuid.uuid4().hex
+        state = AssessmentState(get_engine(),
+                                data.get('frameworks') or session.get('selected_frameworks', []),
+                                data.get('controls', session.get('selected_controls', [])))
+        scoring_states.set(token, state)
+
+    with state.lock:
+        state.apply(add_controls=data.get('add_controls', []),
+                    remove_controls=data.get('remove_controls', []),
+                    add_frameworks=data.get('add_frameworks', []),
+                    remove_frameworks=data.get('remove_frameworks', []))
+        analytics = state.summary(len(get_all_frameworks()))
+        analytics['recommendations'] = state_recommendations(state)
+    return jsonify({"status": "success", "state": token, "analytics": analytics})
+
+@app.route('/api/analytics/compare')
+def api_analytics_compare():
+    """Security score of the current selection under several scoring models, side by side.
+
+    ``models`` (comma-separated) names the models to compare and defaults to
+    every configured model. Each result carries the score and the points of
+    each component.
+    """
+    selected_frameworks = session.get('selected_frameworks', [])
+    selected_controls = session.get('selected_controls', [])
+
+    if not selected_frameworks or not selected_controls:
+        return jsonify({"status": "error", "error": "No assessment data available"}), 400
+
+    names = [name for name in request.args.get('models', '').split(',') if name] or scoring_model_names()
+    try:
+        results = get_engine().compare(selected_frameworks, selected_controls, names)
+    except ScoringModelError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    return jsonify({"status": "success", "active_model": get_engine().model.name, "models": results})
+
 @app.route('/download_report')
+@app.route('/download_report/file')
 def download_report():
-    """Generate and download security assessment report in HTML format."""
+    """Stream the security assessment report as an HTML file download.
+
+    The template is rendered incrementally and optionally gzip-compressed on
+    the fly, so the first bytes go out before rendering finishes. The weak
+    ETag identifies the assessment (selection and catalog version); only the
+    timestamps differ between two reports for the same ETag.
+    """
+    selected_frameworks = session.get('selected_frameworks', [])
+    selected_controls = session.get('selected_controls', [])
+
+    if not selected_frameworks or not selected_controls:
+        return jsonify({"status": "error", "error": "No assessment data available"}), 400
+
+    etag = selection_key(selected_frameworks, selected_controls, get_catalog().version)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    report_data, current_time = build_report_data(selected_frameworks, selected_controls)
+    filename = f"cybersecurity_assessment_report_{current_time.strftime('%Y%m%d_%H%M%S')}.html"
+    chunks = stream_template('report.html', **report_data)
+
+    gzip_enabled = 'gzip' in request.accept_encodings
+    if gzip_enabled:
+        chunks = gzip_stream(chunks)
+    response = Response(chunks, mimetype='text/html')
+    if gzip_enabled:
+        response.headers['Content-Encoding'] = 'gzip'
+    disposition = 'inline' if request.args.get('inline') else 'attachment'
+    response.headers['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Cookie')
+    response.set_etag(etag, weak=True)
+    return response
+
+@app.route('/save_assessment', methods=['POST'])
+def save_assessment():
+    """Persist the current session's assessment with its analytics snapshot."""
     selected_frameworks = session.get('selected_frameworks', [])
     selected_controls = session.get('selected_controls', [])
 
     if not selected_frameworks or not selected_controls:
         return jsonify({"status": "error", "error": "No assessment data available"}), 400
 
+    analytics = calculate_analytics(selected_frameworks, selected_controls, get_all_frameworks(), get_all_controls())
+    row = assessment_row(current_tenant(), selected_frameworks, selected_controls, analytics,
+                         get_catalog().version, label=request.form.get('label'))
+    bulk_insert_assessments([row])
+    return jsonify({"status": "success"})
+
+@app.route('/api/assessments', methods=['POST'])
+def create_assessments():
+    """Score and store a batch of assessments in one bulk insert."""
+    try:
+        items = assessment_items(request.get_json(silent=True))
+    except PayloadError as e:
+        return jsonify({"status": "error", "error": str(e)}), e.status
+
+    frameworks_data = get_all_frameworks()
+    all_controls = get_all_controls()
+    catalog_version = get_catalog().version
+    tenant = current_tenant()
+    rows = []
+    for item in items:
+        selected_frameworks = item['frameworks']
+        selected_controls = item['controls']
+        analytics = calculate_analytics(selected_frameworks, selected_controls, frameworks_data, all_controls)
+        rows.append(assessment_row(tenant, selected_frameworks, selected_controls, analytics,
+                                   catalog_version, label=item.get('label')))
+
+    created = bulk_insert_assessments(rows)
+    return jsonify({"status": "success", "created": created}), 201
+
+@app.route('/api/batch_assessment', methods=['POST'])
+def batch_assessment():
+    """Score many organizations in one call.
+
+    Expects ``{"assessments": [{"id": ..., "frameworks": [...], "controls": [...]}, ...]}``
+    and returns the analytics for each item in the same order.
+    """
+    try:
+        items = assessment_items(request.get_json(silent=True))
+    except PayloadError as e:
+        return jsonify({"status": "error", "error": str(e)}), e.status
+
+    assessments = [(item['frameworks'], item['controls']) for item in items]
+    results = calculate_batch_analytics(assessments, get_all_frameworks())
+    return jsonify({
+        "status": "success",
+        "results": [{"id": item.get('id'), "analytics": analytics} for item, analytics in zip(items, results)]
+    })
+
+@app.route('/api/reports/bulk', methods=['POST'])
+def create_bulk_report_job():
+    """Start a bulk report job and return its ID for progress polling.
+
+    Accepts either ``{"assessments": [{"label", "frameworks", "controls"}, ...]}``
+    or ``{"assessment_ids": [...]}`` referring to stored assessments.
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict) and isinstance(payload.get('assessment_ids'), list):
+        assessment_ids = payload['assessment_ids']
+        if not assessment_ids:
+            return jsonify({"status": "error", "error": "Expected a non-empty 'assessment_ids' list"}), 400
+        if len(assessment_ids) > BATCH_MAX_ITEMS:
+            return jsonify({"status": "error", "error": f"At most {BATCH_MAX_ITEMS} reports per job"}), 413
+        tenant = current_tenant()
+        assessments = []
+        for assessment_id in assessment_ids:
+            assessment = db.session.get(Assessment, assessment_id) if isinstance(assessment_id, int) else None
+            if assessment is None or assessment.tenant != tenant:
+                return jsonify({"status": "error", "error": f"Assessment not found: {assessment_id}"}), 404
+            assessments.append((assessment.label or f"assessment_{assessment.id}",
+                                assessment.selected_frameworks, assessment.selected_controls))
+    else:
+        try:
+            items = assessment_items(payload)
+        except PayloadError as e:
+            return jsonify({"status": "error", "error": str(e)}), e.status
+        assessments = [(item.get('label') or f"report_{index}", item['frameworks'], item['controls'])
+                       for index, item in enumerate(items, 1)]
+
+    job_id = report_jobs.submit(assessments, tenant=current_tenant())
+    return jsonify({
+        "status": "success",
+        "job_id": job_id,
+        "status_url": url_for('bulk_report_job_status', job_id=job_id),
+        "download_url": url_for('download_bulk_report_job', job_id=job_id)
+    }), 202
+
+@app.route('/api/reports/bulk/<job_id>')
+def bulk_report_job_status(job_id):
+    """Progress of a bulk report job."""
+    status = tenant_job(report_jobs.status(job_id))
+    if status is None:
+        return jsonify({"status": "error", "error": "Job not found"}), 404
+    return jsonify({"status": "success", "job": status})
+
+@app.route('/api/reports/bulk/<job_id>/download')
+def download_bulk_report_job(job_id):
+    """Download the zip of a finished bulk report job."""
+    archive = report_jobs.archive_path(job_id)
+    if archive is None or tenant_job(report_jobs.status(job_id)) is None:
+        return jsonify({"status": "error", "error": "Job not found or not finished"}), 404
+    return send_file(archive, mimetype='application/zip', as_attachment=True,
+                     download_name=f"security_reports_{job_id}.zip")
+
+@app.route('/api/exports', methods=['POST'])
+def create_export_job():
+    """Queue an export of the current assessment as ``{"format": "csv"|"xlsx"|"pdf"}``."""
+    selected_frameworks = session.get('selected_frameworks', [])
+    selected_controls = session.get('selected_controls', [])
+
+    if not selected_frameworks or not selected_controls:
+        return jsonify({"status": "error", "error": "No assessment data available"}), 400
+
+    payload = request.get_json(silent=True) or {}
+    export_format = payload.get('format') or request.form.get('format')
+    if export_format not in available_formats():
+        return jsonify({"status": "error",
+                        "error": f"Unsupported format, expected one of: {', '.join(available_formats())}"}), 400
+
+    job_id = export_queue.submit(export_format, selected_frameworks, selected_controls, tenant=current_tenant())
+    return jsonify({
+        "status": "success",
+        "job_id": job_id,
+        "status_url": url_for('export_job_status', job_id=job_id),
+        "download_url": url_for('download_export_job', job_id=job_id)
+    }), 202
+
+@app.route('/api/exports/<job_id>')
+def export_job_status(job_id):
+    """Progress of an export job."""
+    status = tenant_job(export_queue.status(job_id))
+    if status is None:
+        return jsonify({"status": "error", "error": "Job not found"}), 404
+    return jsonify({"status": "success", "job": status})
+
+@app.route('/api/exports/<job_id>/download')
+def download_export_job(job_id):
+    """Download the file of a finished export job."""
+    # One status read: the job and its file may be deleted by cleanup at any time
+    status = tenant_job(export_queue.status(job_id))
+    path = export_queue.output_path(status)
+    if path is None:
+        return jsonify({"status": "error", "error": "Job not found or not finished"}), 404
+    mimetype, extension = EXPORT_FORMATS[status['format']]
+    created = datetime.datetime.fromtimestamp(status['created_at'])
+    try:
+        return send_file(path, mimetype=mimetype, as_attachment=True,
+                         download_name=f"cybersecurity_assessment_{created.strftime('%Y%m%d_%H%M%S')}{extension}")
+    except FileNotFoundError:
+        return jsonify({"status": "error", "error": "Job not found or not finished"}), 404
+
+@app.route('/api/assessments')
+def list_assessments():
+    """Paginated assessment history for the current tenant, newest first."""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    include_analytics = request.args.get('include') == 'analytics'
+    history = assessment_history(current_tenant(), page=page, per_page=per_page)
+    return jsonify({
+        "status": "success",
+        "page": history.page,
+        "per_page": history.per_page,
+        "total": history.total,
+        "pages": history.pages,
+        "assessments": [a.to_dict(include_analytics) for a in history.items]
+    })
+
+@app.route('/api/assessments/<int:assessment_id>')
+def get_assessment(assessment_id):
+    """Return one stored assessment with its analytics snapshot."""
+    assessment = db.session.get(Assessment, assessment_id)
+    if assessment is None or assessment.tenant != current_tenant():
+        return jsonify({"status": "error", "error": "Assessment not found"}), 404
+    return jsonify({"status": "success", "assessment": assessment.to_dict(include_analytics=True)})
+
+@app.route('/api/assessments/trend')
+def assessments_trend():
+    """Daily score trend for the current tenant over the last ``days`` days."""
+    days = min(max(request.args.get('days', 90, type=int), 1), TREND_MAX_DAYS)
+    since = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - datetime.timedelta(days=days)
+    return jsonify({"status": "success", "trend": assessment_trend(current_tenant(), since=since)})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request, span and cache metrics of all workers in the Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/reset')
+def reset():
+    """Clear all selections and start over."""
+    session.clear()
+    return redirect(url_for('frameworks'))
+
+def query_controls(selected_frameworks, selected_controls, query='', framework_filter=None,
+                   page=1, page_size=CONTROLS_PAGE_SIZE, prefix=False, names_only=False):
+    """Filter, search and paginate the controls applicable to ``selected_frameworks``.
+
+    Equivalent controls are listed once, under their canonical control, with
+    the frameworks of the whole group. Returns a dict with the page ``items``
+    (name, frameworks, equivalents, priority, category, selected) and paging
+    totals, or ``names`` when ``names_only``.
+    """
+    engine = get_engine()
+    classification = get_classification_index()
+    catalog = get_catalog()
+    frameworks_by_control = catalog.frameworks_by_control
+
+    mask = engine.framework_context(framework_filter or selected_frameworks).applicable
+    collapsed = engine.collapse(mask)
+    query = query.strip()
+    if query:
+        ids = engine.canonical_of_ids(engine.search(query, mask, prefix=prefix))
+    else:
+        ids = engine.search(query, collapsed)
+    if names_only:
+        return {'total': len(ids), 'names': [engine.names[i] for i in ids]}
+
+    page_size = max(1, min(page_size, CONTROLS_MAX_PAGE_SIZE))
+    pages = max(1, -(-len(ids) // page_size))
+    page = max(1, min(page, pages))
+    selected = set(selected_controls)
+    items = []
+    for control_id in ids[(page - 1) * page_size:page * page_size]:
+        name = engine.names[control_id]
+        members = catalog.equivalents.get(name)
+        if members:
+            frameworks = tuple(dict.fromkeys(f for member in members for f in frameworks_by_control[member]))
+            equivalents = members[1:]
+        else:
+            frameworks = frameworks_by_control[name]
+            equivalents = ()
+        items.append({
+            'name': name,
+            'frameworks': frameworks,
+            'equivalents': equivalents,
+            'priority': classification.priority_of(name),
+            'category': classification.category_of(name),
+            'selected': name in selected or any(member in selected for member in equivalents)
+        })
+    return {
+        'items': items,
+        'total': len(ids),
+        'applicable_total': collapsed.bit_count(),
+        'page': page,
+        'pages': pages,
+        'page_size': page_size
+    }
+
+def request_tenant():
+    """Return the tenant the current request authenticates as, or None if its credentials are refused.
+
+    The tenant is the owner of the API key sent as ``Authorization: Bearer
+    <key>``, else 'default'. An ``X-Tenant-ID`` header is only accepted if
+    it names that same tenant.
+    """
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        tenant = tenant_of_key(tenant_keys, authorization[len('Bearer '):].strip())
+        if tenant is None:
+            return None
+    else:
+        tenant = 'default'
+    claimed = request.headers.get('X-Tenant-ID')
+    if claimed is not None and claimed != tenant:
+        return None
+    return tenant
+
+def current_tenant():
+    """Return the tenant of the current request, resolved once (see ``request_tenant``).
+
+    Refused credentials resolve to 'default' here, for catalog lookups that
+    run before ``check_tenant`` answers the request with 403.
+    """
+    if 'tenant' not in g:
+        g.tenant = request_tenant()
+    return g.tenant or 'default'
+
+def tenant_job(status):
+    """Return a background job's ``status`` if the job belongs to the current tenant, else None."""
+    if status is None or status.get('tenant') != current_tenant():
+        return None
+    return status
+
+class PayloadError(ValueError):
+    """Raised when a JSON request body does not have the expected shape; ``status`` is the HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def assessment_items(payload, max_items=BATCH_MAX_ITEMS):
+    """Return the ``assessments`` list of a JSON request body, raising PayloadError if it is malformed.
+
+    The body must be an object whose ``assessments`` is a non-empty list of at
+    most ``max_items`` objects, each with ``frameworks`` and ``controls`` lists
+    of strings and an optional string ``label``.
+    """
+    items = payload.get('assessments') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise PayloadError("Expected a JSON object with a non-empty 'assessments' list")
+    if len(items) > max_items:
+        raise PayloadError(f"At most {max_items} assessments per request", status=413)
+    for item in items:
+        if not isinstance(item, dict):
+            raise PayloadError("Each assessment must be an object with 'frameworks' and 'controls' lists")
+        try:
+            check_strings(item.get('frameworks'), "'frameworks'")
+            check_strings(item.get('controls'), "'controls'")
+        except CatalogError as e:
+            raise PayloadError(str(e)) from None
+        if not isinstance(item.get('label', ''), (str, type(None))):
+            raise PayloadError("Assessment labels must be strings")
+    return items
+
+def build_report_data(selected_frameworks, selected_controls):
+    """Collect the template context for report.html; returns (report_data, current_time)."""
     frameworks_data = get_all_frameworks()
     all_controls = get_all_controls()
     analytics = calculate_analytics(selected_frameworks, selected_controls, frameworks_data, all_controls)
 
     # Generate comprehensive report data
-    import datetime
-    from datetime import timezone
     import platform
     import socket
 
@@ -131,22 +734,12 @@ def download_report():
 
     # Calculate risk categories
     missing_controls = analytics.get('missing_controls', [])
-    technical_risks = [c for c in missing_controls if any(tech in c for tech in ['Network', 'Firewall', 'Patch', 'Vulnerability', 'SIEM', 'Monitoring'])]
-    human_risks = [c for c in missing_controls if any(human in c for human in ['Training', 'Awareness', 'Education', 'User'])]
-    governance_risks = [c for c in missing_controls if any(gov in c for gov in ['Policy', 'Governance', 'Compliance', 'Audit', 'Documentation'])]
-
-    # Framework name mapping
-    framework_name_mapping = {
-        'nist_csf': 'NIST CSF',
-        'iso_27001': 'ISO/IEC 27001/27005',
-        'cobit_2019': 'COBIT 2019',
-        'rbi_cybersecurity': 'RBI Cybersecurity',
-        'pci_dss': 'PCI-DSS v4.0',
-        'hipaa': 'HIPAA',
-        'iso_27001_enterprise': 'ISO 27001 (Enterprise/SaaS)',
-        'cert_in': 'CERT-IN',
-        'soc2': 'SOC 2 Type 2'
-    }
+    classification = get_classification_index()
+    technical_risks = classification.select(missing_controls, 'report_technical')
+    human_risks = classification.select(missing_controls, 'report_human')
+    governance_risks = classification.select(missing_controls, 'report_governance')
+
+    framework_names = get_catalog().framework_names
 
     # Prepare template data
     report_data = {
@@ -169,7 +762,7 @@ def download_report():
         'selected_frameworks': selected_frameworks,
         'selected_controls': selected_controls,
         'frameworks_data': frameworks_data,
-        'framework_names': [framework_name_mapping.get(fw_id, fw_id) for fw_id in selected_frameworks],
+        'framework_names': [framework_names.get(fw_id, fw_id) for fw_id in selected_frameworks],
         'missing_controls': missing_controls,
         'technical_risks': technical_risks,
         'human_risks': human_risks,
@@ -190,192 +783,106 @@ def download_report():
         }
     }
 
-    # Render HTML report template
-    html_content = render_template('report.html', **report_data)
-
-    return jsonify({
-        "status": "success",
-        "html_content": html_content,
-        "filename": f"cybersecurity_assessment_report_{current_time.strftime('%Y%m%d_%H%M%S')}.html",
-        "download_time": current_time.strftime("%B %d, %Y at %I:%M %p")
-    })
-
-@app.route('/reset')
-def reset():
-    """Clear all selections and start over."""
-    session.clear()
-    return redirect(url_for('frameworks'))
-
-def calculate_analytics(selected_frameworks, selected_controls, frameworks_data, all_controls):
-    """Calculate precise security analytics and scores for aphelioncyber compliance assessment."""
-    from data.controls import get_controls_by_framework
-
-    # Get framework-specific controls with exact mapping
-    controls_by_framework = get_controls_by_framework()
-    framework_name_mapping = {
-        'nist_csf': 'NIST CSF',
-        'iso_27001': 'ISO/IEC 27001/27005',
-        'cobit_2019': 'COBIT 2019',
-        'rbi_cybersecurity': 'RBI Cybersecurity',
-        'pci_dss': 'PCI-DSS v4.0',
-        'hipaa': 'HIPAA',
-        'iso_27001_enterprise': 'ISO 27001 (Enterprise/SaaS)',
-        'cert_in': 'CERT-IN',
-        'soc2': 'SOC 2 Type 2'
-    }
-
-    # Get applicable controls for selected frameworks with validation
-    applicable_controls = set()
-    framework_coverage = {}
-
-    for framework_id in selected_frameworks:
-        framework_name = framework_name_mapping.get(framework_id)
-        if framework_name and framework_name in controls_by_framework:
-            framework_controls = controls_by_framework[framework_name]
-            applicable_controls.update(framework_controls)
-            framework_coverage[framework_name] = len(framework_controls)
-
-    applicable_controls = sorted(list(applicable_controls))
-    total_applicable = len(applicable_controls)
-
-    # Precise control implementation tracking
-    implemented_controls = [c for c in selected_controls if c in applicable_controls]
-    implemented_count = len(implemented_controls)
-    missing_controls = [c for c in applicable_controls if c not in selected_controls]
-
-    # Enterprise-standard coverage calculation (exact percentage)
-    coverage_percentage = round((implemented_count / total_applicable * 100), 2) if total_applicable > 0 else 0
-
-    # Enhanced security scoring methodology for enterprise compliance
-    # Base coverage score (60% weight)
-    coverage_score = coverage_percentage * 0.6
-
-    # Critical controls assessment (30% weight) - Enterprise Priority Controls
-    critical_controls = [
-        'MFA (Multi-Factor Authentication)', 'Encryption at Rest', 'Encryption in Transit',
-        'Access Control & Identity Management', 'Incident Response Plan', 
-        'Backup & Disaster Recovery', 'Network Firewall & Segmentation',
-        'Vulnerability Management & Scanning', 'SIEM (Security Information and Event Management)',
-        'Privileged Access Management', 'Data Loss Prevention (DLP)', 'Security Awareness Training'
-    ]
-
-    critical_implemented = sum(1 for control in implemented_controls 
-                              if any(crit.lower() in control.lower() for crit in critical_controls))
-    critical_applicable = sum(1 for control in applicable_controls 
-                             if any(crit.lower() in control.lower() for crit in critical_controls))
-
-    critical_score = (critical_implemented / critical_applicable * 30) if critical_applicable > 0 else 0
-
-    # Compliance framework alignment (10% weight)
-    framework_alignment_score = min(len(selected_frameworks) * 2, 10)  # Max 10 points for framework diversity
-
-    # Final security score calculation
-    security_score = min(int(coverage_score + critical_score + framework_alignment_score), 100)
-
-    # Enhanced risk categorization for accurate dashboard display
-    missing_critical = [c for c in missing_controls 
-                       if any(crit.lower() in c.lower() for crit in critical_controls)]
-
-    # Technical risks - infrastructure and technical controls
-    technical_keywords = ['Patch Management', 'Vulnerability', 'Firewall', 'Monitoring', 
-                         'Authentication', 'Network Security', 'Endpoint Protection', 'Intrusion Detection',
-                         'SIEM', 'Encryption', 'Antivirus', 'IDS', 'IPS', 'Security Tools']
-    missing_high = [c for c in missing_controls 
-                   if any(hp.lower() in c.lower() for hp in technical_keywords) 
-                   and c not in missing_critical]
-
-    # Human/operational risks - training, awareness, procedures
-    human_keywords = ['Training', 'Awareness', 'Education', 'User', 'Phishing', 'Social Engineering',
-                     'Security Culture', 'Staff', 'Employee', 'Personnel']
-    missing_medium = [c for c in missing_controls 
-                     if any(mp.lower() in c.lower() for mp in human_keywords) 
-                     and c not in missing_critical and c not in missing_high]
-
-    # Governance risks - policies, procedures, compliance
-    governance_keywords = ['Policy', 'Procedure', 'Governance', 'Compliance', 'Audit', 'Documentation', 
-                          'Risk Assessment', 'Management', 'Oversight', 'Review', 'Process']
-    missing_low = [c for c in missing_controls 
-                  if any(gk.lower() in c.lower() for gk in governance_keywords) 
-                  and c not in missing_critical and c not in missing_high and c not in missing_medium]
-
-    # Any remaining controls go to governance
-    remaining_controls = [c for c in missing_controls 
-                         if c not in missing_critical and c not in missing_high 
-                         and c not in missing_medium and c not in missing_low]
-    missing_low.extend(remaining_controls)
-
-    # Enterprise-standard risk metrics
-    risk_levels = {
-        'critical': len(missing_critical),
-        'high': len(missing_high),
-        'medium': len(missing_medium),
-        'low': len(missing_low)
-    }
-
-    # Calculate compliance percentage by framework
-    framework_compliance = {}
-    for framework_id in selected_frameworks:
-        framework_name = framework_name_mapping.get(framework_id)
-        if framework_name in controls_by_framework:
-            fw_controls = controls_by_framework[framework_name]
-            fw_implemented = len([c for c in selected_controls if c in fw_controls])
-            fw_total = len(fw_controls)
-            framework_compliance[framework_name] = round((fw_implemented / fw_total * 100), 2) if fw_total > 0 else 0
-
-    # Calculate framework-specific missing controls
-    framework_missing_controls = {}
-    for framework_id in selected_frameworks:
-        framework_name = framework_name_mapping.get(framework_id)
-        if framework_name and framework_name in controls_by_framework:
-            fw_controls = set(controls_by_framework[framework_name])
-            fw_missing = [c for c in missing_controls if c in fw_controls]
-            framework_missing_controls[framework_name] = len(fw_missing)
-
-    return {
-        'security_score': security_score,
-        'coverage_percentage': coverage_percentage,
-        'frameworks_selected': len(selected_frameworks),
-        'total_frameworks': len(frameworks_data),
-        'controls_implemented': implemented_count,
-        'total_controls': total_applicable,
-        'missing_controls': missing_controls,
-        'missing_critical': missing_critical,
-        'missing_high': missing_high,
-        'missing_medium': missing_medium,
-        'missing_low': missing_low,
-        'implemented_controls': implemented_controls,
-        'framework_compliance': framework_compliance,
-        'framework_coverage': framework_coverage,
-        'framework_missing_controls': framework_missing_controls,
-        'critical_controls_status': {
-            'implemented': critical_implemented,
-            'total': critical_applicable,
-            'percentage': round((critical_implemented / critical_applicable * 100), 2) if critical_applicable > 0 else 0
-        },
-        'risk_levels': risk_levels,
-        'risk_distribution': {
-            'technical_percent': round((len(missing_high) / len(missing_controls) * 100), 1) if missing_controls else 0,
-            'human_percent': round((len(missing_medium) / len(missing_controls) * 100), 1) if missing_controls else 0,
-            'governance_percent': round(((len(missing_critical) + len(missing_low)) / len(missing_controls) * 100), 1) if missing_controls else 0
-        },
-        'recommendations': generate_recommendations(selected_controls, missing_controls, selected_frameworks)
-    }
-
+    return report_data, current_time
+
+def gzip_stream(chunks, level=6, flush_size=4096):
+    """Gzip-compress an iterable of text chunks, yielding compressed bytes as they are ready.
+
+    The compressor is sync-flushed after every ``flush_size`` bytes of input
+    (and after the first chunk), so the client receives the start of the
+    document while the rest is still rendering.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    pending = flush_size
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        pending += len(data)
+        data = compressor.compress(data)
+        if pending >= flush_size:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.flush()
+
+@metrics.timed('calculate_analytics')
+def calculate_analytics(selected_frameworks, selected_controls, frameworks_data, all_controls, key=None):
+    """Calculate precise security analytics and scores for aphelioncyber compliance assessment.
+
+    Results are memoized in ``analytics_cache`` and shared between callers, so
+    the returned dict must not be mutated. Pass ``key`` when the selection's
+    ``selection_key`` is already at hand.
+
+    A control submitted more than once is listed (and counted) in
+    ``implemented_controls`` each time, but ``framework_compliance`` counts it
+    once per framework, so compliance never exceeds 100%.
+    """
+    if key is None:
+        key = selection_key(selected_frameworks, selected_controls, get_catalog().version)
+    return analytics_cache.get_or_compute(
+        key, lambda: _compute_analytics(selected_frameworks, selected_controls, frameworks_data))
+
+def _compute_analytics(selected_frameworks, selected_controls, frameworks_data):
+    """Run the scoring engine and recommendations for one selection."""
+    analytics = get_engine().analyze(selected_frameworks, selected_controls, len(frameworks_data))
+    analytics['recommendations'] = generate_recommendations(
+        selected_controls, analytics['missing_controls'], selected_frameworks)
+    return analytics
+
+def calculate_batch_analytics(assessments, frameworks_data):
+    """Calculate analytics for many ``(selected_frameworks, selected_controls)`` pairs in one pass."""
+    results = get_engine().analyze_batch(assessments, len(frameworks_data))
+    for (selected_frameworks, selected_controls), analytics in zip(assessments, results):
+        analytics['recommendations'] = generate_recommendations(
+            selected_controls, analytics['missing_controls'], selected_frameworks)
+    return results
+
+# Missing-control categories with their own recommendation
+RECOMMENDATION_LABELS = ('vulnerability', 'monitoring', 'training', 'continuity')
+
+@metrics.timed('generate_recommendations')
 def generate_recommendations(selected_controls, missing_controls, selected_frameworks):
     """Generate security recommendations based on missing controls and selected frameworks."""
-    recommendations = []
-
     # If no missing controls, don't generate any recommendations (perfect security posture)
     if not missing_controls:
         return []
 
-    # Critical missing controls
-    critical_controls = [
-        'MFA (Multi-Factor Authentication)', 'Encryption', 'Access Control', 
-        'Incident Response Plan', 'Backup & Recovery', 'Network Firewall'
-    ]
-    missing_critical = [c for c in missing_controls if any(crit in c for crit in critical_controls)]
+    classification = get_classification_index()
+    catalog = get_catalog()
+
+    # Missing controls per selected framework
+    framework_missing = []
+    for framework_id in selected_frameworks:
+        framework_name = catalog.framework_names.get(framework_id)
+        if framework_name:
+            fw_controls = catalog.control_sets[framework_name]
+            framework_missing.append((framework_id, sum(1 for c in missing_controls if c in fw_controls)))
+
+    missing_labels = {label for label in RECOMMENDATION_LABELS if classification.any(missing_controls, label)}
+    critical_label = get_engine().model.recommendation_label
+    return build_recommendations(classification.select(missing_controls, critical_label),
+                                 framework_missing, missing_labels)
+
+def state_recommendations(state):
+    """Generate recommendations from an incremental ``AssessmentState``."""
+    if state.total_applicable == state.implemented:
+        return []
+    missing_labels = {label for label in RECOMMENDATION_LABELS if state.missing_labels.get(label)}
+    # Four names are enough to show three and know whether to add an ellipsis
+    return build_recommendations(state.missing_with_label(state.engine.model.recommendation_label, 4),
+                                 state.framework_missing(), missing_labels)
+
+def build_recommendations(missing_critical, framework_missing, missing_labels):
+    """Build the recommendation list.
+
+    ``missing_critical`` lists missing critical controls in name order (only
+    the first four are used), ``framework_missing`` is
+    ``[(framework_id, missing_count), ...]`` for the selected frameworks and
+    ``missing_labels`` holds the ``RECOMMENDATION_LABELS`` with missing controls.
+    """
+    recommendations = []
 
+    # Critical missing controls
     if missing_critical:
         recommendations.append({
             'title': 'CRITICAL: Implement essential security controls immediately',
@@ -397,58 +904,38 @@ def generate_recommendations(selected_controls, missing_controls, selected_frame
         
     }
 
-    # Check if any selected framework has missing controls before showing framework recommendations
-    from data.controls import get_controls_by_framework
-    controls_by_framework = get_controls_by_framework()
-    framework_name_mapping = {
-        'nist_csf': 'NIST CSF',
-        'iso_27001': 'ISO/IEC 27001/27005',
-        'cobit_2019': 'COBIT 2019',
-        'rbi_cybersecurity': 'RBI Cybersecurity',
-        'pci_dss': 'PCI-DSS v4.0',
-        'hipaa': 'HIPAA',
-        'iso_27001_enterprise': 'ISO 27001 (Enterprise/SaaS)',
-        'cert_in': 'CERT-IN',
-        'soc2': 'SOC 2 Type 2'
-    }
-
-    for framework_id in selected_frameworks:
-        framework_name = framework_name_mapping.get(framework_id)
-        if framework_name and framework_name in controls_by_framework:
-            fw_controls = set(controls_by_framework[framework_name])
-            fw_missing = [c for c in missing_controls if c in fw_controls]
-            
-            # Only add framework recommendation if this framework has missing controls
-            if fw_missing and framework_id in framework_recommendations:
-                recommendations.append({
-                    'title': f'Framework Compliance: {framework_recommendations[framework_id]}',
-                    'description': f'Focus on {len(fw_missing)} missing controls specific to {framework_id.replace("_", " ").title()} requirements',
-                    'priority': 'high'
-                })
+    for framework_id, fw_missing in framework_missing:
+        # Only add framework recommendation if this framework has missing controls
+        if fw_missing and framework_id in framework_recommendations:
+            recommendations.append({
+                'title': f'Framework Compliance: {framework_recommendations[framework_id]}',
+                'description': f'Focus on {fw_missing} missing controls specific to {framework_id.replace("_", " ").title()} requirements',
+                'priority': 'high'
+            })
 
     # Specific missing control categories
-    if any('Patch' in c or 'Vulnerability' in c for c in missing_controls):
+    if 'vulnerability' in missing_labels:
         recommendations.append({
             'title': 'Vulnerability Management: Implement patch management and vulnerability scanning',
             'description': 'Regular vulnerability assessments and timely patching are essential',
             'priority': 'high'
         })
 
-    if any('Monitoring' in c or 'SIEM' in c or 'Logging' in c for c in missing_controls):
+    if 'monitoring' in missing_labels:
         recommendations.append({
             'title': 'Security Monitoring: Deploy comprehensive monitoring and logging',
             'description': 'Implement SIEM, continuous monitoring, and audit trail capabilities',
             'priority': 'high'
         })
 
-    if any('Training' in c or 'Awareness' in c for c in missing_controls):
+    if 'training' in missing_labels:
         recommendations.append({
             'title': 'Human Factor Security: Establish security awareness training program',
             'description': 'Regular training reduces risk of human error and social engineering',
             'priority': 'medium'
         })
 
-    if any('Backup' in c or 'Recovery' in c or 'Continuity' in c for c in missing_controls):
+    if 'continuity' in missing_labels:
         recommendations.append({
             'title': 'Business Continuity: Implement robust backup and disaster recovery',
             'description': 'Ensure business continuity with tested backup and recovery procedures',
@@ -0,0 +1,290 @@
+"""
+Static asset build and serving.
+``python assets.py`` minifies CSS/JS (except ``*.min.*`` files), writes every file under ``static/`` to
+``static/dist/`` with a content hash in its name, pre-compresses text assets
+(gzip always, brotli when the ``brotli`` package is installed) and records
+the mapping in ``static/dist/manifest.json``.
+
+At runtime, when a manifest exists, ``url_for('static', filename=...)``
+resolves to the hashed name and hashed files are served with a long-lived
+immutable ``Cache-Control`` and the best pre-compressed variant the client
+accepts. Without a manifest, static files are served as before.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are built without it
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_NAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Text assets worth pre-compressing; images are already compressed
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+MIN_COMPRESS_SIZE = 1024
+
+# Hashed files never change, so clients may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Characters around which CSS whitespace is insignificant; /*! comments are license notices and kept
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+# After these characters, or these keywords, a '/' starts a regex literal rather than a division
+_JS_REGEX_PREFIX = set('(,=:[!&|?{};+-*%<>~^\n')
+_JS_REGEX_KEYWORDS = frozenset(('return', 'typeof', 'case', 'do', 'else', 'in', 'instanceof', 'new', 'delete',
+                                'void', 'throw', 'yield', 'await', 'of'))
+_JS_TRAILING_WORD = re.compile(r'[A-Za-z_$][\w$]*$')
+_JS_PUNCTUATION = set('{}()[];,=:+-*/%<>!&|?~^.')
+
+
+def minify_css(text):
+    """Strip comments and insignificant whitespace from a stylesheet."""
+    text = _CSS_COMMENT.sub('', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = _CSS_PUNCTUATION.sub(r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """Strip comments and collapse whitespace in a script.
+
+    ``/*!`` license comments, strings, template literals and regex literals
+    are copied verbatim, and line breaks are kept so automatic semicolon
+    insertion is unaffected.
+    """
+    out = []
+    i = 0
+    n = len(text)
+
+    def regex_allowed():
+        """Return True if a '/' at this point starts a regex literal."""
+        for chunk in reversed(out):
+            stripped = chunk.rstrip(' ')
+            if stripped:
+                if stripped[-1] in _JS_REGEX_PREFIX:
+                    return True
+                word = _JS_TRAILING_WORD.search(stripped)
+                return word is not None and word.group(0) in _JS_REGEX_KEYWORDS and \
+                    not stripped[:word.start()].endswith('.')
+        return True
+
+    while i < n:
+        c = text[i]
+        if c in '\'"`':
+            j = i + 1
+            while j < n and text[j] != c:
+                j += 2 if text[j] == '\\' else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif text.startswith('//', i):
+            j = text.find('\n', i)
+            i = n if j == -1 else j
+        elif text.startswith('/*', i):
+            j = text.find('*/', i + 2)
+            j = n if j == -1 else j + 2
+            out.append(text[i:j] if text.startswith('/*!', i) else ' ')
+            i = j
+        elif c == '/' and regex_allowed():
+            j = i + 1
+            in_class = False
+            while j < n and (in_class or text[j] != '/') and text[j] != '\n':
+                if text[j] == '\\':
+                    j += 1
+                elif text[j] == '[':
+                    in_class = True
+                elif text[j] == ']':
+                    in_class = False
+                j += 1
+            j += 1
+            while j < n and text[j].isalpha():
+                j += 1
+            out.append(text[i:j])
+            i = j
+        elif c.isspace():
+            j = i
+            while j < n and text[j].isspace():
+                j += 1
+            out.append('\n' if '\n' in text[i:j] else ' ')
+            i = j
+        else:
+            j = i
+            while j < n and not text[j].isspace() and text[j] not in '\'"`/':
+                j += 1
+            out.append(text[i:j] if j > i else c)
+            i = max(j, i + 1)
+
+    # Merge whitespace runs (a removed comment may sit next to a line break)
+    chunks = []
+    for chunk in out:
+        if chunk in (' ', '\n') and chunks and chunks[-1] in (' ', '\n'):
+            chunks[-1] = '\n' if '\n' in (chunk, chunks[-1]) else ' '
+        else:
+            chunks.append(chunk)
+
+    # Drop spaces next to punctuation ("a = b" -> "a=b") but never join "+ +" or "- -"
+    result = []
+    for index, chunk in enumerate(chunks):
+        if chunk == ' ':
+            previous = result[-1][-1] if result else '\n'
+            following = chunks[index + 1][0] if index + 1 < len(chunks) else '\n'
+            if previous in '+-' and following == previous:
+                result.append(chunk)
+            elif previous not in _JS_PUNCTUATION and previous != '\n' and \
+                    following not in _JS_PUNCTUATION and following != '\n':
+                result.append(chunk)
+        else:
+            result.append(chunk)
+    return ''.join(result).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def rewrite_css_urls(text, filename, manifest):
+    """Point the relative ``url()`` references of stylesheet ``filename`` at their built names."""
+    directory = posixpath.dirname(filename)
+
+    def replace(match):
+        quote, url = match.groups()
+        if '://' in url or url.startswith(('/', 'data:')):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = manifest.get(posixpath.normpath(posixpath.join(directory, path)))
+        if target is None:
+            return match.group(0)
+        relative = posixpath.relpath(target, posixpath.join(DIST_NAME, directory))
+        return f"url({quote}{relative}{suffix}{quote})"
+    return _CSS_URL.sub(replace, text)
+
+
+def hashed_name(filename, content):
+    """Return ``filename`` with a content hash inserted before its extension."""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+
+def build(static_dir=STATIC_DIR, use_brotli=True):
+    """Build hashed, minified and pre-compressed assets; returns the manifest."""
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    sources = []
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist_dir)
+        sources.extend(os.path.join(root, name) for name in sorted(files))
+    # Stylesheets go last so the files they reference already have built names
+    sources.sort(key=lambda source: source.lower().endswith('.css'))
+
+    manifest = {}
+    for source in sources:
+        name = os.path.basename(source)
+        filename = os.path.relpath(source, static_dir).replace(os.sep, '/')
+        ext = os.path.splitext(name)[1].lower()
+        with open(source, 'rb') as f:
+            content = f.read()
+        minifier = MINIFIERS.get(ext)
+        if minifier is not None and '.min.' not in name:
+            content = minifier(content.decode('utf-8')).encode('utf-8')
+        if ext == '.css':
+            content = rewrite_css_urls(content.decode('utf-8'), filename, manifest).encode('utf-8')
+
+        target_name = hashed_name(filename, content)
+        target = os.path.join(dist_dir, target_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        if ext in COMPRESSIBLE and len(content) >= MIN_COMPRESS_SIZE:
+            with open(f"{target}.gz", 'wb') as f:
+                f.write(gzip.compress(content, compresslevel=9, mtime=0))
+            if use_brotli and brotli is not None:
+                with open(f"{target}.br", 'wb') as f:
+                    f.write(brotli.compress(content, quality=11))
+        manifest[filename] = f"{DIST_NAME}/{target_name}"
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_dir):
+    """Return the built manifest, or None if assets have not been built."""
+    try:
+        with open(os.path.join(static_dir, DIST_NAME, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def manifest_version(manifest):
+    """Return a short hash identifying a built manifest, or '' when assets are not built."""
+    if manifest is None:
+        return ''
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def init_app(app):
+    """Serve built assets for ``app`` if a manifest exists; returns the manifest or None."""
+    from flask import request, send_from_directory
+
+    manifest = load_manifest(app.static_folder)
+    if manifest is None:
+        return None
+    hashed = set(manifest.values())
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    def static(filename):
+        if filename not in hashed:
+            return app.send_static_file(filename)
+
+        accepted = request.accept_encodings
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[candidate] and os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+                encoding = candidate
+                break
+        path = filename + {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+        response = send_from_directory(app.static_folder, path, max_age=31536000,
+                                       mimetype=mimetypes.guess_type(filename)[0])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build hashed, minified and pre-compressed static assets.')
+    parser.add_argument('--static-dir', default=STATIC_DIR)
+    parser.add_argument('--no-brotli', action='store_true', help='skip brotli variants')
+    args = parser.parse_args()
+
+    manifest = build(args.static_dir, use_brotli=not args.no_brotli)
+    if not args.no_brotli and brotli is None:
+        print("brotli is not installed; only gzip variants were written", file=sys.stderr)
+    print(f"Built {len(manifest)} assets into {os.path.join(args.static_dir, DIST_NAME)}")
+
+
+if __name__ == '__main__':
+    main()
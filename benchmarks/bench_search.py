@@ -0,0 +1,93 @@
+"""
+Benchmark the search index on synthetic catalogs.
+
+    python benchmarks/bench_search.py [--sizes 1000 10000 100000] [--queries 500] [--json]
+
+Reports index build time and p50/p95/p99 query latency per catalog size for
+exact, prefix, multi-word and misspelled queries.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import synthetic_catalog  # noqa: E402
+from search import SearchIndex, tokenize  # noqa: E402
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _misspell(word, rng):
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def _queries(catalog, count, rng):
+    controls = catalog.all_controls
+    queries = []
+    for _ in range(count):
+        words = tokenize(rng.choice(controls))
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(rng.choice(words))
+        elif kind == 1:
+            word = rng.choice(words)
+            queries.append(word[:max(2, len(word) // 2)])
+        elif kind == 2:
+            queries.append(' '.join(words[:2]))
+        else:
+            queries.append(_misspell(max(words, key=len), rng))
+    return queries
+
+
+def run(size, num_queries, seed=0):
+    catalog = synthetic_catalog(size, seed=seed)
+    start = time.perf_counter()
+    index = SearchIndex(catalog)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(seed)
+    latencies = []
+    for query in _queries(catalog, num_queries, rng):
+        start = time.perf_counter()
+        index.search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        'controls': size,
+        'terms': len(index.vocabulary),
+        'build_ms': round(build_ms, 1),
+        'query_p50_ms': round(_percentile(latencies, 0.50), 3),
+        'query_p95_ms': round(_percentile(latencies, 0.95), 3),
+        'query_p99_ms': round(_percentile(latencies, 0.99), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = [run(size, args.queries) for size in args.sizes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'controls':>9} {'terms':>6} {'build ms':>9} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}")
+    for r in results:
+        print(f"{r['controls']:>9} {r['terms']:>6} {r['build_ms']:>9} "
+              f"{r['query_p50_ms']:>7} {r['query_p95_ms']:>7} {r['query_p99_ms']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+"""
+Benchmark suite for the analytics and rendering hot paths.
+
+    python benchmarks/run.py [--sizes 100 1000 10000 100000] [--filter NAME]
+                             [--output results.json] [--compare baseline.json]
+
+Every benchmark runs against synthetic catalogs of each size, swapped in as
+the shared catalog. Timings are per call: the loop count is calibrated with
+``timeit`` to run at least 0.2s, then repeated. Results are written as JSON
+so runs from two commits can be compared; ``--compare`` prints the ratio per
+benchmark against a previous results file and exits with status 1 when any
+benchmark is slower than ``--threshold``.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the app off disk and stop the catalog file watcher from swapping the synthetic catalog out
+os.environ.setdefault('SESSION_BACKEND', 'memory')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('CATALOG_RELOAD_INTERVAL', '3600')
+os.environ.setdefault('METRICS_DIR', '')
+
+import app as webapp  # noqa: E402
+import exports  # noqa: E402
+from benchmarks.synthetic import synthetic_catalog  # noqa: E402
+from classification import ClassificationIndex  # noqa: E402
+from data.catalog import Catalog, get_catalog, set_catalog  # noqa: E402
+from data.controls import get_control_frameworks_mapping  # noqa: E402
+from scoring import ScoringEngine, get_engine  # noqa: E402
+from scoring_model import model_names  # noqa: E402
+from tenants import apply_overlay  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+# Organizations scored per analyze_batch call
+BATCH_ORGANIZATIONS = 200
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register ``factory(context)``, which returns the zero-argument callable to time."""
+    def register(factory):
+        BENCHMARKS.append((name, factory))
+        return factory
+    return register
+
+
+class Context:
+    """A synthetic catalog installed as the shared catalog, with one assessment selected."""
+
+    def __init__(self, size, seed=0):
+        rng = random.Random(seed)
+        self.catalog = synthetic_catalog(size, seed=seed)
+        set_catalog(self.catalog)
+        framework_ids = list(self.catalog.frameworks)
+        self.selected_frameworks = framework_ids[:len(framework_ids) // 2]
+        applicable = sorted({
+            control
+            for framework_id in self.selected_frameworks
+            for control in self.catalog.controls_by_framework[self.catalog.framework_names[framework_id]]
+        })
+        # The controls page only offers canonical controls, so selections never name their equivalents
+        canonical = self.catalog.canonical
+        self.selected_controls = sorted({canonical.get(control, control)
+                                         for control in rng.sample(applicable, len(applicable) // 2)})
+        self.frameworks_data = webapp.get_all_frameworks()
+        self.all_controls = webapp.get_all_controls()
+
+        self.client = webapp.app.test_client()
+        self.client.post('/select_frameworks', data={'frameworks': self.selected_frameworks})
+        self.client.post('/select_controls', data={'controls': self.selected_controls})
+
+    def analytics(self):
+        return webapp.calculate_analytics(self.selected_frameworks, self.selected_controls,
+                                          self.frameworks_data, self.all_controls)
+
+    def get(self, path):
+        def request():
+            response = self.client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} returned {response.status_code}")
+            response.get_data()
+        return request
+
+
+@benchmark('catalog_build')
+def bench_catalog_build(ctx):
+    catalog = ctx.catalog
+    frameworks = {framework_id: dict(framework) for framework_id, framework in catalog.frameworks.items()}
+    controls_by_framework = {name: list(controls) for name, controls in catalog.controls_by_framework.items()}
+    all_controls = list(catalog.all_controls)
+    return lambda: Catalog(frameworks, all_controls, controls_by_framework)
+
+
+@benchmark('engine_build')
+def bench_engine_build(ctx):
+    return lambda: ScoringEngine(ctx.catalog, ClassificationIndex(ctx.catalog))
+
+
+@benchmark('tenant_overlay_build')
+def bench_tenant_overlay_build(ctx):
+    catalog = ctx.catalog
+    overlay = {
+        'frameworks': ctx.selected_frameworks,
+        'add_controls': {catalog.framework_names[ctx.selected_frameworks[0]]: ['Tenant Control']},
+        'remove_controls': list(catalog.all_controls[::10]),
+        'critical_controls': list(catalog.all_controls[:20]),
+    }
+    return lambda: apply_overlay(catalog, overlay)
+
+
+@benchmark('get_control_frameworks_mapping')
+def bench_frameworks_mapping(ctx):
+    return get_control_frameworks_mapping
+
+
+@benchmark('calculate_analytics')
+def bench_calculate_analytics(ctx):
+    get_engine()
+
+    def run():
+        webapp.analytics_cache.clear()
+        ctx.analytics()
+    return run
+
+
+@benchmark('calculate_analytics_cached')
+def bench_calculate_analytics_cached(ctx):
+    ctx.analytics()
+    return ctx.analytics
+
+
+@benchmark('scoring_model_compare')
+def bench_scoring_model_compare(ctx):
+    engine = get_engine()
+    names = model_names()
+    return lambda: engine.compare(ctx.selected_frameworks, ctx.selected_controls, names)
+
+
+@benchmark('analyze_batch')
+def bench_analyze_batch(ctx):
+    engine = get_engine()
+    rng = random.Random(1)
+    framework_ids = list(ctx.catalog.frameworks)
+    # Organizations on a few framework selections, each implementing a different share of the controls
+    framework_selections = [rng.sample(framework_ids, rng.randint(1, len(framework_ids))) for _ in range(4)]
+    assessments = [(rng.choice(framework_selections),
+                    rng.sample(ctx.selected_controls, rng.randint(0, len(ctx.selected_controls))))
+                   for _ in range(BATCH_ORGANIZATIONS)]
+    return lambda: engine.analyze_batch(assessments, len(framework_ids))
+
+
+@benchmark('generate_recommendations')
+def bench_generate_recommendations(ctx):
+    missing_controls = ctx.analytics()['missing_controls']
+    return lambda: webapp.generate_recommendations(ctx.selected_controls, missing_controls,
+                                                   ctx.selected_frameworks)
+
+
+@benchmark('http_index')
+def bench_http_index(ctx):
+    return ctx.get('/')
+
+
+@benchmark('http_frameworks')
+def bench_http_frameworks(ctx):
+    return ctx.get('/frameworks')
+
+
+@benchmark('http_controls')
+def bench_http_controls(ctx):
+    return ctx.get('/controls')
+
+
+@benchmark('http_dashboard')
+def bench_http_dashboard(ctx):
+    return ctx.get('/dashboard')
+
+
+@benchmark('http_download_report')
+def bench_http_download_report(ctx):
+    return ctx.get('/download_report')
+
+
+def export_to_file(ctx, export_format):
+    """Export to a temporary file, as a job does (XLSX zips need a seekable file, not os.devnull)."""
+    def export():
+        with tempfile.NamedTemporaryFile(suffix=exports.FORMATS[export_format][1], delete=False) as f:
+            path = f.name
+        try:
+            exports.export_assessment(export_format, path, ctx.selected_frameworks, ctx.selected_controls)
+        finally:
+            os.remove(path)
+    return export
+
+
+@benchmark('export_csv')
+def bench_export_csv(ctx):
+    return export_to_file(ctx, 'csv')
+
+
+@benchmark('export_xlsx')
+def bench_export_xlsx(ctx):
+    return export_to_file(ctx, 'xlsx')
+
+
+def measure(func, repeat):
+    """Return ``(loops, per-call timings)`` for ``func``."""
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    return loops, [elapsed / loops for elapsed in timer.repeat(repeat, loops)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, name_filter=None):
+    original = get_catalog()
+    results = []
+    try:
+        for size in sizes:
+            ctx = Context(size)
+            for name, factory in BENCHMARKS:
+                if name_filter and name_filter not in name:
+                    continue
+                loops, timings = measure(factory(ctx), repeat)
+                result = {
+                    'name': name,
+                    'size': size,
+                    'loops': loops,
+                    'repeat': repeat,
+                    'min_s': min(timings),
+                    'median_s': statistics.median(timings)
+                }
+                results.append(result)
+                print(f"{name:<32} {size:>7} {result['min_s'] * 1000:>12.4f} ms {result['median_s'] * 1000:>12.4f} ms",
+                      file=sys.stderr)
+    finally:
+        set_catalog(original)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print per-benchmark ratios against ``baseline``; return the regressed entries."""
+    previous = {(r['name'], r['size']): r for r in baseline['results']}
+    regressions = []
+    print(f"{'benchmark':<32} {'size':>7} {'before ms':>12} {'after ms':>12} {'ratio':>7}")
+    for result in results:
+        before = previous.get((result['name'], result['size']))
+        if before is None:
+            continue
+        ratio = result['min_s'] / before['min_s'] if before['min_s'] else float('inf')
+        flag = '  REGRESSION' if ratio > 1 + threshold else ''
+        print(f"{result['name']:<32} {result['size']:>7} {before['min_s'] * 1000:>12.4f} "
+              f"{result['min_s'] * 1000:>12.4f} {ratio:>7.2f}{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown ratio above which --compare reports a regression (default 0.2)')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat()
+        },
+        'results': run(args.sizes, args.repeat, args.filter)
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    elif not args.compare:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report['results'], baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
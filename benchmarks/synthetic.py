@@ -0,0 +1,64 @@
+"""
+Synthetic catalogs for benchmarks.
+Control names are built from the words of the real catalog so token and
+trigram statistics stay realistic as the catalog grows.
+"""
+
+import random
+import re
+
+from data.catalog import Catalog, get_catalog
+
+
+def _vocabulary(catalog):
+    words = set()
+    for control in catalog.all_controls:
+        words.update(w for w in re.findall(r'[A-Za-z]+', control) if len(w) > 2)
+    for framework in catalog.frameworks.values():
+        words.update(w for w in re.findall(r'[A-Za-z]+', framework['description']) if len(w) > 3)
+    return sorted(words)
+
+
+def synthetic_catalog(num_controls, num_frameworks=8, seed=0, equivalent_share=0.1):
+    """Return a Catalog with ``num_controls`` unique controls spread over ``num_frameworks`` frameworks.
+
+    Each control belongs to one to three frameworks, and ``equivalent_share``
+    of the controls are declared equivalent in groups of two or three.
+    """
+    rng = random.Random(seed)
+    base = get_catalog()
+    words = _vocabulary(base)
+    templates = list(base.frameworks.items())
+
+    controls = []
+    seen = set()
+    while len(controls) < num_controls:
+        name = ' '.join(rng.sample(words, rng.randint(2, 5)))
+        if name not in seen:
+            seen.add(name)
+            controls.append(name)
+
+    frameworks = {}
+    controls_by_framework = {}
+    for index in range(num_frameworks):
+        # The first round reuses the real framework IDs and names; later rounds are numbered copies
+        framework_id, template = templates[index % len(templates)]
+        framework = dict(template)
+        round_number = index // len(templates)
+        if round_number:
+            framework_id = f"{framework_id}_{round_number}"
+            framework['name'] = f"{template['name']} ({round_number})"
+            framework['catalog_name'] = f"{template['catalog_name']} ({round_number})"
+        frameworks[framework_id] = framework
+        controls_by_framework[framework['catalog_name']] = []
+    names = list(controls_by_framework)
+    for control in controls:
+        for catalog_name in rng.sample(names, rng.randint(1, min(3, num_frameworks))):
+            controls_by_framework[catalog_name].append(control)
+    grouped = rng.sample(controls, int(num_controls * equivalent_share))
+    equivalences = []
+    while len(grouped) >= 2:
+        size = min(rng.randint(2, 3), len(grouped))
+        equivalences.append(grouped[-size:])
+        del grouped[-size:]
+    return Catalog(frameworks, controls, controls_by_framework, version=seed, equivalences=equivalences)
@@ -0,0 +1,89 @@
+"""
+In-process LRU/TTL cache for computed assessment results.
+Entries are keyed on a canonical hash of the selection and the catalog
+version, so repeated views of the same assessment skip recomputation and a
+catalog change never serves stale results.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def selection_key(selected_frameworks, selected_controls, catalog_version):
+    """Return a canonical hash for a selection, independent of submission order."""
+    payload = json.dumps([catalog_version, sorted(selected_frameworks), sorted(selected_controls)],
+                         separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional time-to-live and hit/miss counters.
+
+    ``maxsize`` of 0 disables caching; ``ttl`` of 0 keeps entries until evicted.
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize=256, ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if not expires or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Store ``value`` under ``key``, evicting the least recently used entry."""
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for ``key``, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0
+            }
@@ -0,0 +1,150 @@
+"""
+Keyword classification index for security controls.
+Each category's keywords are compiled into a single regular expression, and
+every catalog control is classified once so per-request categorization is a
+dictionary lookup shared by analytics, recommendations and reports.
+"""
+
+import re
+from types import MappingProxyType
+
+from data.catalog import get_catalog
+
+# Enterprise priority controls (30% of the security score)
+CRITICAL_CONTROLS = [
+    'MFA (Multi-Factor Authentication)', 'Encryption at Rest', 'Encryption in Transit',
+    'Access Control & Identity Management', 'Incident Response Plan',
+    'Backup & Disaster Recovery', 'Network Firewall & Segmentation',
+    'Vulnerability Management & Scanning', 'SIEM (Security Information and Event Management)',
+    'Privileged Access Management', 'Data Loss Prevention (DLP)', 'Security Awareness Training'
+]
+
+# Technical risks - infrastructure and technical controls
+TECHNICAL_KEYWORDS = [
+    'Patch Management', 'Vulnerability', 'Firewall', 'Monitoring',
+    'Authentication', 'Network Security', 'Endpoint Protection', 'Intrusion Detection',
+    'SIEM', 'Encryption', 'Antivirus', 'IDS', 'IPS', 'Security Tools'
+]
+
+# Human/operational risks - training, awareness, procedures
+HUMAN_KEYWORDS = [
+    'Training', 'Awareness', 'Education', 'User', 'Phishing', 'Social Engineering',
+    'Security Culture', 'Staff', 'Employee', 'Personnel'
+]
+
+# Governance risks - policies, procedures, compliance
+GOVERNANCE_KEYWORDS = [
+    'Policy', 'Procedure', 'Governance', 'Compliance', 'Audit', 'Documentation',
+    'Risk Assessment', 'Management', 'Oversight', 'Review', 'Process'
+]
+
+# Label -> (keywords, case sensitive). The analytics risk buckets match
+# case-insensitively; report sections and recommendations match exact case.
+CATEGORIES = {
+    'critical': (CRITICAL_CONTROLS, False),
+    'technical': (TECHNICAL_KEYWORDS, False),
+    'human': (HUMAN_KEYWORDS, False),
+    'governance': (GOVERNANCE_KEYWORDS, False),
+    'report_technical': (['Network', 'Firewall', 'Patch', 'Vulnerability', 'SIEM', 'Monitoring'], True),
+    'report_human': (['Training', 'Awareness', 'Education', 'User'], True),
+    'report_governance': (['Policy', 'Governance', 'Compliance', 'Audit', 'Documentation'], True),
+    'recommendation_critical': ([
+        'MFA (Multi-Factor Authentication)', 'Encryption', 'Access Control',
+        'Incident Response Plan', 'Backup & Recovery', 'Network Firewall'
+    ], True),
+    'vulnerability': (['Patch', 'Vulnerability'], True),
+    'monitoring': (['Monitoring', 'SIEM', 'Logging'], True),
+    'training': (['Training', 'Awareness'], True),
+    'continuity': (['Backup', 'Recovery', 'Continuity'], True),
+}
+
+# Controls page badges: first matching rule wins (case-sensitive)
+PRIORITY_RULES = [
+    ('critical', ['MFA', 'Multi-Factor', 'Encryption', 'Access Control', 'Incident Response']),
+    ('high', ['Patch', 'Vulnerability', 'Firewall', 'Monitoring']),
+]
+DEFAULT_PRIORITY = 'medium'
+
+CATEGORY_RULES = [
+    ('Network Security', ['Network', 'Firewall', 'IDS']),
+    ('Access Control', ['Authentication', 'MFA', 'Access']),
+    ('Data Protection', ['Backup', 'Recovery', 'Encryption']),
+    ('Incident Management', ['Incident', 'Response']),
+    ('Monitoring & Detection', ['Monitoring', 'SIEM', 'Logging']),
+    ('Vulnerability Management', ['Patch', 'Vulnerability']),
+    ('Human Factors', ['Training', 'Awareness']),
+    ('Governance', ['Governance', 'Compliance', 'Risk']),
+]
+DEFAULT_CATEGORY = 'Technical'
+
+
+def compile_matcher(keywords, case_sensitive=True):
+    """Compile keywords into one pattern matching any of them as a substring."""
+    pattern = '|'.join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True))
+    return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+
+
+class ClassificationIndex:
+    """Precomputed control -> category labels for one catalog."""
+
+    def __init__(self, catalog, categories=CATEGORIES):
+        self.catalog = catalog
+        if catalog.critical_controls is not None:
+            categories = dict(categories, critical=(catalog.critical_controls, False))
+        self.matchers = {
+            label: compile_matcher(keywords, case_sensitive)
+            for label, (keywords, case_sensitive) in categories.items()
+        }
+        self.labels = MappingProxyType({
+            control: self.classify(control) for control in catalog.frameworks_by_control
+        })
+        self.priority_rules = [(value, compile_matcher(keywords)) for value, keywords in PRIORITY_RULES]
+        self.category_rules = [(value, compile_matcher(keywords)) for value, keywords in CATEGORY_RULES]
+        self.priorities = MappingProxyType({
+            control: self._first_match(self.priority_rules, control, DEFAULT_PRIORITY)
+            for control in catalog.frameworks_by_control
+        })
+        self.categories = MappingProxyType({
+            control: self._first_match(self.category_rules, control, DEFAULT_CATEGORY)
+            for control in catalog.frameworks_by_control
+        })
+
+    @staticmethod
+    def _first_match(rules, control, default):
+        for value, matcher in rules:
+            if matcher.search(control):
+                return value
+        return default
+
+    def classify(self, control):
+        """Return the labels matching ``control``."""
+        return frozenset(label for label, matcher in self.matchers.items()
+                         if matcher.search(control))
+
+    def labels_of(self, control):
+        """Return the labels of ``control``, classifying unknown names on the fly."""
+        labels = self.labels.get(control)
+        return self.classify(control) if labels is None else labels
+
+    def priority_of(self, control):
+        """Return the controls page priority badge for ``control``."""
+        priority = self.priorities.get(control)
+        return self._first_match(self.priority_rules, control, DEFAULT_PRIORITY) if priority is None else priority
+
+    def category_of(self, control):
+        """Return the controls page category for ``control``."""
+        category = self.categories.get(control)
+        return self._first_match(self.category_rules, control, DEFAULT_CATEGORY) if category is None else category
+
+    def select(self, controls, label):
+        """Return the controls carrying ``label``, preserving order."""
+        return [c for c in controls if label in self.labels_of(c)]
+
+    def any(self, controls, label):
+        """Return True if any control carries ``label``."""
+        return any(label in self.labels_of(c) for c in controls)
+
+
+def get_classification_index(catalog=None):
+    """Return the classification index for ``catalog`` (default: the current one), building it on first use."""
+    return (catalog or get_catalog()).derived('classification', ClassificationIndex)
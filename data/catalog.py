@@ -0,0 +1,351 @@
+"""
+Read-only control catalog shared by every request.
+Loaded once from ``data/catalog.json`` (or ``CATALOG_PATH``) into precomputed,
+immutable views, and hot-swapped when the data file changes so workers pick
+up catalog edits without a restart.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.environ.get('CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.json'))
+
+# String fields every framework entry must define
+FRAMEWORK_FIELDS = ('name', 'catalog_name', 'description', 'icon', 'color')
+
+
+class CatalogError(ValueError):
+    """Raised when a catalog data file is malformed."""
+
+
+class Catalog:
+    """Immutable view over frameworks, controls and their cross-mappings.
+
+    ``critical_controls`` overrides the critical controls list of scoring
+    (None keeps the default). ``equivalences`` lists groups of controls of
+    different frameworks that are the same requirement; overlapping groups
+    are merged, and each merged group is represented by its first declared
+    member (its canonical control). Objects derived from the catalog, such as
+    its scoring engine, are built once per instance through ``derived``.
+    """
+
+    __slots__ = (
+        'frameworks',
+        'all_controls',
+        'controls_by_framework',
+        'control_sets',
+        'frameworks_by_control',
+        'framework_names',
+        'framework_ids',
+        'version',
+        'critical_controls',
+        'equivalences',
+        'canonical',
+        'equivalents',
+        '_derived',
+    )
+
+    def __init__(self, frameworks, all_controls, controls_by_framework, version=0, critical_controls=None,
+                 equivalences=()):
+        self.version = version
+        self.critical_controls = None if critical_controls is None else tuple(critical_controls)
+        self._derived = {}
+        self.frameworks = MappingProxyType({
+            framework_id: MappingProxyType(dict(framework))
+            for framework_id, framework in frameworks.items()
+        })
+        self.all_controls = tuple(all_controls)
+        self.controls_by_framework = MappingProxyType({
+            framework: tuple(controls)
+            for framework, controls in controls_by_framework.items()
+        })
+        self.control_sets = MappingProxyType({
+            framework: frozenset(controls)
+            for framework, controls in self.controls_by_framework.items()
+        })
+
+        # Framework ID <-> catalog name, validated against the control lists
+        framework_names = {}
+        for framework_id, framework in self.frameworks.items():
+            catalog_name = framework.get('catalog_name')
+            if catalog_name not in self.controls_by_framework:
+                raise CatalogError(f"Framework {framework_id!r} has no control list named {catalog_name!r}")
+            framework_names[framework_id] = catalog_name
+        self.framework_names = MappingProxyType(framework_names)
+        self.framework_ids = MappingProxyType({name: framework_id for framework_id, name in framework_names.items()})
+
+        # Inverse index: control -> frameworks, in framework declaration order
+        frameworks_by_control = {}
+        for framework, controls in self.controls_by_framework.items():
+            for control in controls:
+                frameworks_by_control.setdefault(control, []).append(framework)
+        self.frameworks_by_control = MappingProxyType({
+            control: tuple(frameworks)
+            for control, frameworks in frameworks_by_control.items()
+        })
+
+        # Equivalence groups: union-find over the declared groups, rooted at the first declared member
+        self.equivalences = tuple(tuple(group) for group in equivalences)
+        parent = {}
+        order = {}
+
+        def find(control):
+            root = control
+            while parent[root] != root:
+                root = parent[root]
+            while parent[control] != root:
+                parent[control], control = root, parent[control]
+            return root
+
+        for group in self.equivalences:
+            for control in group:
+                if control not in self.frameworks_by_control:
+                    raise CatalogError(f"Equivalent control {control!r} is not in any framework")
+                parent.setdefault(control, control)
+                order.setdefault(control, len(order))
+            for control in group[1:]:
+                first, second = sorted((find(group[0]), find(control)), key=order.__getitem__)
+                parent[second] = first
+        members = {}
+        for control in parent:
+            members.setdefault(find(control), []).append(control)
+        # Non-canonical member -> its canonical control; canonical control -> all members, itself first
+        self.canonical = MappingProxyType({control: find(control) for control in parent if find(control) != control})
+        self.equivalents = MappingProxyType({
+            canonical: tuple(group) for canonical, group in members.items() if len(group) > 1
+        })
+
+    def expand_controls(self, controls):
+        """Return ``controls`` followed by the equivalents of its controls that it does not list.
+
+        Equivalents are appended group by group, in canonical name order.
+        """
+        if not self.equivalents:
+            return controls
+        canonical = self.canonical
+        present = set(controls)
+        roots = {canonical[control] for control in canonical.keys() & present}
+        roots.update(self.equivalents.keys() & present)
+        if not roots:
+            return controls
+        expanded = list(controls)
+        for root in sorted(roots):
+            expanded.extend(member for member in self.equivalents[root] if member not in present)
+        return expanded
+
+    def derived(self, name, build):
+        """Return ``build(self)``, computed on the first call for ``name`` and kept with this catalog."""
+        value = self._derived.get(name)
+        if value is None:
+            with _derived_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = build(self)
+        return value
+
+
+# Reentrant: building one derived object may need another (the engine needs the classification index)
+_derived_lock = threading.RLock()
+
+
+def check_strings(value, what):
+    """Raise CatalogError, naming ``what``, unless ``value`` is a list of strings."""
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise CatalogError(f"{what} must be a list of strings")
+
+
+def validate_catalog_data(doc):
+    """Check the structure of a parsed catalog document, raising CatalogError."""
+    if not isinstance(doc, dict):
+        raise CatalogError("Catalog must be a JSON object")
+    frameworks = doc.get('frameworks')
+    if not isinstance(frameworks, dict) or not frameworks:
+        raise CatalogError("'frameworks' must be a non-empty object")
+    for framework_id, framework in frameworks.items():
+        if not isinstance(framework, dict):
+            raise CatalogError(f"Framework {framework_id!r} must be an object")
+        for key in FRAMEWORK_FIELDS:
+            if not isinstance(framework.get(key), str):
+                raise CatalogError(f"Framework {framework_id!r} is missing string field {key!r}")
+    check_strings(doc.get('controls'), "'controls'")
+    controls_by_framework = doc.get('controls_by_framework')
+    if not isinstance(controls_by_framework, dict):
+        raise CatalogError("'controls_by_framework' must be an object")
+    for framework, controls in controls_by_framework.items():
+        check_strings(controls, f"Controls of {framework!r}")
+    equivalences = doc.get('equivalences', [])
+    if not isinstance(equivalences, list):
+        raise CatalogError("'equivalences' must be a list of control groups")
+    for group in equivalences:
+        check_strings(group, "Equivalence groups")
+        if len(group) < 2:
+            raise CatalogError("Equivalence groups need at least two controls")
+
+
+def _precompiled_path(path):
+    return os.path.join(os.path.dirname(path), '__pycache__', os.path.basename(path) + '.pickle')
+
+
+def _read_precompiled(path, stat):
+    """Return (doc, version) from the pickled form if it matches ``stat``, else None."""
+    try:
+        with open(_precompiled_path(path), 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if not isinstance(cached, dict) or cached.get('source') != stat:
+        return None
+    return cached['data'], cached['version']
+
+
+def _write_precompiled(path, stat, doc, version):
+    """Best-effort write of the validated catalog in pickled form for fast startup."""
+    cache_path = _precompiled_path(path)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'source': stat, 'version': version, 'data': doc}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def _stat(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load_catalog(path=None):
+    """Load, validate and build a catalog from a JSON data file.
+
+    Returns ``(catalog, stat)``. The catalog version is derived from the file
+    contents, so every worker loading the same file agrees on it.
+    """
+    path = path or CATALOG_PATH
+    stat = _stat(path)
+    precompiled = _read_precompiled(path, stat)
+    if precompiled is not None:
+        doc, version = precompiled
+    else:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        doc = json.loads(raw)
+        validate_catalog_data(doc)
+        version = int(hashlib.sha256(raw).hexdigest()[:12], 16)
+        _write_precompiled(path, stat, doc, version)
+    catalog = Catalog(doc['frameworks'], doc['controls'], doc['controls_by_framework'], version=version,
+                      equivalences=doc.get('equivalences', ()))
+    return catalog, stat
+
+
+_catalog, _source_stat = load_catalog()
+_listeners = []
+_reload_lock = threading.Lock()
+_reload_requested = False
+_last_check = time.monotonic()
+
+
+# Catalog pinned by ``use_catalog`` and the resolver of the per-request catalog (see ``set_catalog_resolver``)
+_scoped = contextvars.ContextVar('catalog', default=None)
+_resolver = None
+
+
+def get_catalog():
+    """Return the catalog in effect: one pinned by ``use_catalog``, the resolver's, else the shared one."""
+    catalog = _scoped.get()
+    if catalog is None and _resolver is not None:
+        catalog = _resolver()
+    return _catalog if catalog is None else catalog
+
+
+def get_base_catalog():
+    """Return the shared catalog loaded from the data file, ignoring any per-request catalog."""
+    return _catalog
+
+
+def set_catalog_resolver(resolver):
+    """Install ``resolver()`` returning the catalog of the current request, or None for the shared one."""
+    global _resolver
+    _resolver = resolver
+    return resolver
+
+
+@contextlib.contextmanager
+def use_catalog(catalog):
+    """Make ``get_catalog`` return ``catalog`` in this context, e.g. in a background job."""
+    token = _scoped.set(catalog)
+    try:
+        yield catalog
+    finally:
+        _scoped.reset(token)
+
+
+def request_catalog_reload():
+    """Force a reload on the next ``maybe_reload_catalog`` call (safe from signal handlers)."""
+    global _reload_requested
+    _reload_requested = True
+
+
+def maybe_reload_catalog(interval=2.0):
+    """Reload the catalog if its data file changed, checking at most every ``interval`` seconds.
+
+    The new catalog is validated before it is swapped in; a broken file is
+    logged and the current catalog stays in service. Returns True on reload.
+    """
+    global _source_stat, _last_check, _reload_requested
+    if not _reload_requested and time.monotonic() - _last_check < interval:
+        return False
+    with _reload_lock:
+        if not _reload_requested and time.monotonic() - _last_check < interval:
+            return False
+        _last_check = time.monotonic()
+        forced = _reload_requested
+        _reload_requested = False
+        try:
+            if not forced and _stat(CATALOG_PATH) == _source_stat:
+                return False
+            catalog, _source_stat = load_catalog()
+        except (OSError, ValueError) as e:
+            logger.error("Catalog reload from %s failed, keeping version %s: %s",
+                         CATALOG_PATH, _catalog.version, e)
+            return False
+    set_catalog(catalog)
+    return True
+
+
+def sync_catalog(version=None):
+    """Catch up with catalog edits in a background worker before it runs a job; returns the shared catalog.
+
+    Workers serve no requests, so nothing else reloads their catalog.
+    ``version`` is the catalog version the job was queued against: when the
+    catalog in service differs, a reload is forced.
+    """
+    if version is not None and _catalog.version != version:
+        request_catalog_reload()
+    maybe_reload_catalog()
+    return _catalog
+
+
+def set_catalog(catalog):
+    """Swap in a new shared catalog and notify change listeners."""
+    global _catalog
+    _catalog = catalog
+    for listener in _listeners:
+        listener(catalog)
+
+
+def on_catalog_change(listener):
+    """Register ``listener(catalog)`` to run whenever the catalog is replaced."""
+    _listeners.append(listener)
+    return listener
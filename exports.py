@@ -0,0 +1,474 @@
+"""
+Assessment exports to CSV, XLSX and PDF on a background job queue.
+Jobs are rows in a SQLite file next to their output, so any web worker can
+answer progress polls and serve the result, and there is no broker to run.
+Exports are CPU-bound, so by default each web process hands its queued jobs
+to a small pool of worker processes, started with its first export, rather
+than running them next to requests. With ``workers=0`` exports only run in a
+separate ``python exports.py`` process; ``threads=True`` runs them on
+threads of the web process instead, which suits development.
+
+CSV and XLSX rows are generated from the scoring engine and written one at a
+time, so memory use does not grow with the catalog. XLSX is written directly
+as a zip of SpreadsheetML parts. PDF renders ``report.html`` and converts it
+with WeasyPrint, which is optional.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.sax.saxutils import escape
+
+from data.catalog import get_base_catalog, sync_catalog, use_catalog
+from jobs import is_job_id, lower_priority, new_job_id, process_alive
+from scoring import get_engine
+
+try:
+    from weasyprint import HTML
+except (ImportError, OSError):  # optional (OSError: its native Pango libraries are missing)
+    HTML = None
+
+# format -> (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    'pdf': ('application/pdf', '.pdf'),
+}
+
+CONTROL_COLUMNS = ['Framework', 'Control', 'Status', 'Risk Level', 'Priority', 'Category']
+FRAMEWORK_COLUMNS = ['Framework', 'Applicable Controls', 'Implemented', 'Missing', 'Compliance %']
+
+# Idle worker threads look for jobs queued by other processes this often (seconds)
+POLL_INTERVAL = 1.0
+# Finished jobs and their files are deleted after this many seconds
+JOB_MAX_AGE = 24 * 3600
+# Seconds between sweeps for such jobs by a worker
+CLEANUP_INTERVAL = 600
+
+# XLSX rows are written to the archive in batches; escaped text of repeated values is remembered
+XLSX_WRITE_BATCH = 1000
+XLSX_STRING_MEMO_SIZE = 4096
+
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def available_formats():
+    """Return the export formats supported by this installation."""
+    return [name for name in FORMATS if name != 'pdf' or HTML is not None]
+
+
+def control_rows(selected_frameworks, selected_controls):
+    """Yield the header and one row per control of each selected framework.
+
+    A control shared by several frameworks appears once per framework.
+    """
+    engine = get_engine()
+    framework_names = engine.catalog.framework_names
+    classification = engine.classification
+    ids = engine.ids
+    selected = {ids[control] for control in engine.catalog.expand_controls(selected_controls) if control in ids}
+    yield CONTROL_COLUMNS
+    for framework_id in selected_frameworks:
+        framework_name = framework_names.get(framework_id)
+        if framework_name is None:
+            continue
+        for control_id in engine.framework_ids.get(framework_name, ()):
+            name = engine.names[control_id]
+            yield [
+                framework_name,
+                name,
+                'Implemented' if control_id in selected else 'Missing',
+                engine.risk_level_by_id[control_id],
+                classification.priority_of(name),
+                classification.category_of(name)
+            ]
+
+
+def framework_rows(analytics):
+    """Yield the header and one compliance row per selected framework."""
+    yield FRAMEWORK_COLUMNS
+    for framework_name, applicable in analytics['framework_coverage'].items():
+        missing = analytics['framework_missing_controls'][framework_name]
+        yield [framework_name, applicable, applicable - missing, missing,
+               analytics['framework_compliance'][framework_name]]
+
+
+def summary_rows(analytics):
+    """Yield ``[metric, value]`` rows of the headline scores and risk levels."""
+    yield ['Metric', 'Value']
+    yield ['Security Score', analytics['security_score']]
+    yield ['Coverage %', analytics['coverage_percentage']]
+    yield ['Controls Implemented', analytics['controls_implemented']]
+    yield ['Applicable Controls', analytics['total_controls']]
+    yield ['Critical Controls Implemented', analytics['critical_controls_status']['implemented']]
+    yield ['Critical Controls Applicable', analytics['critical_controls_status']['total']]
+    for level, count in analytics['risk_levels'].items():
+        yield [f"Missing {level.title()} Risk Controls", count]
+
+
+def write_csv(path, rows):
+    """Write ``rows`` to a CSV file one at a time; returns the number of data rows."""
+    count = -1
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        for count, row in enumerate(rows):
+            writer.writerow(row)
+    return max(count, 0)
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_row(number, row, columns, strings, style):
+    cells = []
+    for column, value in zip(columns, row):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{column}{number}"{style}><v>{value}</v></c>')
+        else:
+            text = strings.get(value)
+            if text is None:
+                text = escape(_XML_INVALID.sub('', str(value)))
+                if len(strings) < XLSX_STRING_MEMO_SIZE:
+                    strings[value] = text
+            cells.append(f'<c r="{column}{number}" t="inlineStr"{style}><is><t>{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+# Style 1 is the bold header row
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+
+
+def write_xlsx(path, sheets):
+    """Write ``[(sheet name, rows), ...]`` as an XLSX workbook; the first row of each sheet is its header.
+
+    Rows are streamed into the archive one at a time. Returns the number of
+    data rows written.
+    """
+    count = 0
+    names = [escape(name[:31]) for name, _ in sheets]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES.format(sheets=''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(sheets) + 1))))
+        zf.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        zf.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + ''.join(f'<sheet name="{name}" sheetId="{i}" r:id="rId{i}"/>' for i, name in enumerate(names, 1))
+            + '</sheets></workbook>'))
+        zf.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(f'<Relationship Id="rId{i}" '
+                      f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                      f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, len(sheets) + 1))
+            + f'<Relationship Id="rId{len(sheets) + 1}" '
+              'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+              'Target="styles.xml"/></Relationships>'))
+        zf.writestr('xl/styles.xml', _XLSX_STYLES)
+        for i, (_, rows) in enumerate(sheets, 1):
+            with zf.open(f'xl/worksheets/sheet{i}.xml', 'w', force_zip64=True) as f:
+                f.write(_XLSX_SHEET_START.encode('utf-8'))
+                columns = []
+                strings = {}
+                batch = []
+                for number, row in enumerate(rows, 1):
+                    if len(row) > len(columns):
+                        columns = [_column_letter(index) for index in range(len(row))]
+                    batch.append(_xlsx_row(number, row, columns, strings, ' s="1"' if number == 1 else ''))
+                    if len(batch) >= XLSX_WRITE_BATCH:
+                        f.write(''.join(batch).encode('utf-8'))
+                        batch.clear()
+                    count += number > 1
+                batch.append('</sheetData></worksheet>')
+                f.write(''.join(batch).encode('utf-8'))
+    return count
+
+
+def export_assessment(export_format, path, selected_frameworks, selected_controls):
+    """Write one assessment export to ``path``; returns the number of data rows (pages are not counted for PDF)."""
+    if export_format == 'csv':
+        return write_csv(path, control_rows(selected_frameworks, selected_controls))
+    if export_format == 'xlsx':
+        engine = get_engine()
+        analytics = engine.analyze(selected_frameworks, selected_controls, len(engine.catalog.frameworks))
+        return write_xlsx(path, [
+            ('Summary', summary_rows(analytics)),
+            ('Frameworks', framework_rows(analytics)),
+            ('Controls', control_rows(selected_frameworks, selected_controls))
+        ])
+    if export_format == 'pdf':
+        if HTML is None:
+            raise RuntimeError("PDF export needs WeasyPrint (pip install weasyprint)")
+        from report_jobs import render_report_file
+
+        html_path = f"{path}.html"
+        render_report_file(html_path, selected_frameworks, selected_controls)
+        try:
+            HTML(filename=html_path).write_pdf(path)
+        finally:
+            os.remove(html_path)
+        return 0
+    raise ValueError(f"Unknown export format: {export_format}")
+
+
+def run_queued_exports():
+    """Worker process task: run the queued export jobs until none is left, then sweep expired ones."""
+    from app import export_queue
+
+    export_queue.run_pending()
+    export_queue.cleanup_if_due()
+
+
+class ExportQueue:
+    """Export jobs in a SQLite table, executed by ``workers`` background worker processes (or threads)."""
+
+    def __init__(self, directory, workers=1, threads=False, max_age=JOB_MAX_AGE, catalog_for=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.catalog_for = catalog_for
+        self.path = os.path.join(directory, 'jobs.sqlite3')
+        self.workers = workers
+        self.threads = threads
+        self.max_age = max_age
+        self._executor = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS export_jobs ('
+                         'job_id TEXT PRIMARY KEY, format TEXT NOT NULL, params TEXT NOT NULL, '
+                         'state TEXT NOT NULL, worker_pid INTEGER, rows INTEGER, error TEXT, '
+                         'created_at REAL NOT NULL, started_at REAL, finished_at REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_export_jobs_state ON export_jobs (state, created_at)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _output_path(self, job_id, export_format):
+        return os.path.join(self.directory, f"{job_id}{FORMATS[export_format][1]}")
+
+    def submit(self, export_format, selected_frameworks, selected_controls, tenant=None):
+        """Queue an export of one assessment; returns the job ID."""
+        if export_format not in available_formats():
+            raise ValueError(f"Unsupported export format: {export_format}")
+        job_id = new_job_id()
+        params = json.dumps({'frameworks': list(selected_frameworks), 'controls': list(selected_controls),
+                             'tenant': tenant, 'catalog_version': get_base_catalog().version})
+        with self._connect() as conn:
+            conn.execute('INSERT INTO export_jobs (job_id, format, params, state, created_at) '
+                         'VALUES (?, ?, ?, ?, ?)', (job_id, export_format, params, 'queued', time.time()))
+        if self.threads:
+            self.start()
+            self._wakeup.set()
+        elif self.workers > 0:
+            self._dispatch()
+        return job_id
+
+    def _dispatch(self):
+        """Have one of this process's worker processes run the queue until it is empty."""
+        with self._lock:
+            if self._executor is not None:
+                try:
+                    self._executor.submit(run_queued_exports)
+                    return
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed mid-export); its job goes back in the queue below
+                    self._executor = None
+            self.requeue_orphans()
+            # Spawned rather than forked: a fork of the threaded web process can inherit locks held by
+            # its other threads and hang
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=lower_priority,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            self._executor.submit(run_queued_exports)
+
+    def status(self, job_id):
+        """Return the status dict of a job, or None if it does not exist."""
+        if not is_job_id(job_id):
+            return None
+        with self._connect() as conn:
+            row = conn.execute('SELECT job_id, format, state, rows, error, created_at, started_at, finished_at, '
+                               'params FROM export_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        keys = ('job_id', 'format', 'state', 'rows', 'error', 'created_at', 'started_at', 'finished_at')
+        status = dict(zip(keys, row))
+        status['tenant'] = json.loads(row[-1]).get('tenant')
+        return status
+
+    def output_path(self, status):
+        """Return the file of a job from its ``status`` dict if the job completed, else None."""
+        if status is None or status['state'] != 'completed':
+            return None
+        return self._output_path(status['job_id'], status['format'])
+
+    def claim(self):
+        """Mark the oldest queued job as running in this process and return it, or None."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT job_id, format, params FROM export_jobs WHERE state = 'queued' "
+                               "ORDER BY created_at LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE export_jobs SET state = 'running', worker_pid = ?, started_at = ? "
+                             "WHERE job_id = ?", (os.getpid(), time.time(), row[0]))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return row
+
+    def _finish(self, job_id, state, rows=None, error=None):
+        with self._connect() as conn:
+            conn.execute('UPDATE export_jobs SET state = ?, rows = ?, error = ?, finished_at = ? WHERE job_id = ?',
+                         (state, rows, error, time.time(), job_id))
+
+    def run_pending(self):
+        """Execute queued jobs until none is left; returns how many ran."""
+        ran = 0
+        while True:
+            job = self.claim()
+            if job is None:
+                return ran
+            job_id, export_format, params = job
+            params = json.loads(params)
+            path = self._output_path(job_id, export_format)
+            tmp_path = f"{path}.tmp"
+            tenant = params.get('tenant')
+            sync_catalog(params.get('catalog_version'))
+            catalog = self.catalog_for(tenant) if self.catalog_for and tenant is not None else None
+            try:
+                with use_catalog(catalog):
+                    rows = export_assessment(export_format, tmp_path, params['frameworks'], params['controls'])
+                os.replace(tmp_path, path)
+            except Exception as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                self._finish(job_id, 'failed', error=str(e))
+            else:
+                self._finish(job_id, 'completed', rows=rows)
+            ran += 1
+
+    def requeue_orphans(self):
+        """Put jobs whose worker process died back in the queue."""
+        with self._connect() as conn:
+            running = conn.execute("SELECT job_id, worker_pid FROM export_jobs WHERE state = 'running'").fetchall()
+            for job_id, pid in running:
+                if not process_alive(pid):
+                    conn.execute("UPDATE export_jobs SET state = 'queued', worker_pid = NULL WHERE job_id = ?",
+                                 (job_id,))
+
+    def cleanup(self):
+        """Delete finished jobs older than ``max_age`` and their files."""
+        cutoff = time.time() - self.max_age
+        with self._connect() as conn:
+            expired = conn.execute("SELECT job_id, format FROM export_jobs WHERE state IN ('completed', 'failed') "
+                                   "AND finished_at < ?", (cutoff,)).fetchall()
+            for job_id, export_format in expired:
+                try:
+                    os.remove(self._output_path(job_id, export_format))
+                except FileNotFoundError:
+                    pass
+                conn.execute('DELETE FROM export_jobs WHERE job_id = ?', (job_id,))
+
+    def cleanup_if_due(self):
+        """Run ``cleanup`` if this process has not swept for ``CLEANUP_INTERVAL`` seconds."""
+        if time.monotonic() - self._last_cleanup > CLEANUP_INTERVAL:
+            self._last_cleanup = time.monotonic()
+            self.cleanup()
+
+    def work(self, stop=None):
+        """Run jobs until ``stop`` is set, polling for jobs queued by other processes."""
+        self.requeue_orphans()
+        while stop is None or not stop.is_set():
+            try:
+                self.run_pending()
+                self.cleanup_if_due()
+            except sqlite3.Error:
+                pass
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def start(self):
+        """Start this process's worker threads (``threads=True``) if they are not running."""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self.work, name=f"export-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run an export worker outside the web processes.')
+    parser.add_argument('--once', action='store_true', help='exit once the queue is empty')
+    args = parser.parse_args()
+
+    from app import export_queue
+
+    if args.once:
+        export_queue.requeue_orphans()
+        print(f"Ran {export_queue.run_pending()} export jobs")
+    else:
+        export_queue.work()
+
+
+if __name__ == '__main__':
+    main()
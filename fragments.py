@@ -0,0 +1,167 @@
+"""
+Fragment and page cache for rendered templates.
+Most of the markup depends only on the catalog and a few per-user values, so
+rendered HTML is cached under the fragment name, the catalog version and the
+values it varies on:
+
+    {% cache 'frameworks-grid', selected_frameworks %} ... {% endcache %}
+
+Fragments live in an in-process LRU and, when a directory is configured, in a
+shared on-disk store so every worker of a multi-worker deployment benefits
+from one render. Fragments embed hashed asset URLs, so entries are also keyed
+on the asset build (``asset_version``); entries of other asset builds or of
+catalog versions no longer in service, base or tenant, are dropped when the
+catalog reloads or the app starts. ``FragmentCache.page`` caches whole
+responses of views that depend on nothing but the catalog and the URL.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from cache import LRUCache
+from data.catalog import get_catalog
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+def fragment_key(name, generation, vary):
+    """Return a hash identifying a fragment rendered for ``vary`` in a cache generation."""
+    payload = json.dumps([name, generation, vary], separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class FragmentCache:
+    """Rendered HTML by fragment key, in memory and optionally in a shared directory.
+
+    ``maxsize`` of 0 disables caching, both in memory and on disk.
+    ``asset_version`` identifies the static asset build the fragments link to.
+    """
+
+    def __init__(self, maxsize=512, directory=None, asset_version=''):
+        self.memory = LRUCache(maxsize=maxsize)
+        self.directory = directory
+        self.asset_version = asset_version
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def generation(self, catalog_version):
+        """Return the name of the cache generation for a catalog version and this asset build."""
+        return f"{catalog_version}-{self.asset_version}" if self.asset_version else str(catalog_version)
+
+    def _path(self, generation, key):
+        return os.path.join(self.directory, generation, f"{key}.html")
+
+    def _read(self, generation, key):
+        try:
+            with open(self._path(generation, key), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, generation, key, html):
+        path = self._path(generation, key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def get_or_render(self, name, vary, render):
+        """Return the HTML of fragment ``name`` for ``vary``, calling ``render()`` on a miss."""
+        if self.memory.maxsize <= 0:
+            return render()
+        generation = self.generation(get_catalog().version)
+        key = fragment_key(name, generation, vary)
+        html = self.memory.get(key)
+        if html is not None:
+            return html
+        if self.directory:
+            html = self._read(generation, key)
+            if html is not None:
+                with self._lock:
+                    self.disk_hits += 1
+        if html is None:
+            html = render()
+            if self.directory:
+                self._write(generation, key, html)
+        self.memory.set(key, html)
+        return html
+
+    def invalidate(self, *catalog_versions):
+        """Drop cached fragments; on disk, only generations of none of the live ``catalog_versions``.
+
+        Tenants render under their own catalog versions, so callers pass the
+        base version together with every tenant's.
+        """
+        self.memory.clear()
+        if not self.directory:
+            return
+        keep = {self.generation(version) for version in catalog_versions}
+        for name in os.listdir(self.directory):
+            if name not in keep:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def page(self, name, vary=None):
+        """Decorator caching the HTML a view returns, keyed on the request URL and ``vary()``.
+
+        Only for views whose output depends on nothing per user. Responses
+        carry an ETag so revalidations are answered with 304.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                from flask import make_response, request
+
+                key = [request.full_path, vary() if vary else None]
+                html = self.get_or_render(name, key, lambda: view(*args, **kwargs))
+                response = make_response(html)
+                response.set_etag(hashlib.sha256(html.encode('utf-8')).hexdigest()[:32])
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """Return the in-memory counters plus hits served from disk."""
+        return dict(self.memory.stats(), disk_hits=self.disk_hits)
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja ``{% cache name, vary... %}...{% endcache %}`` tag backed by ``environment.fragment_cache``."""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [args[0], nodes.List(args[1:])])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, name, vary, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return Markup(cache.get_or_render(name, vary, lambda: str(caller())))
+
+
+def init_app(app, cache):
+    """Enable the ``{% cache %}`` tag on ``app``'s templates, backed by ``cache``."""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = cache
+    return cache
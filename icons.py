@@ -0,0 +1,181 @@
+"""
+Vendored Font Awesome subset.
+The pages use a few dozen Font Awesome icons, so rather than the full CDN
+stylesheet and webfonts, ``python icons.py`` writes ``static/vendor/fontawesome/``
+with only the icons referenced by the templates, the static scripts and the
+catalog ``icon`` fields: one stylesheet with the shared Font Awesome rules and
+those icons, and each font style in use subset to their glyphs. The output is
+committed, so rerun the build after using a new icon.
+
+Building needs the ``fontawesomefree`` package (the Font Awesome Free
+distribution), ``fonttools`` and ``brotli``; serving needs none of them.
+"""
+
+import argparse
+import glob
+import os
+import re
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(ROOT, 'static', 'vendor', 'fontawesome')
+STYLESHEET = 'css/fontawesome.css'
+
+# Files whose ``fa-*`` classes are collected
+SOURCES = ('templates/**/*.html', 'static/js/**/*.js', 'data/catalog.json')
+
+# style -> (class names selecting it, webfont file without extension)
+STYLES = {
+    'solid': (('fas', 'fa-solid'), 'fa-solid-900'),
+    'regular': (('far', 'fa-regular'), 'fa-regular-400'),
+    'brands': (('fab', 'fa-brands'), 'fa-brands-400'),
+}
+
+_CLASS = re.compile(r'(?<![\w-])(fa[srb]|fa-[a-z0-9]+(?:-[a-z0-9]+)*)(?![\w-])')
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_GLYPH_SELECTOR = re.compile(r'^\.(fa-[a-z0-9-]+)::before$')
+_GLYPH_BODY = re.compile(r'^content:\s*"\\([0-9a-f]+)";?$')
+_FONT_SRC = re.compile(r'src:[^;}]*')
+
+
+def referenced_classes(root=ROOT, patterns=SOURCES):
+    """Return every ``fa-*``/``fas``/``far``/``fab`` class name used in the source files."""
+    classes = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(root, pattern), recursive=True):
+            with open(path, encoding='utf-8') as f:
+                classes.update(_CLASS.findall(f.read()))
+    return classes
+
+
+def parse_rules(text):
+    """Split a stylesheet into top-level ``(prelude, body)`` pairs; at-rule bodies keep their nested rules."""
+    text = _COMMENT.sub('', text)
+    rules = []
+    depth = 0
+    start = 0
+    prelude = None
+    for i, c in enumerate(text):
+        if c == '{':
+            if depth == 0:
+                prelude = text[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((prelude, text[start:i].strip()))
+                start = i + 1
+    return rules
+
+
+def split_glyphs(rules):
+    """Return ``({icon class: codepoint}, other rules)`` for parsed Font Awesome rules."""
+    glyphs = {}
+    others = []
+    for prelude, body in rules:
+        selectors = [s.strip() for s in prelude.split(',')]
+        names = [_GLYPH_SELECTOR.match(s) for s in selectors]
+        content = _GLYPH_BODY.match(body)
+        if content and all(names):
+            for name in names:
+                glyphs[name.group(1)] = int(content.group(1), 16)
+        else:
+            others.append((prelude, body))
+    return glyphs, others
+
+
+def format_rules(rules):
+    return '\n'.join(f"{' '.join(prelude.split())} {{ {' '.join(body.split())} }}" for prelude, body in rules)
+
+
+def subset_font(source, target, codepoints):
+    """Write ``source`` reduced to ``codepoints`` as WOFF2 to ``target``."""
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    font = subset.load_font(source, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    subset.save_font(font, target, options)
+
+
+def build(source_dir, output_dir=OUTPUT_DIR, classes=None):
+    """Build the stylesheet and subset webfonts from a Font Awesome Free 6 distribution.
+
+    ``source_dir`` holds the distribution's ``css/`` and ``webfonts/``.
+    Returns ``(icons written, referenced names that are not Font Awesome classes)``.
+    """
+    if classes is None:
+        classes = referenced_classes()
+    with open(os.path.join(source_dir, 'css', 'fontawesome.css'), encoding='utf-8') as f:
+        core = f.read()
+    banner = core[:core.index('*/') + 2] if core.startswith('/*') else ''
+    glyphs, base_rules = split_glyphs(parse_rules(core))
+
+    styles = [style for style, (style_classes, _) in STYLES.items() if classes.intersection(style_classes)]
+    icons = sorted(name for name in classes if name in glyphs)
+    known = set(re.findall(r'\.(fa-[a-z0-9-]+)', format_rules(base_rules)))
+    unknown = sorted(name for name in classes - set(glyphs) - known
+                     if name not in {c for style_classes, _ in STYLES.values() for c in style_classes})
+    codepoints = sorted({glyphs[name] for name in icons})
+
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    style_rules = []
+    for style in styles:
+        font = STYLES[style][1]
+        with open(os.path.join(source_dir, 'css', f"{style}.css"), encoding='utf-8') as f:
+            for prelude, body in parse_rules(f.read()):
+                if prelude == '@font-face':
+                    body = _FONT_SRC.sub(f'src: url("../webfonts/{font}.woff2") format("woff2")', body)
+                style_rules.append((prelude, body))
+        subset_font(os.path.join(source_dir, 'webfonts', f"{font}.ttf"),
+                    os.path.join(output_dir, 'webfonts', f"{font}.woff2"), codepoints)
+
+    icon_rules = [(f".{name}::before", f'content: "\\{glyphs[name]:x}";') for name in icons]
+    path = os.path.join(output_dir, STYLESHEET)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"{banner}\n/* Subset generated by icons.py; do not edit. */\n")
+        f.write('\n'.join(format_rules(rules) for rules in (base_rules, style_rules, icon_rules)) + '\n')
+    license_path = os.path.join(source_dir, 'LICENSE.txt')
+    if os.path.exists(license_path):
+        shutil.copy(license_path, os.path.join(output_dir, 'LICENSE.txt'))
+    return icons, unknown
+
+
+def default_source():
+    """Return the Font Awesome distribution bundled with the ``fontawesomefree`` package, or None."""
+    try:
+        import fontawesomefree
+    except ImportError:
+        return None
+    return os.path.join(os.path.dirname(fontawesomefree.__file__), 'static', 'fontawesomefree')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the vendored Font Awesome subset.')
+    parser.add_argument('--source', default=default_source(),
+                        help='Font Awesome Free 6 directory with css/ and webfonts/ '
+                             '(default: the fontawesomefree package)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+    if args.source is None:
+        raise SystemExit("Font Awesome sources not found: pip install fontawesomefree or pass --source")
+
+    icons, unknown = build(args.source, args.output_dir)
+    for name in unknown:
+        print(f"warning: {name} is not a Font Awesome class", file=sys.stderr)
+    sizes = {os.path.relpath(path, args.output_dir): os.path.getsize(path)
+             for path in glob.glob(os.path.join(args.output_dir, '**', '*.*'), recursive=True)}
+    print(f"{len(icons)} icons: " + ', '.join(f"{name} {size // 1024}KB" for name, size in sorted(sizes.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Responsive derivatives of the framework logos.
+The source logos in ``static/images/frameworks/`` are several hundred KB but
+are shown as small cards, so resized WebP variants are generated with Pillow
+(optional) and cached on disk next to them, named after the source content
+hash so an edited logo gets fresh variants. Templates use the
+``framework_image`` helper for ``src``/``srcset``/``sizes``; without Pillow
+it falls back to the original image.
+
+``python images.py`` pre-generates every variant and removes stale ones.
+"""
+
+import hashlib
+import os
+import threading
+
+try:
+    from PIL import Image
+except ImportError:  # optional: templates fall back to the original images
+    Image = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+SOURCE_DIR = 'images/frameworks'
+DERIVED_DIR = 'images/frameworks/derived'
+
+# Logo cards are 200 CSS pixels wide: 1x, 1.5x and 2x variants
+VARIANT_WIDTHS = (200, 300, 400)
+DISPLAY_SIZES = '200px'
+WEBP_QUALITY = 80
+
+_lock = threading.Lock()
+_variants = {}
+
+
+def source_filename(framework_id):
+    """Return the static filename of a framework's logo."""
+    return f"{SOURCE_DIR}/{framework_id}.webp"
+
+
+def _generate(source, source_hash, static_dir, widths):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    with Image.open(source) as image:
+        image.load()
+        source_width, source_height = image.size
+        variants = []
+        for width in widths:
+            if width >= source_width:
+                continue
+            filename = f"{DERIVED_DIR}/{stem}-{width}w.{source_hash}.webp"
+            path = os.path.join(static_dir, filename)
+            if not os.path.exists(path):
+                height = max(1, round(source_height * width / source_width))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                image.resize((width, height), Image.LANCZOS).save(
+                    tmp_path, 'WEBP', quality=WEBP_QUALITY, method=6)
+                os.replace(tmp_path, path)
+            variants.append((filename, width))
+    return variants
+
+
+def derive(filename, static_dir=STATIC_DIR, widths=VARIANT_WIDTHS):
+    """Return ``[(static filename, width), ...]`` of resized variants of a static image.
+
+    Missing variants are generated and written to disk; results are
+    remembered per source file version. Widths at or above the source width
+    are skipped. Returns ``[]`` when Pillow is not installed or the source
+    does not exist.
+    """
+    if Image is None:
+        return []
+    source = os.path.join(static_dir, filename)
+    try:
+        st = os.stat(source)
+    except OSError:
+        return []
+    key = (source, st.st_mtime_ns, st.st_size, tuple(widths))
+    variants = _variants.get(key)
+    if variants is None:
+        with _lock:
+            variants = _variants.get(key)
+            if variants is None:
+                with open(source, 'rb') as f:
+                    source_hash = hashlib.sha256(f.read()).hexdigest()[:10]
+                try:
+                    variants = _generate(source, source_hash, static_dir, widths)
+                except OSError:
+                    variants = []
+                _variants[key] = variants
+    return variants
+
+
+def framework_image(framework_id):
+    """Template helper returning ``src``, ``srcset`` and ``sizes`` for a framework logo."""
+    from flask import url_for
+
+    filename = source_filename(framework_id)
+    variants = derive(filename)
+    image = {'src': url_for('static', filename=filename), 'srcset': None, 'sizes': DISPLAY_SIZES}
+    if variants:
+        image['src'] = url_for('static', filename=variants[0][0])
+        image['srcset'] = ', '.join(f"{url_for('static', filename=name)} {width}w" for name, width in variants)
+    return image
+
+
+def init_app(app):
+    """Register the ``framework_image`` template helper."""
+    app.add_template_global(framework_image)
+
+
+def build(framework_ids, static_dir=STATIC_DIR):
+    """Generate the variants of every framework logo and delete stale ones.
+
+    Returns ``{framework_id: (source bytes, [(filename, bytes), ...])}``.
+    """
+    report = {}
+    keep = set()
+    for framework_id in framework_ids:
+        filename = source_filename(framework_id)
+        source = os.path.join(static_dir, filename)
+        if not os.path.exists(source):
+            continue
+        variants = derive(filename, static_dir)
+        keep.update(name for name, _ in variants)
+        report[framework_id] = (os.path.getsize(source),
+                                [(name, os.path.getsize(os.path.join(static_dir, name))) for name, _ in variants])
+
+    derived_dir = os.path.join(static_dir, DERIVED_DIR)
+    if os.path.isdir(derived_dir):
+        for name in os.listdir(derived_dir):
+            if f"{DERIVED_DIR}/{name}" not in keep:
+                os.remove(os.path.join(derived_dir, name))
+    return report
+
+
+def main():
+    from data.frameworks import get_all_frameworks
+
+    if Image is None:
+        raise SystemExit("Pillow is required to build image variants (pip install pillow)")
+    report = build(get_all_frameworks())
+    total_source = total_smallest = 0
+    for framework_id, (source_size, variants) in report.items():
+        sizes = ', '.join(f"{os.path.basename(name)} {size // 1024}KB" for name, size in variants)
+        print(f"{framework_id}: {source_size // 1024}KB -> {sizes or 'no smaller variant'}")
+        total_source += source_size
+        total_smallest += variants[0][1] if variants else source_size
+    print(f"Logos at 1x: {total_source // 1024}KB -> {total_smallest // 1024}KB")
+
+
+if __name__ == '__main__':
+    main()
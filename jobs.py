@@ -0,0 +1,42 @@
+"""
+Helpers shared by the background job modules (bulk reports, exports) and the
+per-process metrics files: job IDs, which also name files and directories,
+process liveness checks and the priority of worker processes.
+"""
+
+import os
+import re
+import uuid
+
+_JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+
+def new_job_id():
+    """Return a new random job ID."""
+    return uuid.uuid4().hex
+
+
+def is_job_id(job_id):
+    """Return True if ``job_id`` has the shape of a job ID, so it is safe to use in a path."""
+    return _JOB_ID.fullmatch(job_id) is not None
+
+
+def process_alive(pid):
+    """Return True if process ``pid`` exists (including ones this process may not signal)."""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def lower_priority():
+    """Run the calling worker process at lower CPU priority than the web workers."""
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
@@ -0,0 +1,359 @@
+"""
+Request timing and Prometheus-style metrics.
+Each process records counters, gauges and latency/size histograms in memory
+and periodically flushes them to its own JSON file in a shared directory;
+``/metrics`` merges every worker's file, so the numbers are correct behind a
+multi-worker gunicorn. When a process starts, the files of exited processes
+(including one left under its own, reused PID) are folded into a single
+retired file: their counters and histograms keep counting, so totals don't go
+backwards, and their gauges are dropped.
+"""
+
+import atexit
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from jobs import process_alive
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; concurrent process starts may then race
+    fcntl = None
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Counters and histograms of exited processes, merged
+RETIRED_FILE = 'metrics_retired.json'
+
+# PID of the process whose first registry already retired stale files (a forked child has another PID)
+_retired_pid = None
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by endpoint, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'Time from request start until the response is fully sent.',
+                                      LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Response body size of non-streamed responses.', SIZE_BUCKETS),
+    'app_span_duration_seconds': ('histogram', 'Time spent in instrumented code paths.', LATENCY_BUCKETS),
+    'cache_hits_total': ('counter', 'In-process cache hits.', None),
+    'cache_misses_total': ('counter', 'In-process cache misses.', None),
+    'cache_evictions_total': ('counter', 'In-process cache evictions.', None),
+    'cache_entries': ('gauge', 'Entries held by in-process caches.', None),
+    'cache_hit_ratio': ('gauge', 'Cache hits over lookups, across all workers.', None),
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Metrics of one process, with file-backed sharing between processes."""
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.retire_stale()
+            atexit.register(self.flush)
+
+    def inc(self, name, labels, amount=1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def register_collector(self, collector):
+        """Register ``collector()`` returning ``[(name, labels, value), ...]``, sampled at flush time.
+
+        Values of counter metrics are process totals and replace the
+        previous sample rather than being added to it.
+        """
+        self.collectors.append(collector)
+        return collector
+
+    def snapshot(self):
+        """Return this process's metrics as a JSON-serializable dict."""
+        sampled = {'counters': [], 'gauges': []}
+        for collector in self.collectors:
+            for name, labels, value in collector():
+                kind = 'gauges' if METRICS[name][0] == 'gauge' else 'counters'
+                sampled[kind].append([name, sorted(labels.items()), value])
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [[name, list(labels), dict(h, buckets=list(h['buckets']))]
+                          for (name, labels), h in self.histograms.items()]
+        return {
+            'pid': os.getpid(),
+            'counters': counters + sampled['counters'],
+            'gauges': sampled['gauges'],
+            'histograms': histograms
+        }
+
+    def flush(self, force=True):
+        """Write this process's metrics file, at most every ``flush_interval`` unless forced."""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        path = os.path.join(self.directory, f"metrics_{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def retire_stale(self):
+        """Fold the metrics files of exited processes into the retired file and delete them."""
+        global _retired_pid
+        # Until this process has retired once, a file under its PID was left by an exited process with the same PID
+        own_stale = _retired_pid != os.getpid()
+        _retired_pid = os.getpid()
+        lock = open(os.path.join(self.directory, '.lock'), 'w')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            retired_path = os.path.join(self.directory, RETIRED_FILE)
+            counters = {}
+            histograms = {}
+            stale = []
+            for filename in os.listdir(self.directory):
+                if not (filename.startswith('metrics_') and filename.endswith('.json')) or filename == RETIRED_FILE:
+                    continue
+                pid = filename[len('metrics_'):-len('.json')]
+                if pid.isdigit() and ((own_stale and int(pid) == os.getpid()) or not process_alive(int(pid))):
+                    stale.append(os.path.join(self.directory, filename))
+            if not stale:
+                return
+            for path in [retired_path] + stale:
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        _merge(json.load(f), counters, histograms)
+                except (OSError, ValueError):
+                    continue
+            tmp_path = f"{retired_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'pid': None,
+                    'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+                    'gauges': [],
+                    'histograms': [[name, list(labels), data] for (name, labels), data in histograms.items()]
+                }, f, separators=(',', ':'))
+            os.replace(tmp_path, retired_path)
+            for path in stale:
+                os.remove(path)
+        except OSError:
+            pass
+        finally:
+            lock.close()
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics_') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def collect(self):
+        """Merge the metrics of every worker into ``(counters, gauges, histograms)``."""
+        counters = {}
+        gauges = {}
+        histograms = {}
+        for snapshot in self._snapshots():
+            _merge(snapshot, counters, histograms)
+            if snapshot['pid'] is not None and process_alive(snapshot['pid']):
+                for name, labels, value in snapshot['gauges']:
+                    key = (name, tuple(map(tuple, labels)))
+                    gauges[key] = gauges.get(key, 0) + value
+
+        # Hit ratios are only meaningful from the summed counters
+        for (name, labels), hits in list(counters.items()):
+            if name == 'cache_hits_total':
+                lookups = hits + counters.get(('cache_misses_total', labels), 0)
+                gauges[('cache_hit_ratio', labels)] = round(hits / lookups, 4) if lookups else 0
+        return counters, gauges, histograms
+
+    def render(self):
+        """Render the merged metrics in the Prometheus text exposition format."""
+        counters, gauges, histograms = self.collect()
+        by_name = {}
+        for (name, labels), value in sorted(counters.items()):
+            by_name.setdefault(name, []).append(_sample(name, labels, value))
+        for (name, labels), value in sorted(gauges.items()):
+            by_name.setdefault(name, []).append(_sample(name, labels, value))
+        for (name, labels), data in sorted(histograms.items()):
+            lines = by_name.setdefault(name, [])
+            for bound, count in zip(METRICS[name][2], data['buckets']):
+                lines.append(_sample(f"{name}_bucket", labels + (('le', _format(bound)),), count))
+            lines.append(_sample(f"{name}_bucket", labels + (('le', '+Inf'),), data['count']))
+            lines.append(_sample(f"{name}_sum", labels, data['sum']))
+            lines.append(_sample(f"{name}_count", labels, data['count']))
+
+        output = []
+        for name in sorted(by_name):
+            kind, description, _ = METRICS[name]
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(by_name[name])
+        return '\n'.join(output) + '\n'
+
+
+def _merge(snapshot, counters, histograms):
+    """Add a snapshot's counters and histograms to the merged ``counters`` and ``histograms``."""
+    for name, labels, value in snapshot['counters']:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, data in snapshot['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = {'buckets': list(data['buckets']), 'sum': data['sum'], 'count': data['count']}
+        else:
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], data['buckets'])]
+            merged['sum'] += data['sum']
+            merged['count'] += data['count']
+
+
+def _format(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _sample(name, labels, value):
+    if labels:
+        label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+        return f"{name}{{{label_text}}} {_format(value)}"
+    return f"{name} {_format(value)}"
+
+
+registry = Registry()
+
+
+def configure(directory, flush_interval=1.0):
+    """Replace the process registry, sharing metrics through ``directory`` (None keeps them in process)."""
+    global registry
+    registry = Registry(directory, flush_interval)
+    return registry
+
+
+def register_collector(collector):
+    """Register a collector on the process registry; see ``Registry.register_collector``."""
+    return registry.register_collector(collector)
+
+
+@contextmanager
+def span(name):
+    """Record the duration of the enclosed block under ``app_span_duration_seconds{span=name}``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe('app_span_duration_seconds', {'span': name}, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of ``span``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cache_collector(name, cache):
+    """Return a collector publishing an ``LRUCache``'s counters under ``cache=name``."""
+    def collect():
+        stats = cache.stats()
+        labels = {'cache': name}
+        return [
+            ('cache_hits_total', labels, stats['hits']),
+            ('cache_misses_total', labels, stats['misses']),
+            ('cache_evictions_total', labels, stats['evictions']),
+            ('cache_entries', labels, stats['size'])
+        ]
+    return collect
+
+
+def init_app(app):
+    """Install request timing hooks and template rendering spans on ``app``."""
+    from flask import before_render_template, g, request, template_rendered
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get('metrics_start')
+        if start is None:
+            return response
+        labels = {
+            'endpoint': request.endpoint or 'none',
+            'method': request.method,
+            'status': str(response.status_code)
+        }
+        registry.inc('http_requests_total', labels)
+        if not response.is_streamed and response.content_length is not None:
+            registry.observe('http_response_size_bytes', {'endpoint': labels['endpoint']}, response.content_length)
+
+        # Streamed responses finish after this hook returns, so time until the response is closed
+        def finish():
+            registry.observe('http_request_duration_seconds', labels, time.perf_counter() - start)
+            registry.flush(force=False)
+        response.call_on_close(finish)
+        return response
+
+    def template_started(sender, template, context, **extra):
+        g.setdefault('metrics_templates', {})[template.name] = time.perf_counter()
+
+    def template_finished(sender, template, context, **extra):
+        start = g.get('metrics_templates', {}).pop(template.name, None)
+        if start is not None:
+            registry.observe('app_span_duration_seconds', {'span': f"render:{template.name}"},
+                             time.perf_counter() - start)
+
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
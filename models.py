@@ -0,0 +1,123 @@
+"""
+Persistent assessment storage.
+Each assessment keeps its selections, the full analytics snapshot and the
+headline scores as indexed columns, so history and trend queries read stored
+values instead of re-running the analytics.
+"""
+
+import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, insert, select
+
+db = SQLAlchemy()
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class Assessment(db.Model):
+    """A stored assessment with its analytics snapshot."""
+
+    __tablename__ = 'assessments'
+    __table_args__ = (
+        db.Index('ix_assessments_tenant_created', 'tenant', 'created_at'),
+        db.Index('ix_assessments_tenant_score', 'tenant', 'security_score'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tenant = db.Column(db.String(64), nullable=False, default='default')
+    label = db.Column(db.String(200))
+    selected_frameworks = db.Column(db.JSON, nullable=False)
+    selected_controls = db.Column(db.JSON, nullable=False)
+    catalog_version = db.Column(db.Integer, nullable=False)
+    security_score = db.Column(db.Integer, nullable=False)
+    coverage_percentage = db.Column(db.Float, nullable=False)
+    controls_implemented = db.Column(db.Integer, nullable=False)
+    total_controls = db.Column(db.Integer, nullable=False)
+    critical_missing = db.Column(db.Integer, nullable=False)
+    analytics = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
+
+    def to_dict(self, include_analytics=False):
+        """Return a JSON-serializable summary, optionally with the analytics snapshot."""
+        data = {
+            'id': self.id,
+            'tenant': self.tenant,
+            'label': self.label,
+            'selected_frameworks': self.selected_frameworks,
+            'controls_selected': len(self.selected_controls),
+            'catalog_version': self.catalog_version,
+            'security_score': self.security_score,
+            'coverage_percentage': self.coverage_percentage,
+            'controls_implemented': self.controls_implemented,
+            'total_controls': self.total_controls,
+            'critical_missing': self.critical_missing,
+            'created_at': self.created_at.isoformat()
+        }
+        if include_analytics:
+            data['selected_controls'] = self.selected_controls
+            data['analytics'] = self.analytics
+        return data
+
+
+def assessment_row(tenant, selected_frameworks, selected_controls, analytics, catalog_version, label=None):
+    """Build an insertable row dict, copying headline scores out of ``analytics``."""
+    return {
+        'tenant': tenant,
+        'label': label,
+        'selected_frameworks': list(selected_frameworks),
+        'selected_controls': list(selected_controls),
+        'catalog_version': catalog_version,
+        'security_score': analytics['security_score'],
+        'coverage_percentage': analytics['coverage_percentage'],
+        'controls_implemented': analytics['controls_implemented'],
+        'total_controls': analytics['total_controls'],
+        'critical_missing': analytics['risk_levels']['critical'],
+        'analytics': analytics,
+        'created_at': _utcnow()
+    }
+
+
+def bulk_insert_assessments(rows):
+    """Insert many assessment rows in a single executemany round trip."""
+    if rows:
+        db.session.execute(insert(Assessment), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def assessment_history(tenant, page=1, per_page=50):
+    """Return a page of a tenant's assessments, newest first."""
+    query = (select(Assessment)
+             .where(Assessment.tenant == tenant)
+             .order_by(Assessment.created_at.desc(), Assessment.id.desc()))
+    return db.paginate(query, page=page, per_page=per_page, max_per_page=500, error_out=False)
+
+
+def assessment_trend(tenant, since=None):
+    """Return daily score aggregates for a tenant from the stored score columns."""
+    day = func.date(Assessment.created_at)
+    query = (select(day.label('day'),
+                    func.count(Assessment.id),
+                    func.avg(Assessment.security_score),
+                    func.avg(Assessment.coverage_percentage),
+                    func.min(Assessment.security_score),
+                    func.max(Assessment.security_score))
+             .where(Assessment.tenant == tenant)
+             .group_by(day)
+             .order_by(day))
+    if since is not None:
+        query = query.where(Assessment.created_at >= since)
+    return [
+        {
+            'day': str(row[0]),
+            'assessments': row[1],
+            'average_score': round(float(row[2]), 2),
+            'average_coverage': round(float(row[3]), 2),
+            'min_score': row[4],
+            'max_score': row[5]
+        }
+        for row in db.session.execute(query)
+    ]
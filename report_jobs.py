@@ -0,0 +1,139 @@
+"""
+Bulk report generation on a process pool.
+Each report in a job is rendered in a worker process and written to disk,
+then the job's reports are packaged into a zip. Job status lives in a JSON
+file in the job directory so any web worker can answer progress polls.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from data.catalog import get_base_catalog
+from jobs import is_job_id, lower_priority, new_job_id
+
+
+def render_report_file(path, selected_frameworks, selected_controls, tenant=None, catalog_version=None):
+    """Render one report.html to ``path`` against ``tenant``'s catalog (default: the current one).
+
+    The shared catalog is first brought up to date with the data file, and
+    with ``catalog_version`` when the job was queued against another one.
+    """
+    from contextlib import nullcontext
+    from flask import render_template
+    from app import app, build_report_data, tenant_catalogs
+    from data.catalog import sync_catalog, use_catalog
+
+    sync_catalog(catalog_version)
+    scope = nullcontext() if tenant is None else use_catalog(tenant_catalogs.get(tenant))
+    with app.app_context(), scope:
+        report_data, _ = build_report_data(selected_frameworks, selected_controls)
+        html_content = render_template('report.html', **report_data)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+    return path
+
+
+def _safe_name(label):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(label)).strip('_')[:80] or 'report'
+
+
+class ReportJobManager:
+    """Submits bulk report jobs to a shared process pool and tracks their progress."""
+
+    def __init__(self, output_dir, max_workers=None):
+        self.output_dir = output_dir
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     initializer=lower_priority)
+            return self._executor
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.output_dir, job_id)
+
+    def _write_status(self, job_id, status):
+        path = os.path.join(self._job_dir(job_id), 'status.json')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(status, f)
+        os.replace(tmp_path, path)
+
+    def status(self, job_id):
+        """Return the status dict of a job, or None if it does not exist."""
+        if not is_job_id(job_id):
+            return None
+        try:
+            with open(os.path.join(self._job_dir(job_id), 'status.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def archive_path(self, job_id):
+        """Return the zip path of a finished job, or None."""
+        status = self.status(job_id)
+        if status is None or status['state'] != 'completed':
+            return None
+        return os.path.join(self._job_dir(job_id), 'reports.zip')
+
+    def submit(self, assessments, tenant=None):
+        """Start a job for ``[(label, selected_frameworks, selected_controls), ...]``; returns the job ID."""
+        job_id = new_job_id()
+        reports_dir = os.path.join(self._job_dir(job_id), 'reports')
+        os.makedirs(reports_dir)
+
+        status = {
+            'job_id': job_id,
+            'tenant': tenant,
+            'state': 'running',
+            'total': len(assessments),
+            'completed': 0,
+            'failed': 0,
+            'errors': [],
+            'created_at': time.time(),
+            'finished_at': None
+        }
+        self._write_status(job_id, status)
+
+        catalog_version = get_base_catalog().version
+        executor = self._get_executor()
+        status_lock = threading.Lock()
+        paths = []
+
+        def on_done(future):
+            with status_lock:
+                error = future.exception()
+                if error is None:
+                    status['completed'] += 1
+                else:
+                    status['failed'] += 1
+                    status['errors'].append(str(error))
+                if status['completed'] + status['failed'] == status['total']:
+                    self._package(job_id, paths)
+                    status['state'] = 'completed' if status['completed'] else 'failed'
+                    status['finished_at'] = time.time()
+                self._write_status(job_id, status)
+
+        for index, (label, selected_frameworks, selected_controls) in enumerate(assessments, 1):
+            path = os.path.join(reports_dir, f"{index:04d}_{_safe_name(label)}.html")
+            paths.append(path)
+            future = executor.submit(render_report_file, path, selected_frameworks, selected_controls, tenant,
+                                     catalog_version)
+            future.add_done_callback(on_done)
+        return job_id
+
+    def _package(self, job_id, paths):
+        archive = os.path.join(self._job_dir(job_id), 'reports.zip')
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for path in paths:
+                if os.path.exists(path):
+                    zf.write(path, os.path.basename(path))
@@ -0,0 +1,739 @@
+"""
+Bitset scoring engine for security analytics.
+Every applicable control is interned to an integer ID in sorted name order, so
+frameworks, selections and risk categories become Python int bitsets and the
+analytics reduce to mask algebra and popcounts. The security score itself
+comes from the configured scoring model (see ``scoring_model``). With NumPy
+installed, ``analyze_batch`` scores many assessments at once on stacked
+assessment x control matrices.
+"""
+
+import hashlib
+import heapq
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import repeat
+
+from classification import get_classification_index
+from data.catalog import get_catalog
+from scoring_model import SCORING_MODEL, CompiledModel, get_model_definition
+
+try:
+    import numpy as np
+except ImportError:  # optional: without it analyze_batch scores assessments one at a time
+    np = None
+
+
+def iter_bits(mask):
+    """Yield the set bit positions of ``mask`` in ascending order."""
+    bits = bin(mask)[:1:-1]
+    index = bits.find('1')
+    while index != -1:
+        yield index
+        index = bits.find('1', index + 1)
+
+
+def mask_from_ids(ids, size):
+    """Build a bitset from integer IDs in a single pass."""
+    bitmap = bytearray((size + 7) // 8)
+    for control_id in ids:
+        bitmap[control_id >> 3] |= 1 << (control_id & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+# Risk levels of missing controls, from most to least severe
+RISK_BUCKETS = ('critical', 'high', 'medium', 'low')
+
+# What every assessment of one framework selection shares: the applicable controls and their totals
+FrameworkContext = namedtuple('FrameworkContext', 'applicable applicable_bitmap framework_coverage selected_names '
+                                                  'total_applicable critical_applicable framework_masks '
+                                                  'model_applicable')
+
+# Per-control arrays of batch scoring: framework/bucket membership, critical flags, model weights and names
+BatchArrays = namedtuple('BatchArrays', 'framework_columns framework_sizes membership buckets critical weights '
+                                         'names')
+
+# Upper bound on the cells of the assessment x control matrix analyze_batch stacks at once
+BATCH_CHUNK_CELLS = 1 << 22
+
+
+class ScoringEngine:
+    """Control ID interning and precomputed masks for one catalog."""
+
+    def __init__(self, catalog, classification):
+        self.catalog = catalog
+        self.names = tuple(sorted(catalog.frameworks_by_control))
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.size = len(self.names)
+        self.fingerprint = hashlib.sha256('\n'.join(self.names).encode('utf-8')).hexdigest()[:16]
+
+        self.framework_masks = {
+            framework: self.mask_of(controls)
+            for framework, controls in catalog.controls_by_framework.items()
+        }
+        self.classification = classification
+        self.critical_mask = self.label_mask('critical')
+        self.technical_mask = self.label_mask('technical')
+        self.human_mask = self.label_mask('human')
+        self.governance_mask = self.label_mask('governance')
+        self.critical_bitmap = self._bitmap(self.critical_mask)
+
+        # Per-control facts for incremental scoring (AssessmentState)
+        labels = classification.labels
+        self.labels_by_id = tuple(labels[name] for name in self.names)
+        self.label_ids = {}
+        for control_id, control_labels in enumerate(self.labels_by_id):
+            for label in control_labels:
+                self.label_ids.setdefault(label, []).append(control_id)
+        self.frameworks_by_id = tuple(catalog.frameworks_by_control[name] for name in self.names)
+        self.framework_ids = {
+            framework: tuple(iter_bits(mask)) for framework, mask in self.framework_masks.items()
+        }
+        levels = {}
+        for level, mask in self.risk_masks().items():
+            for control_id in iter_bits(mask):
+                levels[control_id] = level
+        self.risk_level_by_id = tuple(levels.get(i, 'low') for i in range(self.size))
+        # Analytics bucket of each control: its risk level's position in RISK_BUCKETS, unclassified last
+        self.bucket_by_id = tuple(RISK_BUCKETS.index(levels[i]) if i in levels else len(RISK_BUCKETS)
+                                  for i in range(self.size))
+
+        # Equivalence groups: bitset of each group and the canonical control's ID of every member
+        self.group_masks = {}
+        self.canonical_ids = {}
+        for canonical, members in catalog.equivalents.items():
+            member_ids = [self.ids[member] for member in members]
+            self.group_masks[self.ids[canonical]] = mask_from_ids(member_ids, self.size)
+            for control_id in member_ids:
+                self.canonical_ids[control_id] = self.ids[canonical]
+        self.grouped_mask = mask_from_ids(self.canonical_ids, self.size)
+
+        # Lowercased names for substring search, plus a sorted copy for prefix search
+        self.lowered = tuple(name.lower() for name in self.names)
+        self._prefix_index = sorted(zip(self.lowered, range(self.size)))
+        self._prefix_keys = [key for key, _ in self._prefix_index]
+
+        self._models = {}
+        self.model = self.scoring_model()
+        self._batch = None
+
+    def scoring_model(self, name=None):
+        """Return scoring model ``name`` (default: the configured one) compiled for this engine."""
+        name = name or SCORING_MODEL
+        definition = get_model_definition(name)
+        model = self._models.get(name)
+        if model is None:
+            model = self._models[name] = CompiledModel(name, definition, self)
+        return model
+
+    def mask_of(self, controls):
+        """Return the bitset of the known controls in ``controls``."""
+        ids = self.ids
+        return mask_from_ids((ids[c] for c in controls if c in ids), self.size)
+
+    def mask_of_ids(self, control_ids):
+        """Return the bitset of control IDs."""
+        return mask_from_ids(control_ids, self.size)
+
+    def label_mask(self, label):
+        """Return the bitset of controls carrying a classification label."""
+        labels = self.classification.labels
+        return mask_from_ids((i for i, name in enumerate(self.names) if label in labels[name]), self.size)
+
+    def names_of(self, mask):
+        """Return the control names in ``mask``, in sorted order."""
+        names = self.names
+        return [names[i] for i in iter_bits(mask)]
+
+    def search(self, query, mask, prefix=False):
+        """Return the IDs in ``mask`` whose name contains ``query`` (or starts with it), in name order."""
+        if not query:
+            return list(iter_bits(mask))
+        query = query.lower()
+        if not prefix:
+            lowered = self.lowered
+            return [i for i in iter_bits(mask) if query in lowered[i]]
+        bitmap = self._bitmap(mask)
+        ids = []
+        index = bisect_left(self._prefix_keys, query)
+        while index < self.size and self._prefix_keys[index].startswith(query):
+            control_id = self._prefix_index[index][1]
+            if bitmap[control_id >> 3] >> (control_id & 7) & 1:
+                ids.append(control_id)
+            index += 1
+        ids.sort()
+        return ids
+
+    def canonical_of_ids(self, control_ids):
+        """Replace sorted control IDs by their canonical controls' IDs, once each, keeping ID order."""
+        canonical_ids = self.canonical_ids
+        if not canonical_ids:
+            return control_ids
+        ungrouped = []
+        canonical = set()
+        for control_id in control_ids:
+            canonical_id = canonical_ids.get(control_id)
+            if canonical_id is None:
+                ungrouped.append(control_id)
+            else:
+                canonical.add(canonical_id)
+        return list(heapq.merge(ungrouped, sorted(canonical))) if canonical else ungrouped
+
+    def collapse(self, mask):
+        """Return ``mask`` with each equivalence group's members replaced by its canonical control."""
+        grouped = mask & self.grouped_mask
+        if not grouped:
+            return mask
+        canonical_ids = self.canonical_ids
+        canonical = mask_from_ids({canonical_ids[control_id] for control_id in iter_bits(grouped)}, self.size)
+        return mask & ~self.grouped_mask | canonical
+
+    def risk_masks(self):
+        """Return the controls of each risk level; a control lands in the first matching category."""
+        critical = self.critical_mask
+        technical = self.technical_mask
+        human = self.human_mask
+        return {
+            'critical': critical,
+            'high': technical & ~critical,
+            'medium': human & ~critical & ~technical,
+            'low': self.governance_mask & ~critical & ~technical & ~human
+        }
+
+    def _bitmap(self, mask):
+        return mask.to_bytes((self.size + 7) // 8, 'little')
+
+    def framework_context(self, selected_frameworks):
+        """Resolve selected framework IDs into the masks and totals every assessment of them shares."""
+        controls_by_framework = self.catalog.controls_by_framework
+        framework_names = self.catalog.framework_names
+        applicable = 0
+        framework_coverage = {}
+        selected_names = []
+        framework_masks = []
+        for framework_id in selected_frameworks:
+            framework_name = framework_names.get(framework_id)
+            if framework_name:
+                mask = self.framework_masks[framework_name]
+                applicable |= mask
+                framework_coverage[framework_name] = len(controls_by_framework[framework_name])
+                selected_names.append(framework_name)
+                framework_masks.append((framework_name, mask, framework_coverage[framework_name]))
+        return FrameworkContext(applicable, self._bitmap(applicable), framework_coverage, selected_names,
+                                applicable.bit_count(), (applicable & self.critical_mask).bit_count(),
+                                framework_masks, self.model.applicable_totals(applicable))
+
+    def analyze(self, selected_frameworks, selected_controls, total_frameworks, context=None):
+        """Compute the analytics dict (without recommendations) for a selection.
+
+        Duplicate entries in ``selected_controls`` are kept in
+        ``implemented_controls`` but counted once per framework, and the
+        equivalents of selected controls count as selected. A ``context``
+        from ``framework_context`` may be passed to reuse it.
+        """
+        if context is None:
+            context = self.framework_context(selected_frameworks)
+        selected_controls = self.catalog.expand_controls(selected_controls)
+
+        # Implemented controls keep the submitted order
+        implemented_ids = self.implemented_ids(selected_controls, context.applicable_bitmap)
+        names = self.names
+        implemented_controls = [names[control_id] for control_id in implemented_ids]
+
+        selected = self.mask_of(selected_controls)
+        missing = context.applicable & ~selected
+
+        # Risk buckets: each missing control lands in the first matching category, in one pass
+        missing_controls = []
+        buckets = [[] for _ in range(len(RISK_BUCKETS) + 1)]
+        appends = [bucket.append for bucket in buckets]
+        bucket_by_id = self.bucket_by_id
+        for control_id in iter_bits(missing):
+            name = names[control_id]
+            missing_controls.append(name)
+            appends[bucket_by_id[control_id]](name)
+        unclassified = buckets.pop()
+        buckets[-1].extend(unclassified)
+
+        critical_bitmap = self.critical_bitmap
+        critical_implemented = sum(critical_bitmap[control_id >> 3] >> (control_id & 7) & 1
+                                   for control_id in implemented_ids)
+        framework_counts = [(framework_name, (selected & fw_mask).bit_count(), (missing & fw_mask).bit_count(),
+                             fw_total) for framework_name, fw_mask, fw_total in context.framework_masks]
+        return self._analytics(selected_frameworks, total_frameworks, context, implemented_controls,
+                               critical_implemented, self.model.implemented_totals(implemented_ids),
+                               missing_controls, buckets, framework_counts)
+
+    def _analytics(self, selected_frameworks, total_frameworks, context, implemented_controls, critical_implemented,
+                   model_implemented, missing_controls, buckets, framework_counts):
+        """Assemble the analytics dict of one assessment.
+
+        ``model_implemented`` holds the scoring model's implemented totals,
+        ``buckets`` the missing control names of each risk level in
+        ``RISK_BUCKETS`` order and ``framework_counts`` an ``(name,
+        implemented, missing, total)`` tuple per framework of ``context``.
+        """
+        total_applicable = context.total_applicable
+        critical_applicable = context.critical_applicable
+        implemented_count = len(implemented_controls)
+        coverage_percentage = round((implemented_count / total_applicable * 100), 2) if total_applicable > 0 else 0
+        security_score, _ = self.model.score(model_implemented, context.model_applicable, selected_frameworks)
+
+        missing_critical, missing_high, missing_medium, missing_low = buckets
+        risk_levels = {
+            'critical': len(missing_critical),
+            'high': len(missing_high),
+            'medium': len(missing_medium),
+            'low': len(missing_low)
+        }
+
+        framework_compliance = {}
+        framework_missing_controls = {}
+        for framework_name, fw_implemented, fw_missing, fw_total in framework_counts:
+            framework_compliance[framework_name] = round((fw_implemented / fw_total * 100), 2) if fw_total > 0 else 0
+            framework_missing_controls[framework_name] = fw_missing
+
+        return {
+            'security_score': security_score,
+            'coverage_percentage': coverage_percentage,
+            'frameworks_selected': len(selected_frameworks),
+            'total_frameworks': total_frameworks,
+            'controls_implemented': implemented_count,
+            'total_controls': total_applicable,
+            'missing_controls': missing_controls,
+            'missing_critical': missing_critical,
+            'missing_high': missing_high,
+            'missing_medium': missing_medium,
+            'missing_low': missing_low,
+            'implemented_controls': implemented_controls,
+            'framework_compliance': framework_compliance,
+            'framework_coverage': dict(context.framework_coverage),
+            'framework_missing_controls': framework_missing_controls,
+            'critical_controls_status': {
+                'implemented': critical_implemented,
+                'total': critical_applicable,
+                'percentage': round((critical_implemented / critical_applicable * 100), 2) if critical_applicable > 0 else 0
+            },
+            'risk_levels': risk_levels,
+            'risk_distribution': {
+                'technical_percent': round((len(missing_high) / len(missing_controls) * 100), 1) if missing_controls else 0,
+                'human_percent': round((len(missing_medium) / len(missing_controls) * 100), 1) if missing_controls else 0,
+                'governance_percent': round(((len(missing_critical) + len(missing_low)) / len(missing_controls) * 100), 1) if missing_controls else 0
+            }
+        }
+
+    def implemented_ids(self, selected_controls, applicable_bitmap):
+        """Return the IDs of the applicable controls in ``selected_controls``, in order and with duplicates."""
+        ids = self.ids
+        implemented = []
+        for control in selected_controls:
+            control_id = ids.get(control)
+            if control_id is not None and applicable_bitmap[control_id >> 3] >> (control_id & 7) & 1:
+                implemented.append(control_id)
+        return implemented
+
+    def compare(self, selected_frameworks, selected_controls, model_names):
+        """Score one selection under several scoring models.
+
+        Returns ``{model name: {'security_score': ..., 'components': {name: points}}}``;
+        the selection is resolved once and each model adds only its dot products.
+        """
+        context = self.framework_context(selected_frameworks)
+        implemented_ids = self.implemented_ids(self.catalog.expand_controls(selected_controls),
+                                               context.applicable_bitmap)
+        results = {}
+        for name in model_names:
+            security_score, points = self.scoring_model(name).evaluate(
+                implemented_ids, context.applicable, selected_frameworks)
+            results[name] = {'security_score': security_score, 'components': points}
+        return results
+
+    def analyze_batch(self, assessments, total_frameworks):
+        """Analyze many ``(selected_frameworks, selected_controls)`` pairs; each result equals ``analyze``'s.
+
+        Each distinct framework selection is resolved once into a context
+        shared by every assessment using it. With NumPy, assessments are then
+        scored in chunks: the missing controls of a chunk are stacked into one
+        assessment x control boolean matrix, whose product with the framework
+        and risk level membership matrix gives every per-framework and risk
+        level count of the chunk, and whose nonzero entries give all missing
+        control lists at once. Without NumPy each assessment is analyzed on
+        its own.
+        """
+        assessments = list(assessments)
+        contexts = {}
+        assessment_contexts = []
+        for selected_frameworks, _ in assessments:
+            key = tuple(selected_frameworks)
+            context = contexts.get(key)
+            if context is None:
+                context = contexts[key] = self.framework_context(selected_frameworks)
+            assessment_contexts.append(context)
+        if np is None:
+            return [self.analyze(selected_frameworks, selected_controls, total_frameworks, context=context)
+                    for (selected_frameworks, selected_controls), context in zip(assessments, assessment_contexts)]
+        results = []
+        step = max(1, BATCH_CHUNK_CELLS // max(self.size, 1))
+        for start in range(0, len(assessments), step):
+            results.extend(self._analyze_chunk(assessments[start:start + step],
+                                               assessment_contexts[start:start + step], total_frameworks))
+        return results
+
+    def _batch_arrays(self):
+        """Return the NumPy arrays of ``_analyze_chunk``, built on first use."""
+        if self._batch is None:
+            frameworks = list(self.framework_masks)
+            buckets = np.array(self.bucket_by_id, dtype=np.intp)
+            # One column per framework, then one per analytics bucket (unclassified last)
+            membership = np.zeros((self.size, len(frameworks) + len(RISK_BUCKETS) + 1), dtype=np.float32)
+            for column, framework in enumerate(frameworks):
+                membership[list(self.framework_ids[framework]), column] = 1
+            membership[np.arange(self.size), len(frameworks) + buckets] = 1
+            critical = np.unpackbits(np.frombuffer(self.critical_bitmap, dtype=np.uint8), count=self.size,
+                                     bitorder='little')
+            # Integer weights of the model's non-uniform components; fractional ones are summed per assessment
+            # so the float rounding matches ``analyze``
+            weights = {}
+            for index, item in self.model.control_components:
+                if item.uniform is None and all(float(weight).is_integer() for weight in item.vector):
+                    weights[index] = np.array(item.vector, dtype=np.int64)
+            self._batch = BatchArrays(
+                {framework: column for column, framework in enumerate(frameworks)},
+                {framework: len(control_ids) for framework, control_ids in self.framework_ids.items()},
+                membership, buckets, critical, weights, np.array(self.names, dtype=object))
+        return self._batch
+
+    def _analyze_chunk(self, assessments, contexts, total_frameworks):
+        """Analyze assessments whose stacked missing-control matrix fits in ``BATCH_CHUNK_CELLS``."""
+        arrays = self._batch_arrays()
+        size = self.size
+        count = len(assessments)
+        expand_controls = self.catalog.expand_controls
+        ids_get = self.ids.get
+
+        # Applicable controls of each distinct framework selection in the chunk, one row each
+        context_rows = {}
+        bitmaps = []
+        rows = []
+        for context in contexts:
+            row = context_rows.get(id(context))
+            if row is None:
+                row = context_rows[id(context)] = len(bitmaps)
+                bitmaps.append(context.applicable_bitmap)
+            rows.append(row)
+        applicable = np.unpackbits(np.frombuffer(b''.join(bitmaps), dtype=np.uint8).reshape(len(bitmaps), -1),
+                                   axis=1, count=size, bitorder='little').view(bool)
+
+        # Implemented controls as flat (assessment, control ID) arrays, in submitted order with duplicates
+        selected = [np.fromiter(map(ids_get, controls, repeat(-1)), dtype=np.intp, count=len(controls))
+                    for controls in map(expand_controls, (controls for _, controls in assessments))]
+        selected_rows = np.repeat(np.arange(count), [len(ids) for ids in selected])
+        selected_ids = np.concatenate(selected) if selected else np.empty(0, dtype=np.intp)
+        known = selected_ids >= 0
+        selected_rows = selected_rows[known]
+        selected_ids = selected_ids[known]
+        implemented = applicable[np.asarray(rows)[selected_rows], selected_ids]
+        implemented_rows = selected_rows[implemented]
+        implemented_ids = selected_ids[implemented]
+        implemented_bounds = np.searchsorted(implemented_rows, np.arange(count + 1)).tolist()
+        implemented_names = arrays.names[implemented_ids].tolist()
+        critical_implemented = np.bincount(implemented_rows, weights=arrays.critical[implemented_ids],
+                                           minlength=count).astype(np.int64).tolist()
+        implemented_counts = np.diff(implemented_bounds).tolist()
+        model_totals = {index: np.bincount(implemented_rows, weights=weights[implemented_ids],
+                                           minlength=count).astype(np.int64).tolist()
+                        for index, weights in arrays.weights.items()}
+
+        # Missing controls: each assessment's applicable row with its implemented controls cleared
+        missing = applicable[rows]
+        missing[implemented_rows, implemented_ids] = False
+        counts = (missing.view(np.uint8) @ arrays.membership).astype(np.int64).tolist()
+        missing_rows, missing_ids = np.nonzero(missing)
+        missing_names = arrays.names[missing_ids].tolist()
+        # The same names grouped by assessment, then bucket, keeping name order within a bucket
+        order = np.argsort(missing_rows * (len(RISK_BUCKETS) + 1) + arrays.buckets[missing_ids], kind='stable')
+        bucketed_names = arrays.names[missing_ids[order]].tolist()
+
+        components = self.model.components
+        framework_columns = arrays.framework_columns
+        framework_sizes = arrays.framework_sizes
+        bucket_offset = len(framework_columns)
+        results = []
+        start = 0
+        for row, ((selected_frameworks, _), context, row_counts) in enumerate(zip(assessments, contexts, counts)):
+            bucket_counts = row_counts[bucket_offset:]
+            end = start + sum(bucket_counts)
+            buckets = []
+            offset = start
+            for level_count in bucket_counts[:len(RISK_BUCKETS) - 1]:
+                buckets.append(bucketed_names[offset:offset + level_count])
+                offset += level_count
+            # Unclassified controls follow the low ones, as in ``analyze``
+            buckets.append(bucketed_names[offset:end])
+
+            framework_counts = []
+            for framework_name, _, fw_total in context.framework_masks:
+                fw_missing = row_counts[framework_columns[framework_name]]
+                framework_counts.append((framework_name, framework_sizes[framework_name] - fw_missing, fw_missing,
+                                         fw_total))
+
+            first, last = implemented_bounds[row], implemented_bounds[row + 1]
+            model_implemented = [None] * len(components)
+            for index, item in self.model.control_components:
+                if item.uniform is not None:
+                    model_implemented[index] = item.uniform * implemented_counts[row]
+                elif index in model_totals:
+                    model_implemented[index] = model_totals[index][row]
+                else:
+                    model_implemented[index] = item.implemented_total(implemented_ids[first:last].tolist())
+            results.append(self._analytics(selected_frameworks, total_frameworks, context,
+                                           implemented_names[first:last], critical_implemented[row],
+                                           model_implemented, missing_names[start:end], buckets, framework_counts))
+            start = end
+        return results
+
+
+class AssessmentState:
+    """Running counters for one assessment, updated in O(delta) per change.
+
+    Adding or removing a control touches only that control, or its
+    equivalence group and their frameworks when it is the group's first
+    selected or last deselected member; adding or removing a framework
+    touches only that framework's controls. ``summary`` reproduces the
+    headline figures of ``ScoringEngine.analyze`` (scores, per-framework
+    compliance, risk level counts) from the counters; the control name lists
+    are not maintained. Selections are treated as sets, so duplicate control
+    names count once.
+    """
+
+    def __init__(self, engine, selected_frameworks=(), selected_controls=()):
+        self.engine = engine
+        self.frameworks = []
+        # IDs of the controls as selected, the IDs credited (with equivalents) and selected members per group
+        self.chosen = set()
+        self.selected = set()
+        self.group_counts = {}
+        self.refs = {}
+        self.total_applicable = 0
+        self.implemented = 0
+        self.critical_applicable = 0
+        self.critical_implemented = 0
+        self.framework_implemented = {}
+        self.missing_levels = dict.fromkeys(('critical', 'high', 'medium', 'low'), 0)
+        self.missing_labels = dict.fromkeys(engine.label_ids, 0)
+        # Weighted implemented/applicable totals of the scoring model's control components
+        self.model_implemented = [0] * len(engine.model.components)
+        self.model_applicable = [0] * len(engine.model.components)
+        self.lock = threading.Lock()
+        self.apply(add_frameworks=selected_frameworks, add_controls=selected_controls)
+
+    def apply(self, add_controls=(), remove_controls=(), add_frameworks=(), remove_frameworks=()):
+        """Apply a selection delta."""
+        for framework_id in remove_frameworks:
+            self.remove_framework(framework_id)
+        for control in remove_controls:
+            self.remove_control(control)
+        for framework_id in add_frameworks:
+            self.add_framework(framework_id)
+        for control in add_controls:
+            self.add_control(control)
+
+    def _critical(self, control_id):
+        return self.engine.critical_bitmap[control_id >> 3] >> (control_id & 7) & 1
+
+    def _count_missing(self, control_id, step):
+        engine = self.engine
+        self.missing_levels[engine.risk_level_by_id[control_id]] += step
+        for label in engine.labels_by_id[control_id]:
+            self.missing_labels[label] += step
+
+    def _count_model(self, totals, control_id, step):
+        for index, item in self.engine.model.control_components:
+            totals[index] += step * item.vector[control_id]
+
+    def _count_implemented(self, control_id, step):
+        """Move an applicable control between implemented and missing."""
+        self.implemented += step
+        self.critical_implemented += step * self._critical(control_id)
+        self._count_model(self.model_implemented, control_id, step)
+        self._count_missing(control_id, -step)
+        framework_implemented = self.framework_implemented
+        for framework in self.engine.frameworks_by_id[control_id]:
+            if framework in framework_implemented:
+                framework_implemented[framework] += step
+
+    def _credit(self, control_id):
+        if control_id not in self.selected:
+            self.selected.add(control_id)
+            if self.refs.get(control_id):
+                self._count_implemented(control_id, 1)
+
+    def _uncredit(self, control_id):
+        if control_id in self.selected:
+            if self.refs.get(control_id):
+                self._count_implemented(control_id, -1)
+            self.selected.discard(control_id)
+
+    def add_control(self, control):
+        engine = self.engine
+        control_id = engine.ids.get(control)
+        if control_id is None or control_id in self.chosen:
+            return
+        self.chosen.add(control_id)
+        canonical_id = engine.canonical_ids.get(control_id)
+        if canonical_id is None:
+            self._credit(control_id)
+            return
+        count = self.group_counts.get(canonical_id, 0) + 1
+        self.group_counts[canonical_id] = count
+        if count == 1:
+            for member_id in iter_bits(engine.group_masks[canonical_id]):
+                self._credit(member_id)
+
+    def remove_control(self, control):
+        engine = self.engine
+        control_id = engine.ids.get(control)
+        if control_id is None or control_id not in self.chosen:
+            return
+        self.chosen.discard(control_id)
+        canonical_id = engine.canonical_ids.get(control_id)
+        if canonical_id is None:
+            self._uncredit(control_id)
+            return
+        count = self.group_counts[canonical_id] - 1
+        if count:
+            self.group_counts[canonical_id] = count
+            return
+        del self.group_counts[canonical_id]
+        for member_id in iter_bits(engine.group_masks[canonical_id]):
+            self._uncredit(member_id)
+
+    def _set_applicable(self, control_id, step):
+        """Count a control entering (``step`` 1) or leaving (-1) the applicable set."""
+        critical = self._critical(control_id)
+        self.total_applicable += step
+        self.critical_applicable += step * critical
+        self._count_model(self.model_applicable, control_id, step)
+        if control_id in self.selected:
+            self.implemented += step
+            self.critical_implemented += step * critical
+            self._count_model(self.model_implemented, control_id, step)
+        else:
+            self._count_missing(control_id, step)
+
+    def add_framework(self, framework_id):
+        if framework_id in self.frameworks:
+            return
+        self.frameworks.append(framework_id)
+        framework = self.engine.catalog.framework_names.get(framework_id)
+        if framework is None:
+            return
+        refs = self.refs
+        selected = self.selected
+        implemented = 0
+        for control_id in self.engine.framework_ids[framework]:
+            count = refs.get(control_id, 0) + 1
+            refs[control_id] = count
+            if count == 1:
+                self._set_applicable(control_id, 1)
+            implemented += control_id in selected
+        self.framework_implemented[framework] = implemented
+
+    def remove_framework(self, framework_id):
+        if framework_id not in self.frameworks:
+            return
+        self.frameworks.remove(framework_id)
+        framework = self.engine.catalog.framework_names.get(framework_id)
+        if framework is None:
+            return
+        refs = self.refs
+        for control_id in self.engine.framework_ids[framework]:
+            count = refs[control_id] - 1
+            if count:
+                refs[control_id] = count
+            else:
+                del refs[control_id]
+                self._set_applicable(control_id, -1)
+        del self.framework_implemented[framework]
+
+    def missing_with_label(self, label, limit):
+        """Return up to ``limit`` missing control names carrying ``label``, in name order."""
+        names = []
+        if not self.missing_labels.get(label):
+            return names
+        refs = self.refs
+        selected = self.selected
+        for control_id in self.engine.label_ids[label]:
+            if control_id in refs and control_id not in selected:
+                names.append(self.engine.names[control_id])
+                if len(names) == limit:
+                    break
+        return names
+
+    def framework_missing(self):
+        """Return ``[(framework_id, missing_count), ...]`` for the selected catalog frameworks."""
+        framework_names = self.engine.catalog.framework_names
+        framework_ids = self.engine.framework_ids
+        pairs = []
+        for framework_id in self.frameworks:
+            framework = framework_names.get(framework_id)
+            if framework:
+                pairs.append((framework_id, len(framework_ids[framework]) - self.framework_implemented[framework]))
+        return pairs
+
+    def summary(self, total_frameworks):
+        """Return the headline analytics figures, matching ``ScoringEngine.analyze``."""
+        controls_by_framework = self.engine.catalog.controls_by_framework
+        framework_names = self.engine.catalog.framework_names
+        framework_ids = self.engine.framework_ids
+        total_applicable = self.total_applicable
+        implemented = self.implemented
+        critical_applicable = self.critical_applicable
+        critical_implemented = self.critical_implemented
+        missing = total_applicable - implemented
+
+        coverage_percentage = round((implemented / total_applicable * 100), 2) if total_applicable > 0 else 0
+        security_score, _ = self.engine.model.score(self.model_implemented, self.model_applicable, self.frameworks)
+
+        framework_compliance = {}
+        framework_coverage = {}
+        framework_missing_controls = {}
+        for framework_id in self.frameworks:
+            framework = framework_names.get(framework_id)
+            if framework:
+                fw_total = len(controls_by_framework[framework])
+                fw_implemented = self.framework_implemented[framework]
+                framework_compliance[framework] = round((fw_implemented / fw_total * 100), 2) if fw_total > 0 else 0
+                framework_coverage[framework] = fw_total
+                framework_missing_controls[framework] = len(framework_ids[framework]) - fw_implemented
+
+        levels = self.missing_levels
+        return {
+            'security_score': security_score,
+            'coverage_percentage': coverage_percentage,
+            'frameworks_selected': len(self.frameworks),
+            'total_frameworks': total_frameworks,
+            'controls_implemented': implemented,
+            'total_controls': total_applicable,
+            'framework_compliance': framework_compliance,
+            'framework_coverage': framework_coverage,
+            'framework_missing_controls': framework_missing_controls,
+            'critical_controls_status': {
+                'implemented': critical_implemented,
+                'total': critical_applicable,
+                'percentage': round((critical_implemented / critical_applicable * 100), 2) if critical_applicable > 0 else 0
+            },
+            'risk_levels': dict(levels),
+            'risk_distribution': {
+                'technical_percent': round((levels['high'] / missing * 100), 1) if missing else 0,
+                'human_percent': round((levels['medium'] / missing * 100), 1) if missing else 0,
+                'governance_percent': round(((levels['critical'] + levels['low']) / missing * 100), 1) if missing else 0
+            }
+        }
+
+
+def get_engine():
+    """Return the scoring engine for the current catalog, building it on first use."""
+    return get_catalog().derived(
+        'engine', lambda catalog: ScoringEngine(catalog, get_classification_index(catalog)))
@@ -0,0 +1,251 @@
+"""
+Declarative scoring models.
+The security score is a sum of weighted components, defined per model in
+``data/scoring_models.json`` (or ``SCORING_MODELS_PATH``); ``SCORING_MODEL``
+names the one behind the analytics. A model lists its components (coverage
+of the applicable controls, coverage of a classification label such as
+'critical', framework alignment), optional per-control and per-framework
+weights, the label recommendations treat as critical and the score cap.
+Component types are registered with ``@component`` and can be added in code.
+
+A model is compiled against a scoring engine into one weight vector per
+control component, aligned to the engine's control IDs, so scoring an
+assessment is a dot product of its implemented IDs with each vector, and
+the applicable total a few popcounts. Any number of models compiled for the
+same engine can score one assessment side by side.
+"""
+
+import json
+import numbers
+import os
+
+SCORING_MODELS_PATH = os.environ.get(
+    'SCORING_MODELS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'scoring_models.json'))
+SCORING_MODEL = os.environ.get('SCORING_MODEL', 'default')
+
+
+class ScoringModelError(ValueError):
+    """Raised when a scoring model is malformed or unknown."""
+
+
+COMPONENTS = {}
+
+
+def component(kind):
+    """Register a component class under ``kind``, the ``type`` used in model definitions."""
+    def register(cls):
+        COMPONENTS[kind] = cls
+        return cls
+    return register
+
+
+class Component:
+    """One term of the security score, worth up to ``points``.
+
+    Components summed over controls set ``vector`` (weight per control ID);
+    ``score`` then receives the weighted totals of the implemented and the
+    applicable controls. Other components get None for both.
+    """
+
+    vector = None
+
+    def __init__(self, spec, model):
+        self.name = spec.get('name', spec['type'])
+        self.points = spec['points']
+
+    def bind(self, vector, engine):
+        """Use ``vector`` as this component's control weights on ``engine``."""
+        self.vector = tuple(vector)
+        self.uniform = self.vector[0] if self.vector and len(set(self.vector)) == 1 else None
+        ids_by_weight = {}
+        for control_id, weight in enumerate(self.vector):
+            if weight:
+                ids_by_weight.setdefault(weight, []).append(control_id)
+        self.levels = [(weight, engine.mask_of_ids(ids)) for weight, ids in ids_by_weight.items()]
+
+    def implemented_total(self, ids):
+        """Return the weight of the implemented control IDs (a list, duplicates counted)."""
+        if self.uniform is not None:
+            return self.uniform * len(ids)
+        return sum(map(self.vector.__getitem__, ids))
+
+    def applicable_total(self, applicable):
+        """Return the weight of the controls in the ``applicable`` bitset."""
+        if self.uniform is not None:
+            return self.uniform * applicable.bit_count()
+        return sum(weight * (applicable & mask).bit_count() for weight, mask in self.levels)
+
+    def score(self, implemented, applicable, selected_frameworks):
+        raise NotImplementedError
+
+
+@component('coverage')
+class CoverageComponent(Component):
+    """Implemented share of the applicable control weight, as a percentage rounded to two places."""
+
+    def __init__(self, spec, model):
+        super().__init__(spec, model)
+        self.bind(model.weights, model.engine)
+
+    def score(self, implemented, applicable, selected_frameworks):
+        percentage = round((implemented / applicable * 100), 2) if applicable > 0 else 0
+        return percentage * (self.points / 100)
+
+
+@component('label')
+class LabelComponent(Component):
+    """Implemented share of the applicable weight of the controls carrying a classification label."""
+
+    def __init__(self, spec, model):
+        super().__init__(spec, model)
+        label = spec['label']
+        engine = model.engine
+        if label not in engine.classification.matchers:
+            raise ScoringModelError(f"Unknown classification label {label!r} in model {model.name!r}")
+        self.bind((weight if label in labels else 0 for weight, labels in zip(model.weights, engine.labels_by_id)),
+                  engine)
+
+    def score(self, implemented, applicable, selected_frameworks):
+        return (implemented / applicable * self.points) if applicable > 0 else 0
+
+
+@component('frameworks')
+class FrameworksComponent(Component):
+    """``per_framework`` points per selected framework (scaled by its weight), capped at ``points``."""
+
+    def __init__(self, spec, model):
+        super().__init__(spec, model)
+        self.per_framework = spec.get('per_framework', 1)
+        self.framework_weights = model.framework_weights
+
+    def score(self, implemented, applicable, selected_frameworks):
+        weights = self.framework_weights
+        total = sum(weights.get(framework_id, 1) for framework_id in selected_frameworks)
+        return min(total * self.per_framework, self.points)
+
+
+def _check_weights(value, what):
+    if not isinstance(value, dict) or not all(
+            isinstance(weight, numbers.Real) and not isinstance(weight, bool) and weight >= 0
+            for weight in value.values()):
+        raise ScoringModelError(f"{what} must map names to non-negative numbers")
+
+
+def validate_models(doc):
+    """Check the structure of a parsed scoring models document, raising ScoringModelError."""
+    if not isinstance(doc, dict) or not doc:
+        raise ScoringModelError("Scoring models must be a non-empty JSON object")
+    for name, spec in doc.items():
+        if not isinstance(spec, dict):
+            raise ScoringModelError(f"Model {name!r} must be an object")
+        components = spec.get('components')
+        if not isinstance(components, list) or not components:
+            raise ScoringModelError(f"Model {name!r} needs a non-empty 'components' list")
+        names = set()
+        for item in components:
+            if not isinstance(item, dict) or item.get('type') not in COMPONENTS:
+                raise ScoringModelError(f"Model {name!r} has a component without a known 'type' "
+                                        f"({', '.join(sorted(COMPONENTS))})")
+            if not isinstance(item.get('points'), numbers.Real) or isinstance(item.get('points'), bool):
+                raise ScoringModelError(f"Components of model {name!r} need numeric 'points'")
+            if item['type'] == 'label' and not isinstance(item.get('label'), str):
+                raise ScoringModelError(f"Label components of model {name!r} need a 'label'")
+            component_name = item.get('name', item['type'])
+            if component_name in names:
+                raise ScoringModelError(f"Model {name!r} has two components named {component_name!r}")
+            names.add(component_name)
+        _check_weights(spec.get('control_weights', {}), f"'control_weights' of model {name!r}")
+        _check_weights(spec.get('framework_weights', {}), f"'framework_weights' of model {name!r}")
+
+
+def load_models(path=None):
+    """Load and validate the scoring models file; returns ``{name: definition}``."""
+    with open(path or SCORING_MODELS_PATH, encoding='utf-8') as f:
+        doc = json.load(f)
+    validate_models(doc)
+    return doc
+
+
+_models = None
+
+
+def get_model_definition(name=None):
+    """Return the definition of model ``name`` (default: ``SCORING_MODEL``), loading the file on first use."""
+    global _models
+    if _models is None:
+        _models = load_models()
+    name = name or SCORING_MODEL
+    try:
+        return _models[name]
+    except KeyError:
+        raise ScoringModelError(f"Unknown scoring model {name!r}") from None
+
+
+def model_names():
+    """Return the names of the configured models."""
+    get_model_definition()
+    return list(_models)
+
+
+class CompiledModel:
+    """A scoring model bound to one engine's control IDs."""
+
+    def __init__(self, name, spec, engine):
+        self.name = name
+        self.engine = engine
+        self.max_score = spec.get('max_score', 100)
+        self.recommendation_label = spec.get('recommendation_label', 'recommendation_critical')
+        if self.recommendation_label not in engine.classification.matchers:
+            raise ScoringModelError(f"Unknown classification label {self.recommendation_label!r} in model {name!r}")
+        self.framework_weights = dict(spec.get('framework_weights', {}))
+
+        # Control weight: its own weight times the largest weight of its frameworks
+        catalog = engine.catalog
+        control_weights = spec.get('control_weights', {})
+        by_catalog_name = {catalog.framework_names[framework_id]: weight
+                           for framework_id, weight in self.framework_weights.items()
+                           if framework_id in catalog.framework_names}
+        weights = []
+        for control, frameworks in zip(engine.names, engine.frameworks_by_id):
+            weight = control_weights.get(control, 1)
+            if by_catalog_name:
+                weight *= max(by_catalog_name.get(framework, 1) for framework in frameworks)
+            weights.append(weight)
+        self.weights = tuple(weights)
+
+        self.components = [COMPONENTS[item['type']](item, self) for item in spec['components']]
+        self.control_components = [(index, item) for index, item in enumerate(self.components)
+                                   if item.vector is not None]
+
+    def implemented_totals(self, implemented_ids):
+        """Return the per-component weight list of the implemented control IDs."""
+        totals = [None] * len(self.components)
+        for index, item in self.control_components:
+            totals[index] = item.implemented_total(implemented_ids)
+        return totals
+
+    def applicable_totals(self, applicable):
+        """Return the per-component weight list of the ``applicable`` bitset."""
+        totals = [None] * len(self.components)
+        for index, item in self.control_components:
+            totals[index] = item.applicable_total(applicable)
+        return totals
+
+    def totals(self, implemented_ids, applicable):
+        """Return per-component ``(implemented, applicable)`` weight lists for an assessment."""
+        return self.implemented_totals(implemented_ids), self.applicable_totals(applicable)
+
+    def score(self, implemented, applicable, selected_frameworks):
+        """Return ``(security score, {component name: points})`` from per-component totals."""
+        points = {}
+        total = 0
+        for index, item in enumerate(self.components):
+            value = item.score(implemented[index], applicable[index], selected_frameworks)
+            points[item.name] = value
+            total += value
+        return min(int(total), self.max_score), points
+
+    def evaluate(self, implemented_ids, applicable, selected_frameworks):
+        """Score implemented control IDs against the ``applicable`` bitset."""
+        implemented, applicable_totals = self.totals(implemented_ids, applicable)
+        return self.score(implemented, applicable_totals, selected_frameworks)
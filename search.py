@@ -0,0 +1,295 @@
+"""
+Server-side search over controls and frameworks.
+An inverted index maps each token to the documents containing it, with
+per-document weights (name matches count more than description matches, rare
+tokens more than common ones). Query tokens match indexed terms exactly, by
+prefix, or fuzzily through a trigram index over the vocabulary, so typos like
+"encrpytion" still find "Encryption". Framework names are not indexed on every
+control, which would give them posting lists as long as the framework;
+instead a query token naming a framework boosts the controls that already
+matched and belong to it. Controls are indexed by name only: the catalog
+carries descriptions for frameworks but not for controls.
+"""
+
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from data.catalog import get_catalog
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Field weights per document type
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Score added to a matched control per query token naming one of its frameworks
+FRAMEWORK_WEIGHT = 1.0
+
+# Match quality multipliers
+PREFIX_QUALITY = 0.7
+FUZZY_QUALITY = 0.5
+FUZZY_MIN_SIMILARITY = 0.4
+MAX_EXPANSIONS = 50
+MAX_FUZZY_TERMS = 10
+# Fuzzy expansions per token of a multi-word query, where each one adds a posting list to score
+MAX_QUERY_FUZZY_TERMS = 3
+
+# Results ranked in one tier are all scored when there are at most this many per result still needed
+TIER_SCAN_RATIO = 4
+
+
+def tokenize(text):
+    """Lowercase ``text`` and split it into alphanumeric tokens."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def trigrams(term):
+    """Return the set of boundary-padded trigrams of ``term``."""
+    padded = f"^{term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Token and trigram inverted index over a catalog's controls and frameworks."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.documents = []
+        weights = defaultdict(dict)
+
+        def add(document, fields):
+            doc_id = len(self.documents)
+            self.documents.append(document)
+            for text, weight in fields:
+                tokens = tokenize(text)
+                # Shorter fields are more specific: "Encryption" outranks "Data Protection & Encryption"
+                weight /= math.sqrt(len(tokens) or 1)
+                for token in tokens:
+                    postings = weights[token]
+                    postings[doc_id] = postings.get(doc_id, 0.0) + weight
+
+        for framework_id, framework in catalog.frameworks.items():
+            add({'type': 'framework', 'id': framework_id, 'name': framework['name'],
+                 'description': framework['description']},
+                [(framework['name'], NAME_WEIGHT), (framework['catalog_name'], NAME_WEIGHT),
+                 (framework['description'], DESCRIPTION_WEIGHT)])
+        for control, frameworks in catalog.frameworks_by_control.items():
+            add({'type': 'control', 'id': control, 'name': control, 'frameworks': list(frameworks)},
+                [(control, NAME_WEIGHT)])
+
+        # Token -> catalog names of the frameworks whose name contains it
+        framework_terms = defaultdict(set)
+        for framework in catalog.frameworks.values():
+            for token in tokenize(f"{framework['name']} {framework['catalog_name']}"):
+                framework_terms[token].add(framework['catalog_name'])
+        self.framework_terms = {token: frozenset(names) for token, names in framework_terms.items()}
+
+        # Fold inverse document frequency into the posting weights and order
+        # each posting list by descending weight so single-token queries can
+        # stop after the first ``limit`` documents
+        total = len(self.documents)
+        self.postings = {}
+        for token, postings in weights.items():
+            idf = math.log(1 + total / len(postings))
+            self.postings[token] = sorted(((doc_id, weight * idf) for doc_id, weight in postings.items()),
+                                          key=lambda posting: (-posting[1], -posting[0]))
+
+        # Per term: the set of its documents and their weights, for multi-token queries
+        self.term_docs = {term: frozenset(weights[term]) for term in self.postings}
+        self.term_weights = {term: dict(postings) for term, postings in self.postings.items()}
+        type_docs = defaultdict(set)
+        framework_docs = defaultdict(set)
+        for doc_id, document in enumerate(self.documents):
+            type_docs[document['type']].add(doc_id)
+            for framework in document.get('frameworks', ()):
+                framework_docs[framework].add(doc_id)
+        self.type_docs = {doc_type: frozenset(docs) for doc_type, docs in type_docs.items()}
+        self.framework_docs = {framework: frozenset(docs) for framework, docs in framework_docs.items()}
+
+        self.vocabulary = sorted(self.postings)
+        self.trigram_index = defaultdict(list)
+        self.trigram_counts = {}
+        for term in self.vocabulary:
+            grams = trigrams(term)
+            self.trigram_counts[term] = len(grams)
+            for gram in grams:
+                self.trigram_index[gram].append(term)
+
+    def _expand(self, token, max_fuzzy=MAX_FUZZY_TERMS):
+        """Return ``[(term, quality), ...]`` for the indexed terms matching ``token``.
+
+        At most ``max_fuzzy`` fuzzy matches are returned, the most similar first.
+        """
+        matches = []
+        if token in self.postings:
+            matches.append((token, 1.0))
+        index = bisect_left(self.vocabulary, token)
+        vocabulary = self.vocabulary
+        while index < len(vocabulary) and len(matches) < MAX_EXPANSIONS and vocabulary[index].startswith(token):
+            if vocabulary[index] != token:
+                matches.append((vocabulary[index], PREFIX_QUALITY))
+            index += 1
+        if matches or len(token) < 3:
+            return matches
+
+        # Fuzzy: vocabulary terms sharing enough trigrams with the token
+        grams = trigrams(token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for term in self.trigram_index.get(gram, ()):
+                shared[term] += 1
+        candidates = []
+        for term, count in shared.items():
+            similarity = count / (len(grams) + self.trigram_counts[term] - count)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                candidates.append((similarity, term))
+        return [(term, FUZZY_QUALITY * similarity)
+                for similarity, term in heapq.nlargest(max_fuzzy, candidates)]
+
+    def search(self, query, limit=20, doc_type=None):
+        """Return up to ``limit`` ranked results for ``query``.
+
+        Documents matching more of the query tokens rank first; ``doc_type``
+        restricts results to ``'control'`` or ``'framework'``.
+
+        Matches are grouped into tiers by matched token count with set
+        operations over the per-term document sets, and only the tiers needed
+        to fill ``limit`` results are scored. In a large tier, the documents
+        matching a single token (plus framework boosts) are read off that
+        token's weight-ordered postings instead of being scored one by one.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        if len(tokens) == 1 and tokens[0] not in self.framework_terms:
+            return self._search_token(tokens[0], limit, doc_type)
+        max_fuzzy = MAX_FUZZY_TERMS if len(tokens) == 1 else MAX_QUERY_FUZZY_TERMS
+        expansions = [self._expand(token, max_fuzzy) for token in tokens]
+        allowed = None if doc_type is None else self.type_docs.get(doc_type, frozenset())
+
+        # Documents of each token, and per framework-naming token the matched controls it boosts
+        token_docs = []
+        for matches in expansions:
+            if len(matches) == 1:
+                docs = self.term_docs[matches[0][0]]
+            else:
+                docs = frozenset().union(*(self.term_docs[term] for term, _ in matches))
+            token_docs.append(docs if allowed is None else docs & allowed)
+        boosts = []
+        for token in tokens:
+            names = self.framework_terms.get(token)
+            if names:
+                boosts.append(frozenset().union(*(docs & self.framework_docs.get(name, frozenset())
+                                                  for docs in token_docs for name in names)))
+
+        # levels[k] holds the documents in at least k + 1 of the match sets. The
+        # union of them all, levels[0], is only built if the last tier is reached.
+        match_sets = token_docs + boosts
+        levels = []
+        for position, docs in enumerate(match_sets, 1):
+            if not levels:
+                new_levels = [docs]
+            else:
+                new_levels = [levels[0] | docs if position < len(match_sets) else None]
+                for k in range(1, len(levels)):
+                    new_levels.append(levels[k] | (levels[k - 1] & docs))
+                new_levels.append(levels[-1] & docs)
+            while len(new_levels) > 1 and not new_levels[-1]:
+                new_levels.pop()
+            levels = new_levels
+
+        term_weights = self.term_weights
+
+        def score(doc_id):
+            total = 0.0
+            for matches, docs in zip(expansions, token_docs):
+                if doc_id in docs:
+                    total += max(term_weights[term].get(doc_id, 0.0) * quality for term, quality in matches)
+            for docs in boosts:
+                if doc_id in docs:
+                    total += FRAMEWORK_WEIGHT
+            return total
+
+        # Documents matching two or more tokens, as opposed to one token plus framework boosts
+        shared = None
+        ranked = []
+        for count in range(len(levels), 0, -1):
+            if levels[count - 1] is None:
+                levels[count - 1] = frozenset().union(*token_docs)
+            tier = levels[count - 1] - levels[count] if count < len(levels) else levels[count - 1]
+            needed = limit - len(ranked)
+            if len(tier) <= needed * TIER_SCAN_RATIO:
+                candidates = [(score(doc_id), doc_id) for doc_id in tier]
+            else:
+                if shared is None:
+                    shared = frozenset().union(*(docs & other for i, docs in enumerate(token_docs)
+                                                 for other in token_docs[i + 1:]))
+                candidates = [(score(doc_id), doc_id) for doc_id in tier & shared]
+                single = tier - shared
+                for matches, docs in zip(expansions, token_docs):
+                    docs = single & docs
+                    if len(docs) <= needed * TIER_SCAN_RATIO:
+                        candidates.extend((score(doc_id), doc_id) for doc_id in docs)
+                    else:
+                        candidates.extend(self._top_matches(matches, docs, needed, count - 1))
+            ranked.extend((count, doc_score, doc_id) for doc_score, doc_id in heapq.nlargest(needed, candidates))
+            if len(ranked) >= limit:
+                break
+        documents = self.documents
+        return [dict(documents[doc_id], score=round(doc_score, 4), matched_terms=count)
+                for count, doc_score, doc_id in ranked]
+
+    def _top_matches(self, matches, docs, limit, boosts):
+        """``[(score, doc_id), ...]`` for the top ``limit`` documents of ``docs`` matching one token.
+
+        Each document in ``docs`` matches one query token and ``boosts``
+        framework names, so its score is the token's best match plus the
+        same boosts for all of them, and its token's merged stream yields it
+        in score order.
+        """
+        results = []
+        for doc_score, doc_id in self._merged(matches):
+            if doc_id in docs:
+                for _ in range(boosts):
+                    doc_score += FRAMEWORK_WEIGHT
+                results.append((doc_score, doc_id))
+                if len(results) == limit:
+                    break
+        return results
+
+    def _merged(self, matches):
+        """Yield ``(score, doc_id)`` once per document of ``matches`` with its best score, best first."""
+        def stream(postings, quality):
+            for doc_id, weight in postings:
+                yield -weight * quality, -doc_id
+
+        seen = set()
+        for negative_score, negative_id in heapq.merge(*(stream(self.postings[term], quality)
+                                                         for term, quality in matches)):
+            if negative_id not in seen:
+                seen.add(negative_id)
+                yield -negative_score, -negative_id
+
+    def _search_token(self, token, limit, doc_type):
+        """Top ``limit`` documents for one token, merging its weight-ordered posting lists.
+
+        A document's first appearance in the merged stream carries its best
+        score over the token's expansions, so the scan stops after ``limit``
+        distinct documents instead of visiting every posting.
+        """
+        documents = self.documents
+        results = []
+        for doc_score, doc_id in self._merged(self._expand(token)):
+            if doc_type is None or documents[doc_id]['type'] == doc_type:
+                results.append(dict(documents[doc_id], score=round(doc_score, 4), matched_terms=1))
+                if len(results) == limit:
+                    break
+        return results
+
+
+def get_search_index():
+    """Return the search index for the current catalog, building it on first use."""
+    return get_catalog().derived('search', SearchIndex)
@@ -0,0 +1,236 @@
+"""
+Server-side session storage.
+The session cookie only carries an opaque random session ID; the session data
+lives in a pluggable backend (SQLite by default, in-memory for tests, or
+PostgreSQL). Control selections are stored as compact control-ID bitsets
+rather than lists of control names.
+"""
+
+import itertools
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+import metrics
+from scoring import get_engine
+
+# Session keys holding lists of control names, stored as bitsets
+BITSET_KEYS = ('selected_controls',)
+
+# Persistent stores delete expired sessions once every this many saves per process
+PURGE_EVERY_SAVES = 100
+
+
+def encode_session(data):
+    """Serialize session data, packing control lists into hex bitsets."""
+    engine = get_engine()
+    payload = dict(data)
+    for key in BITSET_KEYS:
+        if key in payload:
+            payload[key] = {
+                'bitset': format(engine.mask_of(payload[key]), 'x'),
+                'catalog': engine.fingerprint
+            }
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def decode_session(raw):
+    """Deserialize session data written by ``encode_session``.
+
+    Selections stored against a catalog with a different set of controls
+    cannot be mapped back to names and are dropped.
+    """
+    engine = get_engine()
+    payload = json.loads(raw)
+    for key in BITSET_KEYS:
+        value = payload.get(key)
+        if isinstance(value, dict):
+            if value.get('catalog') == engine.fingerprint:
+                payload[key] = engine.names_of(int(value['bitset'], 16))
+            else:
+                del payload[key]
+    return payload
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict tracking modifications, identified by an opaque ID."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class MemorySessionStore:
+    """Process-local session store, intended for tests and development."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            raw, expires = entry
+            if expires < time.time():
+                del self._data[sid]
+                return None
+            return raw
+
+    def save(self, sid, raw, expires):
+        with self._lock:
+            self._data[sid] = (raw, expires)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+
+class SQLiteSessionStore:
+    """Session store backed by a local SQLite file shared by all workers.
+
+    Expired sessions are deleted at startup and every ``PURGE_EVERY_SAVES`` saves.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions '
+                         '(sid TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)')
+            conn.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),))
+        self._saves = itertools.count(1)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def load(self, sid):
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM sessions WHERE sid = ? AND expires >= ?',
+                               (sid, time.time())).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, raw, expires):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)',
+                         (sid, raw, expires))
+            if next(self._saves) % PURGE_EVERY_SAVES == 0:
+                conn.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),))
+
+    def delete(self, sid):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+
+class PostgresSessionStore:
+    """Session store backed by PostgreSQL through psycopg2."""
+
+    def __init__(self, dsn, minconn=1, maxconn=10):
+        from psycopg2.pool import ThreadedConnectionPool
+        self.pool = ThreadedConnectionPool(minconn, maxconn, dsn)
+        self._execute('CREATE TABLE IF NOT EXISTS sessions '
+                      '(sid TEXT PRIMARY KEY, data BYTEA NOT NULL, expires DOUBLE PRECISION NOT NULL)')
+        self._execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)')
+        self._saves = itertools.count(1)
+
+    def _execute(self, sql, params=(), fetch=False):
+        conn = self.pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchone() if fetch else None
+        finally:
+            self.pool.putconn(conn)
+
+    def load(self, sid):
+        row = self._execute('SELECT data FROM sessions WHERE sid = %s AND expires >= %s',
+                            (sid, time.time()), fetch=True)
+        return bytes(row[0]) if row else None
+
+    def save(self, sid, raw, expires):
+        self._execute('INSERT INTO sessions (sid, data, expires) VALUES (%s, %s, %s) '
+                      'ON CONFLICT (sid) DO UPDATE SET data = EXCLUDED.data, expires = EXCLUDED.expires',
+                      (sid, raw, expires))
+        if next(self._saves) % PURGE_EVERY_SAVES == 0:
+            self._execute('DELETE FROM sessions WHERE expires < %s', (time.time(),))
+
+    def delete(self, sid):
+        self._execute('DELETE FROM sessions WHERE sid = %s', (sid,))
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface storing data in ``store`` and only the ID in the cookie."""
+
+    def __init__(self, store):
+        self.store = store
+
+    @metrics.timed('session_open')
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            raw = self.store.load(sid)
+            if raw is not None:
+                try:
+                    return ServerSideSession(decode_session(raw), sid=sid)
+                except (ValueError, KeyError):
+                    pass
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    @metrics.timed('session_save')
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.accessed:
+            response.vary.add('Cookie')
+        if not self.should_set_cookie(app, session):
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        self.store.save(session.sid, encode_session(session), time.time() + lifetime)
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+
+def create_session_interface(app, backend):
+    """Build the session interface for ``backend``: 'sqlite', 'memory' or 'postgres'."""
+    if backend == 'memory':
+        store = MemorySessionStore()
+    elif backend == 'sqlite':
+        path = os.environ.get('SESSION_SQLITE_PATH', os.path.join(app.instance_path, 'sessions.sqlite3'))
+        store = SQLiteSessionStore(path)
+    elif backend == 'postgres':
+        store = PostgresSessionStore(os.environ['DATABASE_URL'])
+    else:
+        raise ValueError(f"Unknown session backend: {backend}")
+    return ServerSideSessionInterface(store)
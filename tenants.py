@@ -0,0 +1,180 @@
+"""
+Per-tenant catalog overlays.
+One deployment serves several business units, each seeing the base catalog
+through an overlay read from ``data/tenants.json`` (or ``TENANTS_PATH``):
+
+    {"payments": {"frameworks": ["pci_dss", "soc2"],
+                  "add_controls": {"PCI-DSS v4.0": ["Cardholder Data Tokenization"]},
+                  "remove_controls": ["Physical Security"],
+                  "critical_controls": ["Encryption at Rest", "Cardholder Data Tokenization"]}}
+
+All keys are optional: ``frameworks`` restricts the tenant to a subset of
+framework IDs, ``add_controls`` appends controls to the named control lists,
+``remove_controls`` drops controls everywhere and ``critical_controls``
+replaces the critical list of scoring. A tenant's merged catalog, with its
+inverse mapping, classification index and scoring engine, is built on first
+use and kept in an LRU by tenant, so a request costs the same however many
+tenants are configured. Tenants without an overlay use the base catalog.
+
+Requests are attributed to a tenant by its API key (see
+``parse_tenant_keys``), never by a client-supplied tenant name alone.
+"""
+
+import hashlib
+import json
+import os
+
+from cache import LRUCache
+from classification import get_classification_index
+from data.catalog import Catalog, CatalogError, check_strings, get_base_catalog
+
+TENANTS_PATH = os.environ.get('TENANTS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           'data', 'tenants.json'))
+
+OVERLAY_KEYS = ('frameworks', 'add_controls', 'remove_controls', 'critical_controls')
+
+
+def validate_overlays(doc, catalog=None):
+    """Check a parsed tenants document, raising CatalogError.
+
+    With ``catalog``, the framework IDs and the control lists named by
+    ``add_controls`` must also exist in it, and added controls may only go
+    to control lists of the tenant's frameworks.
+    """
+    if not isinstance(doc, dict):
+        raise CatalogError("Tenants file must be a JSON object")
+    for tenant, overlay in doc.items():
+        if not isinstance(overlay, dict):
+            raise CatalogError(f"Tenant {tenant!r} must be an object")
+        unknown = set(overlay) - set(OVERLAY_KEYS)
+        if unknown:
+            raise CatalogError(f"Tenant {tenant!r} has unknown keys: {', '.join(sorted(unknown))}")
+        for key in ('frameworks', 'remove_controls', 'critical_controls'):
+            if key in overlay:
+                check_strings(overlay[key], f"{key!r} of tenant {tenant!r}")
+        add_controls = overlay.get('add_controls', {})
+        if not isinstance(add_controls, dict):
+            raise CatalogError(f"'add_controls' of tenant {tenant!r} must be an object")
+        for framework, controls in add_controls.items():
+            check_strings(controls, f"Added controls of {framework!r} for tenant {tenant!r}")
+        if catalog is not None:
+            _check_overlay_targets(tenant, overlay, catalog)
+
+
+def _check_overlay_targets(tenant, overlay, catalog):
+    selected = overlay.get('frameworks')
+    if selected is None:
+        selected = list(catalog.frameworks)
+    unknown = [framework_id for framework_id in selected if framework_id not in catalog.frameworks]
+    if unknown:
+        raise CatalogError(f"Tenant {tenant!r} selects unknown frameworks: {', '.join(unknown)}")
+    control_lists = {catalog.framework_names[framework_id] for framework_id in selected}
+    for framework in overlay.get('add_controls', {}):
+        if framework not in control_lists:
+            raise CatalogError(f"Tenant {tenant!r} adds controls to {framework!r}, "
+                               f"which is not the control list of one of its frameworks")
+
+
+def parse_tenant_keys(value):
+    """Parse ``"tenant:key,tenant:key"`` into ``{SHA-256 hex digest of key: tenant}``, raising ValueError.
+
+    A tenant may have several keys (e.g. while rotating them); only digests
+    are kept, so ``tenant_of_key`` compares digests rather than the secrets.
+    """
+    keys = {}
+    for entry in filter(None, (item.strip() for item in value.split(','))):
+        tenant, _, key = entry.partition(':')
+        if not tenant or not key:
+            raise ValueError(f"Tenant API keys must be 'tenant:key' pairs, got {entry!r}")
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        if keys.setdefault(digest, tenant) != tenant:
+            raise ValueError(f"Tenants {keys[digest]!r} and {tenant!r} share an API key")
+    return keys
+
+
+def tenant_of_key(keys, key):
+    """Return the tenant of API ``key`` in ``keys`` (from ``parse_tenant_keys``), or None."""
+    return keys.get(hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+
+def load_overlays(path=None):
+    """Load and validate the tenant overlays against the base catalog; a missing file means no tenants."""
+    path = path or TENANTS_PATH
+    try:
+        with open(path, encoding='utf-8') as f:
+            doc = json.load(f)
+    except FileNotFoundError:
+        return {}
+    validate_overlays(doc, get_base_catalog())
+    return doc
+
+
+def overlay_version(base_version, overlay):
+    """Return the version of the catalog ``overlay`` makes of the base catalog version ``base_version``."""
+    payload = json.dumps([base_version, overlay], sort_keys=True, separators=(',', ':'))
+    return int(hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12], 16)
+
+
+def apply_overlay(base, overlay):
+    """Return catalog ``base`` as seen through a tenant ``overlay``.
+
+    The version is derived from the base version and the overlay, so caches
+    keyed on catalog versions keep tenants apart and workers agree on it.
+    """
+    selected = overlay.get('frameworks')
+    frameworks = {framework_id: framework for framework_id, framework in base.frameworks.items()
+                  if selected is None or framework_id in selected}
+    removed = set(overlay.get('remove_controls', ()))
+    added = overlay.get('add_controls', {})
+
+    controls_by_framework = {}
+    extra_controls = []
+    for framework in frameworks.values():
+        catalog_name = framework['catalog_name']
+        controls = [control for control in base.controls_by_framework[catalog_name] if control not in removed]
+        controls.extend(added.get(catalog_name, ()))
+        controls_by_framework[catalog_name] = list(dict.fromkeys(controls))
+        extra_controls.extend(added.get(catalog_name, ()))
+    all_controls = dict.fromkeys(control for control in base.all_controls if control not in removed)
+    all_controls.update(dict.fromkeys(extra_controls))
+
+    mapped = {control for controls in controls_by_framework.values() for control in controls}
+    equivalences = [[control for control in group if control in mapped] for group in base.equivalences]
+
+    return Catalog(frameworks, all_controls, controls_by_framework, version=overlay_version(base.version, overlay),
+                   critical_controls=overlay.get('critical_controls'),
+                   equivalences=[group for group in equivalences if len(group) > 1])
+
+
+class TenantCatalogs:
+    """Merged catalogs of the tenants with an overlay, built on first use and kept in an LRU."""
+
+    def __init__(self, overlays, maxsize=64):
+        self.overlays = overlays
+        self.views = LRUCache(maxsize=maxsize)
+
+    def get(self, tenant):
+        """Return ``tenant``'s catalog, or the base catalog if it has no overlay."""
+        base = get_base_catalog()
+        overlay = self.overlays.get(tenant)
+        if overlay is None:
+            return base
+        return self.views.get_or_compute((tenant, base.version), lambda: self._build(base, overlay))
+
+    @staticmethod
+    def _build(base, overlay):
+        catalog = apply_overlay(base, overlay)
+        get_classification_index(catalog)
+        return catalog
+
+    def versions(self, base):
+        """Return the catalog versions of the tenants with an overlay over catalog ``base``."""
+        return [overlay_version(base.version, overlay) for overlay in self.overlays.values()]
+
+    def clear(self):
+        """Drop every merged catalog, e.g. after the base catalog changed."""
+        self.views.clear()
+
+    def stats(self):
+        """Return the LRU's size and hit/miss counters."""
+        return self.views.stats()
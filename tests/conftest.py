@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+import pytest
+
+# Keep the app's state in memory and under a scratch directory, set before app.py is imported
+_instance = tempfile.mkdtemp(prefix='assessment-tests-')
+os.environ.setdefault('SESSION_BACKEND', 'memory')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('METRICS_DIR', '')
+os.environ.setdefault('REPORT_JOBS_DIR', os.path.join(_instance, 'report_jobs'))
+os.environ.setdefault('EXPORT_JOBS_DIR', os.path.join(_instance, 'exports'))
+os.environ.setdefault('EXPORT_WORKERS', '0')
+os.environ.setdefault('TENANT_API_KEYS', 'payments:payments-key,retail:retail-key')
+
+
+@pytest.fixture
+def client():
+    from app import app
+
+    return app.test_client()
+
+
+@pytest.fixture
+def assessed_client(client):
+    """A client whose session holds a framework and control selection."""
+    with client.session_transaction() as session:
+        session['selected_frameworks'] = ['nist_csf', 'soc2']
+        session['selected_controls'] = ['Encryption at Rest', 'Incident Response Plan']
+    return client
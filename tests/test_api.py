@@ -0,0 +1,105 @@
+import pytest
+
+from app import BATCH_MAX_ITEMS
+
+ASSESSMENT = {'frameworks': ['nist_csf'], 'controls': ['Asset Inventory']}
+
+MALFORMED_BODIES = [
+    [ASSESSMENT],
+    {'assessments': []},
+    {'assessments': [ASSESSMENT, ['nist_csf']]},
+    {'assessments': [{'frameworks': ['nist_csf'], 'controls': [['Encryption at Rest']]}]},
+    {'assessments': [{'frameworks': [{'id': 'nist_csf'}], 'controls': []}]},
+    {'assessments': [{'frameworks': 'nist_csf', 'controls': []}]},
+    {'assessments': [dict(ASSESSMENT, label={'name': 'x'})]},
+]
+
+
+@pytest.mark.parametrize('body', MALFORMED_BODIES)
+def test_create_assessments_rejects_malformed_bodies(client, body):
+    assert client.post('/api/assessments', json=body).status_code == 400
+
+
+def test_create_assessments_caps_the_batch(client):
+    body = {'assessments': [ASSESSMENT] * (BATCH_MAX_ITEMS + 1)}
+    assert client.post('/api/assessments', json=body).status_code == 413
+
+
+def test_create_assessments(client):
+    response = client.post('/api/assessments', json={'assessments': [dict(ASSESSMENT, label='unit')]})
+    assert response.status_code == 201
+    assert response.get_json()['created'] == 1
+
+
+@pytest.mark.parametrize('days', [999999999, -5, 0])
+def test_trend_clamps_days(client, days):
+    response = client.get(f'/api/assessments/trend?days={days}')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('body', MALFORMED_BODIES)
+def test_batch_assessment_rejects_malformed_bodies(client, body):
+    assert client.post('/api/batch_assessment', json=body).status_code == 400
+
+
+def test_batch_assessment(client):
+    response = client.post('/api/batch_assessment', json={'assessments': [dict(ASSESSMENT, id='org-1')]})
+    assert response.status_code == 200
+    [result] = response.get_json()['results']
+    assert result['id'] == 'org-1'
+    assert result['analytics']['controls_implemented'] == 1
+
+
+@pytest.mark.parametrize('body', MALFORMED_BODIES + [{}, {'assessment_ids': []}])
+def test_bulk_report_job_rejects_malformed_bodies(client, body):
+    assert client.post('/api/reports/bulk', json=body).status_code == 400
+
+
+def test_bulk_report_job_rejects_foreign_assessment_ids(client):
+    assert client.post('/api/reports/bulk', json={'assessment_ids': [10 ** 9]}).status_code == 404
+
+
+def as_tenant(tenant, **headers):
+    return dict(headers, Authorization=f'Bearer {tenant}-key')
+
+
+def test_tenants_cannot_read_each_others_assessments(client):
+    body = {'assessments': [dict(ASSESSMENT, label='payments only')]}
+    assert client.post('/api/assessments', json=body, headers=as_tenant('payments')).status_code == 201
+    [assessment] = client.get('/api/assessments', headers=as_tenant('payments')).get_json()['assessments']
+    assert assessment['tenant'] == 'payments'
+    path = f"/api/assessments/{assessment['id']}"
+    assert client.get(path, headers=as_tenant('payments')).status_code == 200
+
+    assert client.get(path, headers=as_tenant('retail')).status_code == 404
+    assert client.get(path).status_code == 404
+    retail = client.get('/api/assessments', headers=as_tenant('retail')).get_json()
+    assert 'payments only' not in [a['label'] for a in retail['assessments']]
+
+
+@pytest.mark.parametrize('headers', [
+    {'X-Tenant-ID': 'payments'},
+    as_tenant('retail', **{'X-Tenant-ID': 'payments'}),
+    {'Authorization': 'Bearer not-a-key'},
+])
+def test_unauthenticated_tenant_claims_are_refused(client, headers):
+    assert client.get('/api/assessments', headers=headers).status_code == 403
+
+
+def test_bulk_report_jobs_are_private_to_their_tenant(client):
+    response = client.post('/api/reports/bulk', json={'assessments': [ASSESSMENT]}, headers=as_tenant('payments'))
+    status_url = response.get_json()['status_url']
+    assert client.get(status_url, headers=as_tenant('payments')).status_code == 200
+    assert client.get(status_url, headers=as_tenant('retail')).status_code == 404
+
+
+@pytest.mark.parametrize('body', [[], {'add_controls': 'Asset Inventory'}, {'remove_frameworks': [1]}])
+def test_analytics_delta_rejects_malformed_bodies(client, body):
+    assert client.post('/api/analytics/delta', json=body).status_code == 400
+
+
+def test_analytics_delta(client):
+    response = client.post('/api/analytics/delta', json={'frameworks': ['nist_csf'],
+                                                         'add_controls': ['Asset Inventory']})
+    assert response.status_code == 200
+    assert response.get_json()['analytics']['controls_implemented'] == 1
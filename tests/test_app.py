@@ -0,0 +1,18 @@
+import gzip
+import zlib
+
+
+def test_download_report_streams_gzip_in_several_chunks(assessed_client):
+    response = assessed_client.get('/download_report', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename="cybersecurity_assessment_report_')
+    chunks = list(response.response)
+    # The document starts arriving before rendering ends, not in one block at the end
+    assert len(chunks) > 2
+    assert zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(chunks[0]).lstrip().startswith(b'<!DOCTYPE')
+    assert b'</html>' in gzip.decompress(b''.join(chunks))
+
+
+def test_download_report_without_assessment(client):
+    assert client.get('/download_report').status_code == 400
@@ -0,0 +1,37 @@
+import pytest
+
+from assets import minify_css, minify_js
+
+
+@pytest.mark.parametrize('source, expected', [
+    # A regex after a keyword, with a quote inside it, followed by a string holding '//'
+    ('function f(x) {\n  return /a\\/b"c/.test(x) && "http://example.com";\n}\n',
+     'function f(x){\nreturn/a\\/b"c/.test(x)&&"http://example.com";\n}\n'),
+    ('if (typeof /x/ === "object") {}\n', 'if(typeof/x/==="object"){}\n'),
+    ('switch (s) { case /[/]"/.test(s): break }\n', 'switch(s){case/[/]"/.test(s):break}\n'),
+    ('var r = x.match(/\\d+/g);\n', 'var r=x.match(/\\d+/g);\n'),
+    # Division after identifiers, closing brackets and property names that look like keywords
+    ('var a = b / c / d;\n', 'var a=b/c/d;\n'),
+    ('var a = (b) / 2, c = d[0] / 3;\n', 'var a=(b)/2,c=d[0]/3;\n'),
+    ('y = z.return / 2;\n', 'y=z.return/2;\n'),
+    ('y = total / typeofCount;\n', 'y=total/typeofCount;\n'),
+])
+def test_minify_js_regex_and_division(source, expected):
+    assert minify_js(source) == expected
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('var u = "a//b /* c */"; // comment\n', 'var u="a//b /* c */";\n'),
+    ("var s = 'it\\'s // not a comment';\n", "var s='it\\'s // not a comment';\n"),
+    ('var t = `line ${a / b} // kept`;\n', 'var t=`line ${a / b} // kept`;\n'),
+    ('/*! license */\n/* dropped */\nvar a = 1;\n', '/*! license */\nvar a=1;\n'),
+    ('a = b\n++c\n', 'a=b\n++c\n'),
+    ('a = b + +c - -d;\n', 'a=b+ +c- -d;\n'),
+])
+def test_minify_js_strings_comments_and_line_breaks(source, expected):
+    assert minify_js(source) == expected
+
+
+def test_minify_css():
+    source = '/* note */\n.a , .b > p {\n  color: red;\n  margin: 0 auto;\n}\n/*! keep */'
+    assert minify_css(source) == '.a,.b>p{color:red;margin:0 auto}/*! keep */'
@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+from app import export_queue
+
+
+@pytest.fixture
+def worker_pool(monkeypatch):
+    """Run the app's exports on one worker process, as configured by default."""
+    monkeypatch.setattr(export_queue, 'workers', 1)
+    monkeypatch.setattr(export_queue, '_executor', None)
+    yield
+    if export_queue._executor is not None:
+        export_queue._executor.shutdown()
+
+
+def export(client, export_format='csv'):
+    """Queue an export and wait for it; returns its job status."""
+    job = client.post('/api/exports', json={'format': export_format}).get_json()
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        status = client.get(job['status_url']).get_json()['job']
+        if status['state'] not in ('queued', 'running'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Export {job['job_id']} did not finish")
+
+
+def test_exports_run_in_a_worker_process(assessed_client, worker_pool):
+    status = export(assessed_client)
+    assert status['state'] == 'completed'
+    with sqlite3.connect(export_queue.path) as conn:
+        [(worker_pid,)] = conn.execute('SELECT worker_pid FROM export_jobs WHERE job_id = ?', (status['job_id'],))
+    assert worker_pid != os.getpid()
+
+    response = assessed_client.get(f"/api/exports/{status['job_id']}/download")
+    assert response.status_code == 200
+    assert response.data.startswith(b'Framework,Control,Status')
+
+
+def test_download_of_a_deleted_export(assessed_client, worker_pool, monkeypatch):
+    status = export(assessed_client)
+    os.remove(export_queue.output_path(status))
+    assert assessed_client.get(f"/api/exports/{status['job_id']}/download").status_code == 404
+
+    monkeypatch.setattr(export_queue, 'max_age', -1)
+    export_queue.cleanup()
+    assert assessed_client.get(f"/api/exports/{status['job_id']}/download").status_code == 404
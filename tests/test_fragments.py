@@ -0,0 +1,40 @@
+import os
+
+from data.catalog import get_base_catalog, get_catalog
+from fragments import FragmentCache
+from tenants import TenantCatalogs
+
+
+def test_fragments_are_keyed_on_the_asset_build(tmp_path):
+    directory = str(tmp_path)
+    before = FragmentCache(directory=directory, asset_version='build1')
+    assert before.get_or_render('grid', ['nist_csf'], lambda: 'app.build1.css') == 'app.build1.css'
+
+    # A worker of the next deploy shares the directory but links to the new build
+    after = FragmentCache(directory=directory, asset_version='build2')
+    assert after.get_or_render('grid', ['nist_csf'], lambda: 'app.build2.css') == 'app.build2.css'
+    assert after.disk_hits == 0
+
+    after.invalidate(get_catalog().version)
+    assert os.listdir(directory) == [after.generation(get_catalog().version)]
+
+
+def test_fragments_are_shared_through_the_directory(tmp_path):
+    first = FragmentCache(directory=str(tmp_path), asset_version='build1')
+    first.get_or_render('grid', ['nist_csf'], lambda: 'rendered')
+    second = FragmentCache(directory=str(tmp_path), asset_version='build1')
+    assert second.get_or_render('grid', ['nist_csf'], lambda: 'rendered again') == 'rendered'
+    assert second.disk_hits == 1
+
+
+def test_invalidate_keeps_the_generations_of_tenant_catalogs(tmp_path):
+    base = get_base_catalog()
+    tenants = TenantCatalogs({'payments': {'frameworks': ['pci_dss']}, 'retail': {'remove_controls': ['Encryption']}})
+    cache = FragmentCache(directory=str(tmp_path))
+    live = [base.version] + tenants.versions(base)
+    assert sorted(live[1:]) == sorted(tenants.get(tenant).version for tenant in ('payments', 'retail'))
+    for version in live + [12345]:
+        cache._write(cache.generation(version), 'grid', 'rendered')
+
+    cache.invalidate(*live)
+    assert sorted(os.listdir(str(tmp_path))) == sorted(cache.generation(version) for version in live)
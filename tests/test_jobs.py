@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+from jobs import is_job_id, new_job_id, process_alive
+
+
+def test_job_ids():
+    assert is_job_id(new_job_id())
+    assert not is_job_id('../' + new_job_id()[3:])
+    assert not is_job_id(new_job_id().upper())
+
+
+def test_process_alive():
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    assert process_alive(os.getpid())
+    assert not process_alive(process.pid)
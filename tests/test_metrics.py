@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+import metrics
+
+
+def dead_pid():
+    """Return the PID of a process that has exited."""
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+
+def write_snapshot(directory, pid, requests, entries):
+    with open(os.path.join(directory, f"metrics_{pid}.json"), 'w', encoding='utf-8') as f:
+        json.dump({
+            'pid': pid,
+            'counters': [['http_requests_total', [['endpoint', 'index']], requests]],
+            'gauges': [['cache_entries', [['cache', 'analytics']], entries]],
+            'histograms': []
+        }, f)
+
+
+def test_exited_processes_are_retired_at_startup(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, '_retired_pid', None)
+    directory = str(tmp_path)
+    write_snapshot(directory, dead_pid(), requests=5, entries=7)
+    # Left behind by an exited process that had this process's PID
+    write_snapshot(directory, os.getpid(), requests=3, entries=11)
+
+    registry = metrics.Registry(directory)
+    assert sorted(os.listdir(directory)) == ['.lock', metrics.RETIRED_FILE]
+    registry.inc('http_requests_total', {'endpoint': 'index'})
+    counters, gauges, _ = registry.collect()
+    assert counters[('http_requests_total', (('endpoint', 'index'),))] == 9
+    assert ('cache_entries', (('cache', 'analytics'),)) not in gauges
+
+    # A later start folds into the same retired file without counting it twice
+    write_snapshot(directory, dead_pid(), requests=1, entries=1)
+    registry.flush()
+    metrics.Registry(directory)
+    counters, _, _ = registry.collect()
+    assert counters[('http_requests_total', (('endpoint', 'index'),))] == 10
@@ -0,0 +1,60 @@
+import json
+import shutil
+import time
+import zipfile
+
+import pytest
+
+import data.catalog
+from data.catalog import get_base_catalog, maybe_reload_catalog, request_catalog_reload, set_catalog
+from report_jobs import ReportJobManager
+
+NEW_CONTROL = 'Quantum Firewall Review'
+
+
+@pytest.fixture
+def catalog_path(tmp_path, monkeypatch):
+    """A copy of the catalog data file that the shared catalog is loaded from."""
+    original = get_base_catalog()
+    path = tmp_path / 'catalog.json'
+    shutil.copy(data.catalog.CATALOG_PATH, path)
+    monkeypatch.setattr(data.catalog, 'CATALOG_PATH', str(path))
+    request_catalog_reload()
+    maybe_reload_catalog()
+    yield path
+    set_catalog(original)
+
+
+def wait_for(manager, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = manager.status(job_id)
+        if status['state'] != 'running':
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def render(manager):
+    job_id = manager.submit([('report', ['nist_csf'], ['Asset Inventory'])])
+    assert wait_for(manager, job_id)['state'] == 'completed'
+    with zipfile.ZipFile(manager.archive_path(job_id)) as zf:
+        return zf.read('0001_report.html').decode('utf-8')
+
+
+def test_pool_workers_render_with_the_reloaded_catalog(catalog_path, tmp_path):
+    manager = ReportJobManager(str(tmp_path / 'jobs'), max_workers=1)
+    try:
+        # The first job starts the worker process with the catalog as it is now
+        assert NEW_CONTROL not in render(manager)
+
+        doc = json.loads(catalog_path.read_text(encoding='utf-8'))
+        doc['controls'].append(NEW_CONTROL)
+        doc['controls_by_framework']['NIST CSF'].append(NEW_CONTROL)
+        catalog_path.write_text(json.dumps(doc), encoding='utf-8')
+        request_catalog_reload()
+        assert maybe_reload_catalog()
+
+        assert NEW_CONTROL in render(manager)
+    finally:
+        manager._get_executor().shutdown()
@@ -0,0 +1,234 @@
+import random
+
+import pytest
+
+import scoring
+from classification import (CRITICAL_CONTROLS, GOVERNANCE_KEYWORDS, HUMAN_KEYWORDS, TECHNICAL_KEYWORDS,
+                            get_classification_index)
+from data.catalog import Catalog, get_base_catalog
+from scoring import AssessmentState, ScoringEngine, get_engine
+from scoring_model import CompiledModel
+
+
+def baseline_analytics(catalog, selected_frameworks, selected_controls, total_frameworks):
+    """The list-scanning analytics the bitset engine replaced, minus recommendations."""
+    controls_by_framework = catalog.controls_by_framework
+    applicable_controls = set()
+    framework_coverage = {}
+    for framework_id in selected_frameworks:
+        framework_name = catalog.framework_names.get(framework_id)
+        if framework_name and framework_name in controls_by_framework:
+            applicable_controls.update(controls_by_framework[framework_name])
+            framework_coverage[framework_name] = len(controls_by_framework[framework_name])
+    applicable_controls = sorted(applicable_controls)
+    total_applicable = len(applicable_controls)
+
+    implemented_controls = [c for c in selected_controls if c in applicable_controls]
+    implemented_count = len(implemented_controls)
+    missing_controls = [c for c in applicable_controls if c not in selected_controls]
+    coverage_percentage = round((implemented_count / total_applicable * 100), 2) if total_applicable > 0 else 0
+
+    def matches(control, keywords):
+        return any(keyword.lower() in control.lower() for keyword in keywords)
+
+    critical_implemented = sum(1 for c in implemented_controls if matches(c, CRITICAL_CONTROLS))
+    critical_applicable = sum(1 for c in applicable_controls if matches(c, CRITICAL_CONTROLS))
+    critical_score = (critical_implemented / critical_applicable * 30) if critical_applicable > 0 else 0
+    security_score = min(int(coverage_percentage * 0.6 + critical_score + min(len(selected_frameworks) * 2, 10)),
+                         100)
+
+    missing_critical = [c for c in missing_controls if matches(c, CRITICAL_CONTROLS)]
+    missing_high = [c for c in missing_controls if matches(c, TECHNICAL_KEYWORDS) and c not in missing_critical]
+    missing_medium = [c for c in missing_controls if matches(c, HUMAN_KEYWORDS)
+                      and c not in missing_critical and c not in missing_high]
+    missing_low = [c for c in missing_controls if matches(c, GOVERNANCE_KEYWORDS)
+                   and c not in missing_critical and c not in missing_high and c not in missing_medium]
+    missing_low.extend(c for c in missing_controls if c not in missing_critical and c not in missing_high
+                       and c not in missing_medium and c not in missing_low)
+
+    framework_compliance = {}
+    framework_missing_controls = {}
+    for framework_id in selected_frameworks:
+        framework_name = catalog.framework_names.get(framework_id)
+        if framework_name in controls_by_framework:
+            fw_controls = controls_by_framework[framework_name]
+            fw_implemented = len([c for c in selected_controls if c in fw_controls])
+            framework_compliance[framework_name] = round((fw_implemented / len(fw_controls) * 100), 2)
+            framework_missing_controls[framework_name] = len([c for c in missing_controls if c in fw_controls])
+
+    def percent(part):
+        return round((part / len(missing_controls) * 100), 1) if missing_controls else 0
+
+    return {
+        'security_score': security_score,
+        'coverage_percentage': coverage_percentage,
+        'frameworks_selected': len(selected_frameworks),
+        'total_frameworks': total_frameworks,
+        'controls_implemented': implemented_count,
+        'total_controls': total_applicable,
+        'missing_controls': missing_controls,
+        'missing_critical': missing_critical,
+        'missing_high': missing_high,
+        'missing_medium': missing_medium,
+        'missing_low': missing_low,
+        'implemented_controls': implemented_controls,
+        'framework_compliance': framework_compliance,
+        'framework_coverage': framework_coverage,
+        'framework_missing_controls': framework_missing_controls,
+        'critical_controls_status': {
+            'implemented': critical_implemented,
+            'total': critical_applicable,
+            'percentage': round((critical_implemented / critical_applicable * 100), 2) if critical_applicable > 0 else 0
+        },
+        'risk_levels': {
+            'critical': len(missing_critical),
+            'high': len(missing_high),
+            'medium': len(missing_medium),
+            'low': len(missing_low)
+        },
+        'risk_distribution': {
+            'technical_percent': percent(len(missing_high)),
+            'human_percent': percent(len(missing_medium)),
+            'governance_percent': percent(len(missing_critical) + len(missing_low))
+        }
+    }
+
+
+@pytest.fixture(scope='module')
+def plain_catalog():
+    """The shipped catalog without its equivalence groups, which the baseline did not know about."""
+    base = get_base_catalog()
+    return Catalog(base.frameworks, base.all_controls, base.controls_by_framework, version=base.version)
+
+
+@pytest.fixture(scope='module')
+def plain_engine(plain_catalog):
+    return ScoringEngine(plain_catalog, get_classification_index(plain_catalog))
+
+
+def test_analyze_matches_baseline(plain_catalog, plain_engine):
+    rnd = random.Random(1)
+    framework_ids = list(plain_catalog.frameworks)
+    controls = sorted(plain_catalog.frameworks_by_control)
+    for _ in range(300):
+        selected_frameworks = rnd.sample(framework_ids, rnd.randint(0, len(framework_ids)))
+        if rnd.random() < 0.1:
+            selected_frameworks.append('unknown_framework')
+        selected_controls = rnd.sample(controls, rnd.randint(0, len(controls)))
+        if rnd.random() < 0.1:
+            selected_controls.append('Not A Control')
+        expected = baseline_analytics(plain_catalog, selected_frameworks, selected_controls, len(framework_ids))
+        assert plain_engine.analyze(selected_frameworks, selected_controls, len(framework_ids)) == expected
+
+
+def test_analyze_counts_duplicate_controls_once_per_framework(plain_catalog, plain_engine):
+    framework_id = 'nist_csf'
+    framework = plain_catalog.framework_names[framework_id]
+    control = plain_catalog.controls_by_framework[framework][0]
+    analytics = plain_engine.analyze([framework_id], [control, control], 1)
+    once = plain_engine.analyze([framework_id], [control], 1)
+    assert analytics['implemented_controls'] == [control, control]
+    assert analytics['framework_compliance'] == once['framework_compliance']
+    assert analytics['framework_missing_controls'] == once['framework_missing_controls']
+
+
+@pytest.mark.parametrize('vectorized, chunk_cells', [(True, scoring.BATCH_CHUNK_CELLS), (True, 1), (False, None)])
+def test_analyze_batch_matches_analyze(monkeypatch, vectorized, chunk_cells):
+    if vectorized:
+        pytest.importorskip('numpy')
+        # One cell per chunk still stacks one assessment at a time
+        monkeypatch.setattr(scoring, 'BATCH_CHUNK_CELLS', chunk_cells)
+    else:
+        monkeypatch.setattr(scoring, 'np', None)
+    engine = get_engine()
+    catalog = engine.catalog
+    rnd = random.Random(2)
+    framework_ids = list(catalog.frameworks)
+    controls = sorted(catalog.frameworks_by_control)
+    framework_selections = [rnd.sample(framework_ids, rnd.randint(1, 4)) for _ in range(5)]
+    framework_selections += [[], ['unknown_framework', framework_ids[0], framework_ids[0]]]
+    assessments = [(rnd.choice(framework_selections), rnd.sample(controls, rnd.randint(0, len(controls) // 2)))
+                   for _ in range(100)]
+    assessments += [(framework_ids, controls), (framework_ids, controls[:5] * 2 + ['Not A Control'])]
+    expected = [engine.analyze(frameworks, controls, len(framework_ids)) for frameworks, controls in assessments]
+    assert engine.analyze_batch(assessments, len(framework_ids)) == expected
+
+
+@pytest.mark.parametrize('weight', [3, 2.5])
+def test_analyze_batch_matches_analyze_with_weighted_model(weight):
+    pytest.importorskip('numpy')
+    catalog = get_base_catalog()
+    engine = ScoringEngine(catalog, get_classification_index(catalog))
+    controls = sorted(catalog.frameworks_by_control)
+    framework_ids = list(catalog.frameworks)
+    engine.model = CompiledModel('weighted', {
+        'components': [{'type': 'coverage', 'points': 60},
+                       {'type': 'label', 'label': 'critical', 'points': 30},
+                       {'type': 'frameworks', 'points': 10, 'per_framework': 2}],
+        'control_weights': {control: weight for control in controls[::3]},
+        'framework_weights': {framework_ids[0]: 2}
+    }, engine)
+    rnd = random.Random(3)
+    assessments = [(rnd.sample(framework_ids, rnd.randint(1, 4)), rnd.sample(controls, rnd.randint(0, 40)))
+                   for _ in range(50)]
+    expected = [engine.analyze(frameworks, controls, len(framework_ids)) for frameworks, controls in assessments]
+    assert engine.analyze_batch(assessments, len(framework_ids)) == expected
+
+
+def headline(analytics, summary):
+    """The figures of a full analysis that ``AssessmentState.summary`` reproduces."""
+    return {key: analytics[key] for key in summary}
+
+
+def test_state_keeps_group_credited_while_a_member_is_selected():
+    engine = get_engine()
+    catalog = engine.catalog
+    canonical, member = next(members[:2] for members in catalog.equivalents.values())
+    frameworks = list(catalog.frameworks)
+    state = AssessmentState(engine, frameworks, [canonical, member])
+    state.apply(remove_controls=[canonical])
+    summary = state.summary(len(catalog.frameworks))
+    expected = engine.analyze(frameworks, [member], len(catalog.frameworks))
+    assert expected['controls_implemented'] == len(catalog.equivalents[canonical])
+    assert summary == headline(expected, summary)
+
+    state.apply(remove_controls=[member])
+    summary = state.summary(len(catalog.frameworks))
+    assert summary == headline(engine.analyze(frameworks, [], len(catalog.frameworks)), summary)
+
+
+def test_state_deltas_match_full_analysis():
+    engine = get_engine()
+    catalog = engine.catalog
+    rnd = random.Random(15)
+    framework_ids = list(catalog.frameworks) + ['unknown_framework']
+    # Non-canonical equivalents are drawn as often as canonical controls
+    grouped = [member for members in catalog.equivalents.values() for member in members]
+    controls = sorted(catalog.frameworks_by_control) + grouped * 3 + ['Not A Control']
+
+    frameworks = rnd.sample(framework_ids, 3)
+    selected = dict.fromkeys(rnd.sample(controls, 20))
+    state = AssessmentState(engine, list(frameworks), list(selected))
+    for _ in range(6000):
+        delta = {}
+        kind = rnd.random()
+        if kind < 0.4:
+            delta['add_controls'] = rnd.sample(controls, rnd.randint(1, 3))
+            selected.update(dict.fromkeys(delta['add_controls']))
+        elif kind < 0.8 and selected:
+            delta['remove_controls'] = rnd.sample(list(selected), min(len(selected), rnd.randint(1, 3)))
+            for control in delta['remove_controls']:
+                selected.pop(control, None)
+        elif kind < 0.9:
+            framework_id = rnd.choice(framework_ids)
+            delta['add_frameworks'] = [framework_id]
+            if framework_id not in frameworks:
+                frameworks.append(framework_id)
+        elif frameworks:
+            framework_id = rnd.choice(frameworks)
+            delta['remove_frameworks'] = [framework_id]
+            frameworks.remove(framework_id)
+        state.apply(**delta)
+        summary = state.summary(len(catalog.frameworks))
+        expected = engine.analyze(frameworks, list(selected), len(catalog.frameworks))
+        assert summary == headline(expected, summary), delta
@@ -0,0 +1,117 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from benchmarks.synthetic import synthetic_catalog
+from data.catalog import Catalog, get_base_catalog
+from search import FRAMEWORK_WEIGHT, MAX_QUERY_FUZZY_TERMS, SearchIndex, tokenize
+
+
+def brute_force_search(index, query, limit=20, doc_type=None):
+    """Score every document against every expansion of every query token."""
+    tokens = list(dict.fromkeys(tokenize(query)))
+    max_fuzzy = None if len(tokens) == 1 else MAX_QUERY_FUZZY_TERMS
+    scores = defaultdict(float)
+    matched = defaultdict(int)
+    for token in tokens:
+        expansions = index._expand(token) if max_fuzzy is None else index._expand(token, max_fuzzy)
+        postings = [(dict(index.postings[term]), quality) for term, quality in expansions]
+        for doc_id in range(len(index.documents)):
+            best = max((weights.get(doc_id, 0.0) * quality for weights, quality in postings), default=0.0)
+            if best > 0:
+                scores[doc_id] += best
+                matched[doc_id] += 1
+    for token in tokens:
+        names = index.framework_terms.get(token, ())
+        for doc_id in scores:
+            document = index.documents[doc_id]
+            if document['type'] == 'control' and any(framework in names for framework in document['frameworks']):
+                scores[doc_id] += FRAMEWORK_WEIGHT
+                matched[doc_id] += 1
+    ranked = sorted(((matched[doc_id], score, doc_id) for doc_id, score in scores.items()
+                     if doc_type is None or index.documents[doc_id]['type'] == doc_type), reverse=True)
+    return [(index.documents[doc_id]['id'], round(score, 4), count) for count, score, doc_id in ranked[:limit]]
+
+
+def ranking(results):
+    return [(result['id'], result['score'], result['matched_terms']) for result in results]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return SearchIndex(get_base_catalog())
+
+
+@pytest.fixture(scope='module')
+def large_index():
+    return SearchIndex(synthetic_catalog(3000, seed=1))
+
+
+def test_exact_match_ranks_shortest_name_first(index):
+    results = index.search('encryption')
+    assert results[0]['name'] == 'Encryption'
+    assert all('encryption' in tokenize(result['name']) for result in results)
+
+
+def test_prefix_match(index):
+    results = index.search('encry')
+    assert results
+    assert all(any(token.startswith('encry') for token in tokenize(result['name'])) for result in results)
+
+
+def test_fuzzy_match(index):
+    assert index.search('encrpytion')[0]['name'] == 'Encryption'
+    assert index.search('zzzzqqq') == []
+
+
+def test_doc_type_filter(index):
+    controls = index.search('security', doc_type='control')
+    frameworks = index.search('security', doc_type='framework')
+    assert controls and frameworks
+    assert {result['type'] for result in controls} == {'control'}
+    assert {result['type'] for result in frameworks} == {'framework'}
+    assert index.search('nist access', doc_type='framework')[0]['id'] == 'nist_csf'
+
+
+def test_framework_name_boosts_its_controls(index):
+    results = index.search('access control nist')
+    nist = get_base_catalog().framework_names['nist_csf']
+    assert results[0]['matched_terms'] == 3
+    assert nist in results[0]['frameworks']
+
+
+def test_multi_word_fuzzy_expansion_is_capped():
+    controls = ['Monitor', 'Monitors', 'Monitored', 'Monitoring', 'Monitorable', 'Log Review']
+    catalog = Catalog({'ops': {'name': 'Ops', 'catalog_name': 'OPS', 'description': 'Operations',
+                               'icon': 'gear', 'color': 'gray'}}, controls, {'OPS': controls})
+    index = SearchIndex(catalog)
+    assert len(index._expand('monitorx')) == len(controls) - 1
+    assert len(index._expand('monitorx', MAX_QUERY_FUZZY_TERMS)) == MAX_QUERY_FUZZY_TERMS
+
+    # A single misspelled word keeps every fuzzy match, one word of several only the closest
+    assert len(index.search('monitorx')) == len(controls) - 1
+    results = index.search('monitorx review')
+    assert len(results) == MAX_QUERY_FUZZY_TERMS + 1
+    assert {result['name'] for result in results} == {'Monitor', 'Monitors', 'Monitored', 'Log Review'}
+
+
+@pytest.mark.parametrize('doc_type', [None, 'control', 'framework'])
+@pytest.mark.parametrize('limit', [1, 5, 20])
+def test_ranking_matches_brute_force(large_index, doc_type, limit):
+    rng = random.Random(limit)
+    controls = large_index.catalog.all_controls
+    frameworks = [framework['name'] for framework in large_index.catalog.frameworks.values()]
+    queries = ['', 'framework', 'security controls', 'protection data access review']
+    for _ in range(40):
+        words = tokenize(rng.choice(controls)) + tokenize(rng.choice(frameworks))
+        picked = rng.sample(words, min(len(words), rng.randint(1, 3)))
+        queries.append(' '.join(word[:rng.randint(min(2, len(word)), len(word))] for word in picked))
+        word = max(picked, key=len)
+        if len(word) > 3:
+            # Drop a letter for a fuzzy match
+            position = rng.randrange(1, len(word) - 1)
+            queries.append(' '.join(picked).replace(word, word[:position] + word[position + 1:]))
+    for query in queries:
+        assert ranking(large_index.search(query, limit, doc_type)) == \
+            brute_force_search(large_index, query, limit, doc_type), query
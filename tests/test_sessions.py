@@ -0,0 +1,24 @@
+import sqlite3
+import time
+
+import sessions
+from sessions import SQLiteSessionStore
+
+
+def stored_sids(store):
+    with sqlite3.connect(store.path) as conn:
+        return {sid for (sid,) in conn.execute('SELECT sid FROM sessions')}
+
+
+def test_sqlite_store_purges_expired_sessions_periodically(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessions, 'PURGE_EVERY_SAVES', 3)
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'))
+    now = time.time()
+    store.save('expired', b'{}', now - 1)
+    store.save('live', b'{}', now + 60)
+    assert store.load('expired') is None
+    assert stored_sids(store) == {'expired', 'live'}
+
+    store.save('other', b'{}', now + 60)
+    assert stored_sids(store) == {'live', 'other'}
+    assert store.load('live') == b'{}'
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from data.catalog import CatalogError, get_base_catalog
+from tenants import load_overlays, parse_tenant_keys, tenant_of_key, validate_overlays
+
+
+@pytest.mark.parametrize('doc', [
+    [],
+    {'payments': []},
+    {'payments': {'unknown': []}},
+    {'payments': {'frameworks': 'pci_dss'}},
+    {'payments': {'remove_controls': [['Physical Security']]}},
+    {'payments': {'add_controls': []}},
+    {'payments': {'add_controls': {'PCI-DSS v4.0': [1]}}},
+])
+def test_validate_overlays_rejects_malformed_documents(doc):
+    with pytest.raises(CatalogError):
+        validate_overlays(doc)
+
+
+def test_validate_overlays():
+    validate_overlays({'payments': {'frameworks': ['pci_dss'], 'add_controls': {'PCI-DSS v4.0': ['Tokenization']},
+                                    'remove_controls': [], 'critical_controls': ['Tokenization']}})
+
+
+@pytest.mark.parametrize('overlay', [
+    {'frameworks': ['pci_dss', 'pci_dsss']},
+    {'frameworks': ['pci_dss'], 'add_controls': {'SOC 2 Type 2': ['Tokenization']}},
+    {'add_controls': {'PCI DSS': ['Tokenization']}},
+])
+def test_validate_overlays_rejects_unknown_targets(overlay):
+    validate_overlays({'payments': overlay})
+    with pytest.raises(CatalogError):
+        validate_overlays({'payments': overlay}, get_base_catalog())
+
+
+def test_validate_overlays_against_catalog():
+    validate_overlays({'payments': {'frameworks': ['pci_dss', 'soc2'],
+                                    'add_controls': {'SOC 2 Type 2': ['Tokenization']}},
+                       'retail': {'add_controls': {'HIPAA': ['Tokenization']}}}, get_base_catalog())
+
+
+def test_load_overlays_checks_the_base_catalog(tmp_path):
+    path = tmp_path / 'tenants.json'
+    assert load_overlays(str(path)) == {}
+    path.write_text(json.dumps({'payments': {'frameworks': ['pci_dss']}}), encoding='utf-8')
+    assert load_overlays(str(path)) == {'payments': {'frameworks': ['pci_dss']}}
+    path.write_text(json.dumps({'payments': {'frameworks': ['pci']}}), encoding='utf-8')
+    with pytest.raises(CatalogError, match="unknown frameworks: pci"):
+        load_overlays(str(path))
+
+
+def test_parse_tenant_keys():
+    keys = parse_tenant_keys('payments:p-1, payments:p-2,retail:r-1,')
+    assert tenant_of_key(keys, 'p-1') == tenant_of_key(keys, 'p-2') == 'payments'
+    assert tenant_of_key(keys, 'r-1') == 'retail'
+    assert tenant_of_key(keys, 'p-3') is None
+    assert 'p-1' not in keys
+
+
+@pytest.mark.parametrize('value', ['payments', 'payments:', ':p-1', 'payments:p-1,retail:p-1'])
+def test_parse_tenant_keys_rejects_malformed_values(value):
+    with pytest.raises(ValueError):
+        parse_tenant_keys(value)